@@ -1,6 +1,6 @@
-import requests
+import base_http
+from user_directory import get_directory
 import json
-import smtplib
 import unicodedata
 import re
 from email.mime.text import MIMEText
@@ -12,8 +12,9 @@ from pydantic import BaseModel, Field
 
 import traceback
 import os
+import sys
+import threading
 from dotenv import load_dotenv
-from ollama import chat, ChatResponse, Client
 
 
 # Load environment variables
@@ -32,14 +33,28 @@ for i in range(1, 10):
 API_KEYS = [k for k in API_KEYS if k]
 print(f"Loaded {len(API_KEYS)} Ollama API Keys.")
 
+# Số request LLM chạy đồng thời tối đa trên mỗi API key
+LLM_PER_KEY_CONCURRENCY = int(os.getenv('LLM_PER_KEY_CONCURRENCY', '2'))
+_llm_pool = None
+_ai_executor = None
+_llm_lock = threading.Lock()
+
 # Import modules
-from checkin_timeoff import get_checkin_data
-from wework import get_wework_data, WeWorkAPIClient
-from goal import get_goal_data, GoalAPIClient
-from inside import get_inside_data
-from inside import get_inside_data
-from workflow import get_workflow_data
-import app_v2_logic
+from wework import WeWorkAPIClient
+from goal import GoalAPIClient
+from base_snapshot import BaseSnapshot
+from report_pipeline import Stage, run_pipeline, stage_workers
+from run_journal import RunJournal, default_run_id
+from llm_pool import LLMKeyPool, LLMUnavailable
+from mailer import MailDispatcher, default_backend
+from outbox import Outbox, OutboxSender
+import insight_cache
+from email_templates import (
+    REPORT_CSS, REPORT_PAGE, SECTION, AI_BLOCK, AI_BULLET, AI_LINE, UPCOMING_ITEM, UPCOMING_BOX,
+    GOAL_BOX, GOAL_MISSING, WEWORK_WARNING, WEWORK_BOX, WEWORK_EMPTY, CHECKIN_BOX, CHECKIN_EMPTY,
+    FEED_ITEM, FEED_EMPTY, INSIDE_BOX, INSIDE_EMPTY, WORKFLOW_SUMMARY, WORKFLOW_SUMMARY_ITEM,
+    WORKFLOW_BOX, WORKFLOW_EMPTY,
+)
 
 # ============================================================================
 # CẤU HÌNH (CONSTANTS)
@@ -59,6 +74,8 @@ hcm_tz = pytz.timezone('Asia/Ho_Chi_Minh')
 
 # AI Model Configuration
 OLLAMA_MODEL = "gemini-3-flash-preview"
+# Tăng khi sửa prompt trong generate_ai_insight để bỏ qua kết quả cũ trong insight_cache
+AI_PROMPT_VERSION = 1
 
 # Defined Pydantic Models for Structured Output
 class InsightItem(BaseModel):
@@ -72,25 +89,41 @@ class AIAnalysisResponse(BaseModel):
 # Global variable for user mapping
 user_id_to_name_map = {}
 
-# Setup Ollama Client
-try:
-    ollama_api_key = os.getenv('OLLAMA_API_KEY')
-    client = Client(
-        host="https://ollama.com", 
-        headers={'Authorization': 'Bearer ' + str(ollama_api_key)}
-    )
-except Exception as e:
-    print(f"Error initializing Ollama Client: {e}")
-    client = None
-
 # Token detection helper
 def get_account_auth_data():
     """Get authentication data dict with correct key for token v1 or v2"""
     key = "access_token_v2" if "~" in ACCOUNT_ACCESS_TOKEN else "access_token"
     return {key: ACCOUNT_ACCESS_TOKEN}
 
+def get_llm_pool():
+    """Pool client Ollama dùng chung (một client cho mỗi API key)"""
+    global _llm_pool
+    if _llm_pool is None:
+        with _llm_lock:
+            if _llm_pool is None:
+                _llm_pool = LLMKeyPool(API_KEYS, per_key_concurrency=LLM_PER_KEY_CONCURRENCY)
+    return _llm_pool
+
+def get_ai_executor():
+    """Thread pool chạy song song các lời gọi AI của một báo cáo"""
+    global _ai_executor
+    if _ai_executor is None:
+        capacity = get_llm_pool().capacity
+        with _llm_lock:
+            if _ai_executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                _ai_executor = ThreadPoolExecutor(max_workers=max(6, capacity), thread_name_prefix='ai-insight')
+    return _ai_executor
+
 def generate_ai_insight(data_context, section_name, insight_type="insight"):
-    """Gọi Ollama chat để tạo AI insight/recommend (TEXT MODE - Streaming & Rotation)"""
+    """Gọi Ollama chat để tạo AI insight/recommend (TEXT MODE - Streaming & Rotation)
+
+    Kết quả được cache theo (model, AI_PROMPT_VERSION, section, loại, data_context).
+    """
+    cache_key = insight_cache.make_key(OLLAMA_MODEL, AI_PROMPT_VERSION, section_name, insight_type, data_context)
+    cached_content = insight_cache.load(cache_key)
+    if cached_content is not None:
+        return cached_content
     
     prompt = ""
     if insight_type == "recommend":
@@ -125,39 +158,40 @@ Nhận xét:"""
 
     messages = [{'role': 'user', 'content': prompt}]
 
-    # Retry logic with key rotation
-    for key_index, api_key in enumerate(API_KEYS):
-        try:
-            # Init client with current key
-            client = Client(
-                host="https://ollama.com", 
-                headers={'Authorization': 'Bearer ' + str(api_key)}
-            )
-            
-            # Streaming response
-            full_content = ""
-            stream_response = client.chat(
-                model=OLLAMA_MODEL, 
-                messages=messages, 
-                stream=True,
-                options={'temperature': 0.95}
-            )
-            
-            for part in stream_response:
-                chunk = part['message']['content']
-                full_content += chunk
-            
-            return full_content.strip()
-
-        except Exception as e:
-            print(f"⚠️ Key {key_index + 1}/{len(API_KEYS)} failed: {e}")
-            if key_index == len(API_KEYS) - 1:
-                print(f"❌ All API keys failed for {section_name}.")
-                return None
-            print("🔄 Switching to next backup key...")
-            continue
-            
-    return None
+    # Pool chọn key ít tải nhất, tự chuyển key khi lỗi / bị rate limit
+    try:
+        full_content = get_llm_pool().chat(OLLAMA_MODEL, messages, options={'temperature': 0.95},
+                                           label=section_name)
+    except LLMUnavailable:
+        print(f"❌ All API keys failed for {section_name}.")
+        return None
+
+    content = full_content.strip()
+    insight_cache.store(cache_key, content, section_name)
+    return content
+
+class PendingInsights:
+    """Gửi các lời gọi AI của một báo cáo chạy song song, điền kết quả vào HTML ở cuối.
+
+    request() trả về một placeholder để chèn vào HTML thay cho nội dung AI; fill() chờ
+    mọi lời gọi xong và thay placeholder bằng HTML đã format (hoặc fallback nếu AI lỗi).
+    """
+
+    def __init__(self):
+        self._pending = {}
+
+    def request(self, data_context, section_name, insight_type, fallback):
+        marker = f"<!--ai-insight:{len(self._pending)}-->"
+        future = get_ai_executor().submit(generate_ai_insight, data_context, section_name, insight_type)
+        self._pending[marker] = (future, fallback)
+        return marker
+
+    def fill(self, html):
+        for marker, (future, fallback) in self._pending.items():
+            content = future.result()
+            html = html.replace(marker, format_ai_content_to_html(content) if content else fallback)
+        self._pending = {}
+        return html
 
 def format_ai_content_to_html(content):
     """Chuyển đổi AI text (bullet points + markdown) thành HTML đẹp"""
@@ -186,59 +220,31 @@ def format_ai_content_to_html(content):
         if line.startswith('- ') or line.startswith('• '):
             # Bỏ ký tự đầu và khoảng trắng
             text = line[2:].strip()
-            html_parts.append(f'<div style="margin-bottom: 10px; padding-left: 18px; position: relative;"><span style="position: absolute; left: 0; color: rgba(255,255,255,0.8);">▸</span>{text}</div>')
+            html_parts.append(AI_BULLET.render(text=text))
         elif len(line) > 1 and line[0].isdigit() and line[1] == '.':
             # Xử lý số thứ tự: 1. text
             text = line.split('.', 1)[1].strip() if '.' in line else line
-            html_parts.append(f'<div style="margin-bottom: 10px; padding-left: 18px; position: relative;"><span style="position: absolute; left: 0; color: rgba(255,255,255,0.8);">▸</span>{text}</div>')
+            html_parts.append(AI_BULLET.render(text=text))
         elif len(line) > 2 and line[0].isdigit() and line[1].isdigit() and line[2] == '.':
             # Xử lý số thứ tự 2 chữ số: 10. text
             text = line.split('.', 1)[1].strip() if '.' in line else line
-            html_parts.append(f'<div style="margin-bottom: 10px; padding-left: 18px; position: relative;"><span style="position: absolute; left: 0; color: rgba(255,255,255,0.8);">▸</span>{text}</div>')
+            html_parts.append(AI_BULLET.render(text=text))
         else:
-            html_parts.append(f'<div style="margin-bottom: 10px;">{line}</div>')
+            html_parts.append(AI_LINE.render(text=line))
     
     return ''.join(html_parts)
 
 def load_user_mapping():
-    """Tải user mapping từ Account API và lưu vào biến global"""
+    """Tải mapping user_id -> name (từ UserDirectory dùng chung) và lưu vào biến global"""
     global user_id_to_name_map
-    try:
-        url = "https://account.base.vn/extapi/v1/users/get_list"
-        payload = get_account_auth_data()
-        headers = {'Content-Type': 'application/x-www-form-urlencoded'}
-        
-        response = requests.post(url, headers=headers, data=payload, timeout=30)
-        
-        if response.status_code == 200:
-            response_json = response.json()
-            
-            user_list = []
-            if isinstance(response_json, list):
-                user_list = response_json
-            elif isinstance(response_json, dict):
-                user_list = response_json.get('users', [])
-            
-            if user_list:
-                user_id_to_name_map = {
-                    str(user.get('id', '')): user.get('name', '') 
-                    for user in user_list 
-                    if user.get('id') and user.get('name')
-                }
-        else:
-            print(f"Không thể tải user mapping, status code: {response.status_code}")
-    except Exception as e:
-        print(f"Lỗi khi tải user mapping: {e}")
+    user_id_to_name_map = get_directory().id_to_name()
 
 
-
-# ============================================================================
-# HÀM TẠO HTML EMAIL (GIAO DIỆN MỚI "ĐẸP HƠN")
-# ============================================================================
 def create_email_html(employee_name, checkin_data, wework_data, goal_data, inside_data, workflow_data, server_data=None):
     """Tạo nội dung HTML email với giao diện được cải thiện"""
     
     current_time_str = datetime.now(hcm_tz).strftime('%d/%m/%Y %H:%M:%S')
+    pending_ai = PendingInsights()
 
     # --- 1. Xử lý section GOAL (NÂNG CẤP INSIGHT) ---
     if goal_data and goal_data.get('weekly'):
@@ -314,66 +320,25 @@ def create_email_html(employee_name, checkin_data, wework_data, goal_data, insid
 
                 goal_context = json.dumps(goal_context_dict, ensure_ascii=False, indent=2)
             
-            # Gọi AI để tạo insight và recommend
-            ai_insight = generate_ai_insight(goal_context, "OKR/Goal", "insight")
-            ai_recommend = generate_ai_insight(goal_context, "OKR/Goal", "recommend")
-            
-            # Format và tạo HTML cho AI Insight
-            insight_html = format_ai_content_to_html(ai_insight) if ai_insight else "Đang phân tích dữ liệu..."
-            recommend_html = format_ai_content_to_html(ai_recommend) if ai_recommend else "Đang tạo khuyến nghị..."
-            
-            goals_html += '<div style="margin-top: 15px; border-top: 1px dashed #ccc; padding-top: 10px;">'
-            
-            # AI Insight Box
-            goals_html += '<div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); padding: 15px; border-radius: 8px; margin-bottom: 12px;">'
-            goals_html += '<div style="font-weight: 700; color: #fff; font-size: 14px; margin-bottom: 10px;">🤖 AI Insight:</div>'
-            goals_html += f'<div style="color: #fff; font-size: 13px; line-height: 1.6;">{insight_html}</div>'
-            goals_html += '</div>'
-            
-            # AI Recommend Box
-            goals_html += '<div style="background: linear-gradient(135deg, #11998e 0%, #38ef7d 100%); padding: 15px; border-radius: 8px;">'
-            goals_html += '<div style="font-weight: 700; color: #fff; font-size: 14px; margin-bottom: 8px;">💡 AI Recommend:</div>'
-            goals_html += f'<div style="color: #fff; font-size: 13px; line-height: 1.6;">{recommend_html}</div>'
-            goals_html += '</div>'
+            # Gọi AI để tạo insight và recommend (chạy song song, kết quả được điền vào HTML ở cuối)
+            insight_html = pending_ai.request(goal_context, "OKR/Goal", "insight", "Đang phân tích dữ liệu...")
+            recommend_html = pending_ai.request(goal_context, "OKR/Goal", "recommend", "Đang tạo khuyến nghị...")
             
-            goals_html += '</div>'
-
-        goal_content_box = f"""
-        <div class="stats-box success-box"> 
-            <div class="sub-header">🎯 Hiệu suất & Kỷ luật OKR:</div>
-            <ul class="stat-list">
-                <li><strong>Biến động tuần qua:</strong> <span style="color: {trend_color}; font-weight: bold;">{trend_icon} {shift_val:+.2f}% ({trend_text})</span></li>
-                <li><strong>Kết quả hiện tại:</strong> {weekly['current_value']:.2f}% (Tuần trước: {weekly['last_friday_value']:.2f}%)</li>
-                <li style="margin-top: 10px; border-top: 1px dashed #ccc; padding-top: 5px;"><strong>🔍 Phân tích hành vi (Integrity):</strong></li>
-                <li>• Số lần Check-in trong kỳ: <strong>{checkin_count} lần</strong> - <em>{discipline_text}</em></li>
-                <li>• Tần suất trung bình: <strong>{checkin_freq:.1f} lần/tuần</strong></li>
-                <li>• Lần check-in cuối: <strong>{behavior.get('last_checkin_period', 'N/A')}</strong></li>
-            </ul>
-            {goals_html}
-
-        </div>
-        """
+            goals_html = AI_BLOCK.render(variant='', insight=insight_html, recommend=recommend_html)
+
+        goal_content_box = GOAL_BOX.render(
+            trend_color=trend_color, trend_icon=trend_icon, trend_text=trend_text, shift_val=shift_val,
+            weekly=weekly, checkin_count=checkin_count, discipline_text=discipline_text,
+            checkin_freq=checkin_freq, last_checkin=behavior.get('last_checkin_period', 'N/A'),
+            goals_html=goals_html,
+        )
     else:
-        goal_content_box = """
-        <div class="stats-box warning-box">
-            <div class="sub-header">🚨 Cảnh báo OKR:</div>
-            <ul class="stat-list warning-list">
-                <li>❌ Hệ thống ghi nhận bạn <strong>chưa thiết lập OKR</strong> hoặc dữ liệu chưa đồng bộ.</li>
-                <li>👉 Hành động ngay: Vui lòng review lại OKR cá nhân trên Base Goal.</li>
-            </ul>
-        </div>
-        """
+        goal_content_box = GOAL_MISSING.render()
     # --- 2. Xử lý section WEWORK (NÂNG CẤP: BẮT LỖI KHÔNG DEADLINE & QUÁ HẠN) ---
     if wework_data:
         # Check flag warning
         if wework_data.get('is_warning_only'):
-            wework_content_box = """
-            <div class="stats-box warning-box">
-                <div style="font-weight: bold; font-size: 16px; margin-bottom: 5px;">⚠️ Cần lưu ý:</div>
-                <div>Hệ thống không ghi nhận hoạt động nào trên WeWork trong 1 tháng qua.</div>
-                <div style="margin-top: 5px; font-size: 13px;">Hãy rà soát lại các công việc và cập nhật tiến độ ngay nhé!</div>
-            </div>
-            """
+            wework_content_box = WEWORK_WARNING.render()
         else:
             s = wework_data['summary']
             stats_ext = wework_data.get('stats_extended', {})
@@ -387,7 +352,7 @@ def create_email_html(employee_name, checkin_data, wework_data, goal_data, insid
             # 1. Tạo HTML cho Upcoming Deadlines (Sắp đến hạn)
             upcoming_html = ""
             if upcoming_tasks:
-                upcoming_list_items = ""
+                upcoming_list_items = []
                 for t in upcoming_tasks[:5]: # Limit 5
                     # Assuming 'deadline' is a timestamp and 'since' is also a timestamp
                     # Calculate days left based on deadline
@@ -406,18 +371,11 @@ def create_email_html(employee_name, checkin_data, wework_data, goal_data, insid
                             pass # Keep days as 0 if conversion fails
                     
                     day_str = "Hôm nay" if days == 0 else f"{days} ngày nữa"
-                    upcoming_list_items += f"<div>• <span style='color:#e65100; font-weight:600;'>{t.get('name')}</span> ({day_str})</div>"
+                    upcoming_list_items.append(UPCOMING_ITEM.render(name=t.get('name'), day_str=day_str))
                 
-                upcoming_html = f"""
-                <li style="margin-top: 10px; background-color: #fff3cd; padding: 8px; border-radius: 4px; border-left: 3px solid #ffc107;">
-                    <strong>⚠️ Sắp đến hạn (7 ngày tới):</strong>
-                    <div style="font-size: 13px; margin-top: 4px;">{upcoming_list_items}</div>
-                </li>
-                """
+                upcoming_html = UPCOMING_BOX.render(items=''.join(upcoming_list_items))
                 
             # 2. Tạo AI Insight và AI Recommend cho WEWORK (thay thế table overdue)
-            wework_ai_html = ""
-            
             # Chuẩn bị context dữ liệu cho AI (JSON Format)
             # Chuẩn bị context dữ liệu cho AI (JSON Format)
             if server_data and server_data.get('wework'):
@@ -455,46 +413,18 @@ def create_email_html(employee_name, checkin_data, wework_data, goal_data, insid
     
                 wework_context = json.dumps(wework_context_dict, ensure_ascii=False, indent=2)
             
-            # Gọi AI để tạo insight và recommend
-            ai_insight = generate_ai_insight(wework_context, "WeWork - Quản lý công việc", "insight")
-            ai_recommend = generate_ai_insight(wework_context, "WeWork - Quản lý công việc", "recommend")
-            
-            # Format và tạo HTML cho AI boxes
-            insight_html = format_ai_content_to_html(ai_insight) if ai_insight else "Đang phân tích dữ liệu..."
-            recommend_html = format_ai_content_to_html(ai_recommend) if ai_recommend else "Đang tạo khuyến nghị..."
-            
-            wework_ai_html += '<div style="margin-top: 15px; border-top: 1px dashed #80cbc4; padding-top: 10px;">'
-            
-            # AI Insight Box
-            wework_ai_html += '<div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); padding: 15px; border-radius: 8px; margin-bottom: 12px;">'
-            wework_ai_html += '<div style="font-weight: 700; color: #fff; font-size: 14px; margin-bottom: 10px;">🤖 AI Insight:</div>'
-            wework_ai_html += f'<div style="color: #fff; font-size: 13px; line-height: 1.6;">{insight_html}</div>'
-            wework_ai_html += '</div>'
+            # Gọi AI để tạo insight và recommend (chạy song song, kết quả được điền vào HTML ở cuối)
+            insight_html = pending_ai.request(wework_context, "WeWork - Quản lý công việc", "insight", "Đang phân tích dữ liệu...")
+            recommend_html = pending_ai.request(wework_context, "WeWork - Quản lý công việc", "recommend", "Đang tạo khuyến nghị...")
             
-            # AI Recommend Box
-            wework_ai_html += '<div style="background: linear-gradient(135deg, #11998e 0%, #38ef7d 100%); padding: 15px; border-radius: 8px;">'
-            wework_ai_html += '<div style="font-weight: 700; color: #fff; font-size: 14px; margin-bottom: 8px;">💡 AI Recommend:</div>'
-            wework_ai_html += f'<div style="color: #fff; font-size: 13px; line-height: 1.6;">{recommend_html}</div>'
-            wework_ai_html += '</div>'
-            
-            wework_ai_html += '</div>'
-
-            wework_content_box = f"""
-            <div class="stats-box wework-box">
-                <div class="sub-header">📊 Quản trị công việc & Rủi ro (1 tháng gần nhất):</div>
-                <ul class="stat-list">
-                    <li>📋 Tổng quan: <strong>{s['total_tasks']} task</strong> (Done: {s['completion_rate']:.1f}%)</li>
-                    <li>⚡ Tốc độ: <strong>{s['on_time_rate']:.1f}%</strong> công việc hoàn thành đúng hạn.</li>
-                    <li>🐢 Hoàn thành muộn: <strong>{completed_late} task</strong></li>
-                    <li>⚠️ Không Deadline: <strong>{no_deadline} task</strong></li>
-                    {upcoming_html}
-                </ul>
-                {wework_ai_html}
-
-            </div>
-            """
+            wework_ai_html = AI_BLOCK.render(variant=' ai-block-wework', insight=insight_html, recommend=recommend_html)
+
+            wework_content_box = WEWORK_BOX.render(
+                summary=s, completed_late=completed_late, no_deadline=no_deadline,
+                upcoming_html=upcoming_html, ai_html=wework_ai_html,
+            )
     else:
-        wework_content_box = """<div class="stats-box wework-box"><p><em>Chưa có dữ liệu công việc để phân tích.</em></p></div>"""
+        wework_content_box = WEWORK_EMPTY.render()
 
 
     # --- 3. Xử lý section CHECKIN (THAY THẾ 42H BẰNG PHÂN TÍCH THÓI QUEN) ---
@@ -587,61 +517,14 @@ def create_email_html(employee_name, checkin_data, wework_data, goal_data, insid
         else:
             p_early = p_std = p_late = 0
 
-        habit_bar_html = f"""
-        <div style="display: flex; height: 12px; width: 100%; background: #eee; border-radius: 6px; overflow: hidden; margin-top: 8px;">
-            <div style="width: {p_early}%; background: #28a745;" title="Đến sớm"></div>
-            <div style="width: {p_std}%; background: #17a2b8;" title="Đúng giờ"></div>
-            <div style="width: {p_late}%; background: #dc3545;" title="Đi trễ"></div>
-        </div>
-        <div style="display: flex; justify-content: space-between; font-size: 11px; color: #666; margin-top: 4px;">
-            <span><span style="color:#28a745">●</span> Sớm ({early_arrival})</span>
-            <span><span style="color:#17a2b8">●</span> Chuẩn ({standard_arrival})</span>
-            <span><span style="color:#dc3545">●</span> Trễ ({late_arrival})</span>
-        </div>
-        """
-
-        checkin_content_box = f"""
-        <div class="stats-box checkin-box">
-            <div class="sub-header" style="display: flex; justify-content: space-between; align-items: center;">
-                <span>📊 Tổng quan tháng {p['month']}/{p['year']}:</span>
-                <span style="font-size: 12px; background: {style_color}; color: #fff; padding: 2px 8px; border-radius: 10px;">{style_tag}</span>
-            </div>
-            
-            <div style="background-color: #fff; border-radius: 8px; padding: 15px; margin-bottom: 20px; box-shadow: 0 2px 5px rgba(0,0,0,0.05);">
-                <table style="width: 100%; border-collapse: collapse;">
-                    <tr>
-                        <td style="width: 50%; text-align: center; vertical-align: middle; border-right: 1px solid #eee;">
-                            <div style="font-size: 28px; font-weight: 800; color: #01579b; line-height: 1.2; margin-bottom: 5px;">{s['days_present']}/{s['total_working_days']}</div>
-                            <div style="font-size: 13px; color: #666; display: block;">Ngày công thực tế</div>
-                        </td>
-                        <td style="width: 50%; text-align: center; vertical-align: middle;">
-                            <div style="font-size: 28px; font-weight: 800; color: #01579b; line-height: 1.2; margin-bottom: 5px;">{avg_checkin_str}</div>
-                            <div style="font-size: 13px; color: #666; display: block;">Check-in trung bình</div>
-                        </td>
-                    </tr>
-                </table>
-            </div>
-
-            <div style="margin-bottom: 15px;">
-                <div style="font-weight: 600; font-size: 14px; color: #444;">🎯 Xu hướng giờ giấc (Arrival Trend):</div>
-                <div style="font-size: 13px; color: #555; margin-top: 4px;">
-                    Bạn có xu hướng check-in lúc <strong>{avg_checkin_str}</strong>. {style_msg}
-                </div>
-                {habit_bar_html}
-            </div>
-
-            <div style="background-color: #fff; border: 1px solid #e0e0e0; padding: 10px; border-radius: 6px; font-size: 13px;">
-                <div style="font-weight: 600; color: #d32f2f; margin-bottom: 5px;">⚠️ Dữ liệu cần lưu ý:</div>
-                <ul style="margin: 0; padding-left: 20px; color: #333;">
-                    <li>Vắng không phép/Chưa giải trình: <strong>{s['days_missing']} ngày</strong></li>
-                    <li>Về sớm: <strong>{s['early_checkout_count']} lần</strong></li>
-                    <li>Tỷ lệ chuyên cần (Adjusted): <strong>{s['adjusted_attendance_rate']:.1f}%</strong></li>
-                </ul>
-            </div>
-        </div>
-        """
+        checkin_content_box = CHECKIN_BOX.render(
+            period=p, style_color=style_color, style_tag=style_tag, summary=s,
+            avg_checkin_str=avg_checkin_str, style_msg=style_msg,
+            p_early=p_early, p_std=p_std, p_late=p_late,
+            early_arrival=early_arrival, standard_arrival=standard_arrival, late_arrival=late_arrival,
+        )
     else:
-        checkin_content_box = """<div class="stats-box checkin-box"><p><em>Không có dữ liệu chấm công để phân tích.</em></p></div>"""
+        checkin_content_box = CHECKIN_EMPTY.render()
 
     # --- 4. Xử lý section INSIDE (NÂNG CẤP: COMMUNITY IMPACT & CULTURE) ---
     if inside_data:
@@ -690,85 +573,26 @@ def create_email_html(employee_name, checkin_data, wework_data, goal_data, insid
             impact_msg = "Chia sẻ kiến thức hoặc câu chuyện của bạn để tăng sức ảnh hưởng nhé."
 
         # 3. Tạo HTML danh sách bài viết (News Feed style)
-        posts_html = ""
         if latest_posts:
-            for post in latest_posts[:3]: # Chỉ lấy 3 bài
-                post_link = post.get('link', '#')
-                # Xác định icon dựa trên loại bài
-                p_icon = "📰" if post['type'] == 'news' else "📝"
-                
-                posts_html += f"""
-                <div style="padding: 10px; border-bottom: 1px dashed #e0e0e0; display: flex; align-items: flex-start;">
-                    <div style="font-size: 20px; margin-right: 10px;">{p_icon}</div>
-                    <div style="flex: 1;">
-                        <a href="{post_link}" style="font-weight: 600; color: #2c3e50; text-decoration: none; display: block; margin-bottom: 4px;">
-                            {post['title']}
-                        </a>
-                        <div style="font-size: 12px; color: #888; display: flex; justify-content: space-between;">
-                            <span>👤 {post['author']} • {post['date']}</span>
-                            <span>❤️ {post['reactions_count']} • 👁️ {post['views_count']}</span>
-                        </div>
-                    </div>
-                </div>
-                """
+            posts_html = ''.join(
+                FEED_ITEM.render(
+                    # Xác định icon dựa trên loại bài
+                    icon="📰" if post['type'] == 'news' else "📝",
+                    link=post.get('link', '#'),
+                    post=post,
+                )
+                for post in latest_posts[:3]  # Chỉ lấy 3 bài
+            )
         else:
-            posts_html = "<div style='padding:10px; font-style:italic; color:#999'>Chưa có bài viết mới nào.</div>"
-
-        inside_content_box = f"""
-        <div class="stats-box inside-box">
-            <div style="background-color: {archetype_bg}; padding: 12px; border-radius: 6px; margin-bottom: 15px;">
-                <div style="font-weight: 700; color: {archetype_color}; font-size: 15px; margin-bottom: 4px;">
-                    {archetype}
-                </div>
-                <div style="font-size: 13px; color: #555;">{archetype_desc}</div>
-            </div>
-
-            <div style="background-color: #fff; border-radius: 8px; padding: 15px; margin-bottom: 20px; box-shadow: 0 2px 5px rgba(0,0,0,0.05);">
-                <table style="width: 100%; border-collapse: collapse;">
-                    <tr>
-                        <td style="width: 50%; text-align: center; vertical-align: top; border-right: 1px solid #eee;">
-                             <div style="font-size: 11px; font-weight: 700; color: #6f42c1; text-transform: uppercase; margin-bottom: 5px; letter-spacing: 0.5px;">
-                                📡 Sức lan tỏa
-                            </div>
-                            <div style="font-size: 26px; font-weight: 800; color: #333; line-height: 1.2; margin-bottom: 4px;">{s['employee_views']}</div>
-                            <div style="font-size: 12px; color: #777; margin-bottom: 4px;">Lượt xem bài của bạn</div>
-                            <div style="font-size: 11px; color: #999;">
-                                (<span style="font-weight: 600; color: #6f42c1;">{s['employee_reactions']}</span> tim nhận được)
-                            </div>
-                        </td>
-                        <td style="width: 50%; text-align: center; vertical-align: top;">
-                            <div style="font-size: 11px; font-weight: 700; color: #e91e63; text-transform: uppercase; margin-bottom: 5px; letter-spacing: 0.5px;">
-                                🤝 Sự gắn kết
-                            </div>
-                            <div style="font-size: 26px; font-weight: 800; color: #333; line-height: 1.2; margin-bottom: 4px;">{s.get('employee_reactions_given', 0)}</div>
-                            <div style="font-size: 12px; color: #777; margin-bottom: 4px;">Lượt thả tim cho đồng nghiệp</div>
-                            <div style="font-size: 11px; color: #999;">
-                                (<span style="font-weight: 600; color: #e91e63;">{s.get('employee_views_given', 0)}</span> bài đã đọc)
-                            </div>
-                        </td>
-                    </tr>
-                </table>
-            </div>
-
-            <div style="font-size: 13px; color: #555; margin-bottom: 20px; padding: 8px; background-color: #f8f9fa; border-radius: 4px;">
-                💡 <strong>Insight:</strong> {impact_msg}
-            </div>
-
-            <div style="border-top: 1px solid #eee; padding-top: 15px;">
-                <div style="font-weight: 600; color: #444; margin-bottom: 10px; font-size: 14px;">
-                    🗞️ Tiêu điểm truyền thông nội bộ:
-                </div>
-                <div style="background: #fff; border: 1px solid #eee; border-radius: 6px;">
-                    {posts_html}
-                </div>
-                <div style="text-align: right; margin-top: 8px;">
-                    <a href="https://inside.base.vn" style="font-size: 12px; color: #004a99; text-decoration: none;">Xem thêm trên Inside →</a>
-                </div>
-            </div>
-        </div>
-        """
+            posts_html = FEED_EMPTY.render()
+
+        inside_content_box = INSIDE_BOX.render(
+            archetype=archetype, archetype_desc=archetype_desc, archetype_color=archetype_color,
+            archetype_bg=archetype_bg, summary=s, reactions_given=s.get('employee_reactions_given', 0),
+            views_given=s.get('employee_views_given', 0), impact_msg=impact_msg, posts_html=posts_html,
+        )
     else:
-        inside_content_box = """<div class="stats-box inside-box"><p><em>Không có dữ liệu Inside để phân tích.</em></p></div>"""
+        inside_content_box = INSIDE_EMPTY.render()
 
     # --- 5. Xử lý section WORKFLOW (GIỮ ĐẶC TRƯNG RIÊNG CỦA WORKFLOW) ---
     if workflow_data and workflow_data.get('summary'):
@@ -809,28 +633,22 @@ def create_email_html(employee_name, checkin_data, wework_data, goal_data, insid
         
         workflow_summary_html = ""
         if len(sorted_workflows) > 1:  # Chỉ hiển thị nếu có nhiều hơn 1 workflow
-            workflow_summary_html = '<div style="margin-top: 10px; padding: 8px; background-color: #fff3e0; border-radius: 4px; border-left: 3px solid #ff9800;">'
-            workflow_summary_html += '<strong>📊 Phân bố theo Quy trình:</strong><div style="font-size: 13px; margin-top: 4px;">'
-            for wf_name, stats in sorted_workflows[:3]:  # Top 3
-                workflow_summary_html += f"<div>• <strong>{wf_name}</strong>: {stats['total']} job ({stats['active']} đang xử lý)</div>"
-            workflow_summary_html += '</div></div>'
+            workflow_summary_html = WORKFLOW_SUMMARY.render(items=''.join(
+                WORKFLOW_SUMMARY_ITEM.render(name=wf_name, total=stats['total'], active=stats['active'])
+                for wf_name, stats in sorted_workflows[:3]  # Top 3
+            ))
         
         # 3. Tạo HTML cho Upcoming Deadlines (Vẫn hữu ích)
         upcoming_html = ""
         if upcoming_jobs:
-            upcoming_list_items = ""
+            upcoming_list_items = []
             for j in upcoming_jobs[:5]:
                 days = j.get('days_left', 0)
                 day_str = "Hôm nay" if days == 0 else f"{days} ngày nữa"
                 job_name = j.get('name') or j.get('title', 'No Name')
-                upcoming_list_items += f"<div>• <span style='color:#e65100; font-weight:600;'>{job_name}</span> ({day_str})</div>"
+                upcoming_list_items.append(UPCOMING_ITEM.render(name=job_name, day_str=day_str))
             
-            upcoming_html = f"""
-            <li style="margin-top: 10px; background-color: #fff3cd; padding: 8px; border-radius: 4px; border-left: 3px solid #ffc107;">
-                <strong>⚠️ Sắp đến hạn (7 ngày tới):</strong>
-                <div style="font-size: 13px; margin-top: 4px;">{upcoming_list_items}</div>
-            </li>
-            """
+            upcoming_html = UPCOMING_BOX.render(items=''.join(upcoming_list_items))
         
         # 4. Tạo AI Insight và AI Recommend cho WORKFLOW (thay thế jobs table)
         active_jobs = [job for job in latest_jobs if job.get('stage_metatype') not in ['done', 'failed']]
@@ -859,394 +677,56 @@ def create_email_html(employee_name, checkin_data, wework_data, goal_data, insid
         
         workflow_context = json.dumps(workflow_context_dict, ensure_ascii=False, indent=2)
 
-        # Gọi AI để tạo insight và recommend
-        ai_insight = generate_ai_insight(workflow_context, "Workflow - Quy trình công việc", "insight")
-        ai_recommend = generate_ai_insight(workflow_context, "Workflow - Quy trình công việc", "recommend")
-        
-        # Format và tạo HTML cho AI boxes
-        insight_text = format_ai_content_to_html(ai_insight) if ai_insight else "Đang phân tích dữ liệu..."
-        recommend_text = format_ai_content_to_html(ai_recommend) if ai_recommend else "Đang tạo khuyến nghị..."
+        # Gọi AI để tạo insight và recommend (chạy song song, kết quả được điền vào HTML ở cuối)
+        insight_text = pending_ai.request(workflow_context, "Workflow - Quy trình công việc", "insight", "Đang phân tích dữ liệu...")
+        recommend_text = pending_ai.request(workflow_context, "Workflow - Quy trình công việc", "recommend", "Đang tạo khuyến nghị...")
         
-        workflow_ai_html = '<div style="margin-top: 15px; border-top: 1px dashed #ffe0b2; padding-top: 10px;">'
+        workflow_ai_html = AI_BLOCK.render(variant=' ai-block-workflow', insight=insight_text, recommend=recommend_text)
         
-        # AI Insight Box
-        workflow_ai_html += '<div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); padding: 15px; border-radius: 8px; margin-bottom: 12px;">'
-        workflow_ai_html += '<div style="font-weight: 700; color: #fff; font-size: 14px; margin-bottom: 10px;">🤖 AI Insight:</div>'
-        workflow_ai_html += f'<div style="color: #fff; font-size: 13px; line-height: 1.6;">{insight_text}</div>'
-        workflow_ai_html += '</div>'
-        
-        # AI Recommend Box
-        workflow_ai_html += '<div style="background: linear-gradient(135deg, #11998e 0%, #38ef7d 100%); padding: 15px; border-radius: 8px;">'
-        workflow_ai_html += '<div style="font-weight: 700; color: #fff; font-size: 14px; margin-bottom: 8px;">💡 AI Recommend:</div>'
-        workflow_ai_html += f'<div style="color: #fff; font-size: 13px; line-height: 1.6;">{recommend_text}</div>'
-        workflow_ai_html += '</div>'
-        
-        workflow_ai_html += '</div>'
-        
-        workflow_content_box = f"""
-        <div class="stats-box workflow-box">
-            <div class="sub-header">⚙️ Vận hành & Quy trình (1 tháng gần nhất):</div>
-            <ul class="stat-list">
-                <li>📋 Tổng quan: <strong>{s['total_jobs']} job</strong> (Done: {s['completion_rate']:.1f}%)</li>
-                <li>🏁 Đang xử lý: <strong>{s['doing_jobs']} job</strong> | Hoàn thành muộn: <strong>{completed_late} job</strong></li>
-                <li>⚠️ Không Deadline: <strong>{no_deadline} job</strong></li>
-                {upcoming_html}
-            </ul>
-            {workflow_summary_html}
-            {workflow_ai_html}
-
-        </div>
-        """
+        workflow_content_box = WORKFLOW_BOX.render(
+            summary=s, completed_late=completed_late, no_deadline=no_deadline,
+            upcoming_html=upcoming_html, summary_html=workflow_summary_html, ai_html=workflow_ai_html,
+        )
     else:
-        workflow_content_box = """<div class="stats-box workflow-box"><p><em>Không có dữ liệu quy trình xử lý.</em></p></div>"""
-    # --- HTML TEMPLATE CHÍNH (VỚI CSS ĐƯỢC NÂNG CẤP) ---
-    # *** ĐÂY LÀ PHẦN THAY ĐỔI LỚN NHẤT ***
-    html_template = f"""
-<html>
-<head>
-<meta charset="UTF-8">
-<meta name="viewport" content="width=device-width, initial-scale=1.0">
-<style>
-    /* RESET & CORE */
-    body {{
-        font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Helvetica, Arial, sans-serif;
-        line-height: 1.6;
-        color: #212529;
-        background-color: #f4f6f8;
-        margin: 0;
-        padding: 0;
-        -webkit-text-size-adjust: 100%;
-        -ms-text-size-adjust: 100%;
-    }}
-    
-    .email-container {{
-        max-width: 740px; /* Rộng hơn cho PC thoáng (cũ 680px) */
-        margin: 40px auto; /* Cách xa cạnh trên dưới hơn */
-        background-color: #ffffff;
-        padding: 45px; /* Padding rộng rãi hơn */
-        border-radius: 16px; /* Bo góc mềm mại hơn */
-        box-shadow: 0 8px 30px rgba(0,0,0,0.08); /* Shadow sâu và sang hơn */
-        border: 1px solid #eaeaea;
-    }}
-
-    /* RESPONSIVE MOBILE STRATEGIES - Giữ nguyên logic này */
-    @media only screen and (max-width: 600px) {{
-        body {{
-            padding: 0 !important;
-            background-color: #ffffff !important; /* Mobile full trắng cho sạch */
-        }}
-        .email-container {{
-            padding: 20px 15px !important;
-            margin: 0 !important;
-            width: 100% !important;
-            box-shadow: none !important;
-            border-radius: 0 !important;
-            border: none !important;
-            max-width: 100% !important;
-        }}
-        .main-header {{
-            font-size: 24px !important;
-            margin-top: 10px !important;
-        }}
-        .section-title {{
-            font-size: 19px !important;
-        }}
-        .intro-text {{
-            font-size: 14px !important;
-        }}
-    }}
-    
-    /* HEADER */
-    .main-header {{
-        font-size: 30px; /* To hơn trên PC */
-        font-weight: 800; /* Đậm hơn */
-        color: #004a99;
-        margin-bottom: 25px;
-        border-bottom: 3px solid #004a99; /* Dày hơn chút */
-        padding-bottom: 18px;
-        letter-spacing: -0.5px;
-    }}
-    .greeting {{
-        font-weight: 600;
-        color: #2c3e50;
-        font-size: 16px;
-        margin-bottom: 15px;
-    }}
-    .intro-text {{
-        color: #495057;
-        margin-bottom: 20px;
-        font-size: 15px;
-    }}
-    .intro-text em {{
-        font-style: italic;
-        color: #004a99;
-    }}
-    .intro-text ul {{
-        padding-left: 25px;
-    }}
-    .report-date {{
-        font-style: italic;
-        color: #6c757d;
-        font-size: 13px;
-        margin-bottom: 30px;
-    }}
-
-    /* SECTIONS GENERAL */
-    .section {{
-        margin-bottom: 35px;
-    }}
-    .section-title {{
-        font-size: 20px;
-        font-weight: 700; /* Đậm */
-        margin-bottom: 10px;
-        color: #212529; /* Màu chữ chính, không dùng màu */
-        
-        /* Thay đổi: Dùng border-left để tạo màu nhấn */
-        padding-left: 12px;
-        border-left: 4px solid #ccc; /* Màu mặc định */
-    }}
-    .section-desc {{
-        font-style: italic;
-        font-weight: 500;
-        margin-bottom: 15px;
-        color: #555; /* Bỏ màu, dùng màu xám chung */
-        font-size: 15px;
-    }}
-    
-    /* Cập nhật các class màu nhấn cho border */
-    .goal-title {{ border-left-color: #ffc107; }}
-    .wework-title {{ border-left-color: #20c997; }}
-    .checkin-title {{ border-left-color: #17a2b8; }}
-    .inside-title {{ border-left-color: #6f42c1; }}
-    .workflow-title {{ border-left-color: #fd7e14; }}
-
-    /* STATS BOXES (Cải tiến thành dạng "Card") */
-    .stats-box {{
-        background-color: #ffffff; /* Nền trắng */
-        border: 1px solid #e9ecef; /* Viền xám mỏng, tinh tế */
-        padding: 20px; /* Tăng padding */
-        border-radius: 8px; /* Bo góc rõ hơn */
-        margin-top: 10px;
-    }}
-    
-    /* Box trạng thái Cảnh báo (Warning) */
-    .warning-box {{
-        background-color: #fff3f3; /* Đỏ rất nhạt */
-        border: 1px solid #f5c6cb;
-        color: #721c24;
-        border-left: 4px solid #dc3545; /* Viền trái đỏ đậm */
-    }}
-    
-    /* Box trạng thái Thành công (Success) - cho Goal */
-    .success-box {{
-        background-color: #e6f7ec; /* Xanh lá rất nhạt */
-        border: 1px solid #c3e6cb;
-        color: #155724;
-        border-left: 4px solid #28a745; /* Viền trái xanh đậm */
-    }}
-    
-    /* Box màu cho WeWork - Xanh ngọc bích */
-    .wework-box {{
-        background-color: #e0f2f1; /* Xanh ngọc bích rất nhạt */
-        border: 1px solid #80cbc4;
-        color: #004d40;
-        border-left: 4px solid #20c997; /* Viền trái xanh ngọc đậm */
-    }}
-    
-    /* Box màu cho Checkin - Xanh dương */
-    .checkin-box {{
-        background-color: #e0f7fa; /* Xanh dương rất nhạt */
-        border: 1px solid #b3e5fc;
-        color: #01579b;
-        border-left: 4px solid #17a2b8; /* Viền trái xanh dương đậm */
-    }}
-    
-    /* Box màu cho Inside - Tím */
-    .inside-box {{
-        background-color: #f3e5f5; /* Tím rất nhạt */
-        border: 1px solid #e1bee7;
-        color: #4a148c;
-        border-left: 4px solid #6f42c1; /* Viền trái tím đậm */
-    }}
-    
-    /* Box màu cho Workflow - Cam */
-    .workflow-box {{
-        background-color: #fff3e0; /* Cam rất nhạt */
-        border: 1px solid #ffe0b2;
-        color: #e65100;
-        border-left: 4px solid #fd7e14; /* Viền trái cam đậm */
-    }}
-    
-    .sub-header {{
-        font-weight: 600; /* Semi-bold */
-        margin-bottom: 15px;
-        font-size: 16px;
-    }}
-    .stat-list {{
-        list-style-type: none;
-        padding-left: 5px;
-        margin: 0;
-    }}
-    .stat-list li {{
-        margin-bottom: 10px; /* Tăng khoảng cách */
-        font-size: 15px;
-    }}
-    /* Nhấn mạnh con số bằng màu xanh */
-    .stat-list li strong {{
-        color: #004a99;
-        font-weight: 600;
-    }}
-    
-    /* Màu chữ cho các box có màu nền */
-    .success-box .stat-list li strong {{
-        color: #155724; /* Xanh lá đậm */
-    }}
-    
-    .wework-box .stat-list li strong {{
-        color: #004d40; /* Xanh ngọc bích đậm */
-    }}
-    
-    .checkin-box .stat-list li strong {{
-        color: #01579b; /* Xanh dương đậm */
-    }}
-    
-    .inside-box .stat-list li strong {{
-        color: #4a148c; /* Tím đậm */
-    }}
-    
-    .workflow-box .stat-list li strong {{
-        color: #e65100; /* Cam đậm */
-    }}
-    
-    .evaluation-section {{
-        margin-top: 15px;
-        font-size: 15px;
-        background-color: #f8f9fa;
-        padding: 12px 15px;
-        border-radius: 6px;
-    }}
-    
-    /* INSIDE POSTS SECTION */
-    .latest-posts-section {{
-        margin-top: 15px;
-    }}
-    .post-item {{
-        background-color: #f8f9fa;
-        border-left: 3px solid #6f42c1;
-        padding: 15px;
-        margin-bottom: 12px;
-        border-radius: 6px;
-    }}
-    .post-title {{
-        font-weight: 600;
-        font-size: 15px;
-        color: #212529;
-        margin-bottom: 8px;
-    }}
-    .post-meta {{
-        font-size: 13px;
-        color: #6c757d;
-        margin-bottom: 8px;
-    }}
-    .post-preview {{
-        font-size: 14px;
-        color: #495057;
-        line-height: 1.5;
-    }}
-    .post-link {{
-        margin-top: 10px;
-        padding-top: 10px;
-        border-top: 1px solid #dee2e6;
-    }}
-    .post-link a:hover {{
-        text-decoration: underline !important;
-    }}
-
-    /* FOOTER MESSAGE (Tinh chỉnh lại) */
-    .footer-message {{
-        background-color: #eef6f8; /* Xanh dương nhạt hơn 1 chút */
-        padding: 25px;
-        border-radius: 8px;
-        margin-top: 40px;
-        border-left: 5px solid #17a2b8; /* Giữ nguyên viền trái */
-    }}
-    .footer-title {{
-        font-weight: 700;
-        color: #17a2b8; /* Dùng màu xanh của viền */
-        margin-bottom: 10px;
-        text-transform: uppercase;
-        font-size: 16px;
-    }}
-    .footer-message p {{
-        margin-bottom: 10px;
-        color: #34495e;
-    }}
-</style>
-</head>
-<body>
-    <div class="email-container">
-        <div class="main-header">
-            📊 BÁO CÁO TỔNG HỢP BASE.VN
-        </div>
-        <div class="greeting">
-            Thân gửi Anh/Chị: {employee_name}
-        </div>
-        <div class="intro-text">
-            <p>Tại APLUS, chúng ta tin rằng <em>"hiệu suất không chỉ là kết quả – mà là cách mỗi người hiện diện và cam kết trong hành động."</em></p>
-            <p>Khác với nhiều môi trường khác, tại A Plus, chúng ta đang làm việc trên <strong>không gian số</strong> – nơi mọi hành động đều có thể đo lường, minh bạch và kế thừa.</p>
-            <p>Ở đây, mỗi nhân sự được tạo điều kiện tối đa để thể hiện năng lực, tự chủ và sáng tạo – không giới hạn bởi giấy tờ, thủ tục hay "phòng ban".</p>
-            <p><strong>Base không chỉ là hệ thống vận hành – mà là "tấm gương số" phản chiếu cách mỗi người chúng ta làm việc, tư duy và tương tác mỗi ngày.</strong></p>
-            <p>70–90% công việc của bạn đang diễn ra trên đó – từng thao tác, phản hồi, cam kết, và kết quả đều đang nói thay bạn.</p>
-            <p>Và chính vì Base phản ánh 70–90% công việc, nên nó cũng phản ánh <strong>70–90% con người bạn trong A Plus.</strong></p>
-            <p>💡 <em>Cách bạn cập nhật task, giữ deadline, phản hồi đồng đội, xử lý vấn đề – tất cả đều là một phần của "dấu vân tay chuyên nghiệp" mà bạn đang để lại trong hệ thống.</em></p>
-        </div>
-        <div class="report-date">
-            Ngày tạo báo cáo: {current_time_str}
-        </div>
-
-        {f'''<div class="section">
-            <div class="section-title wework-title">🧭 BASE WEWORK – QUẢN LÝ CÔNG VIỆC</div>
-            <div class="section-desc">Không gian làm việc số – nơi toàn bộ công việc, dự án, và kết quả của bạn được ghi nhận và kết nối liền mạch với đội nhóm.</div>
-            {wework_content_box}
-        </div>''' if wework_data else ''}
-
-        {f'''<div class="section">
-            <div class="section-title goal-title">🥇 BASE GOAL – TIẾN ĐỘ OKR</div>
-            <div class="section-desc">OKR là kim chỉ nam giúp mỗi cá nhân kết nối mục tiêu của mình với tầm nhìn chung của APLUS.</div>
-            {goal_content_box}
-        </div>''' if goal_data else ''}
-
-        {f'''<div class="section">
-            <div class="section-title workflow-title">⚙️ BASE WORKFLOW – QUY TRÌNH & CÔNG VIỆC</div>
-            <div class="section-desc">Hệ thống quản lý quy trình và công việc – nơi các công việc được theo dõi, quản lý và hoàn thành một cách có hệ thống.</div>
-            {workflow_content_box}
-        </div>''' if workflow_data else ''}
-
-        {f'''<div class="section">
-            <div class="section-title checkin-title">⏰ BASE CHECKIN – CHẤM CÔNG & CHUYÊN CẦN</div>
-            <div class="section-desc">Ghi nhận sự hiện diện của bạn – không chỉ về mặt thời gian, mà còn thể hiện tính kỷ luật, sự tôn trọng và cam kết khi làm việc cùng đội ngũ.</div>
-            {checkin_content_box}
-        </div>''' if checkin_data and employee_name != "Hoang Tran" else ''}
-
-        <div class="section">
-            <div class="section-title inside-title">💬 BASE INSIDE – CỘNG ĐỒNG & TƯƠNG TÁC</div>
-            <div class="section-desc">Không gian chia sẻ và kết nối – nơi mỗi thành viên thể hiện sự tham gia tích cực, chia sẻ ý tưởng và xây dựng văn hóa công ty.</div>
-            {inside_content_box}
-        </div>
-
-        <div class="footer-message">
-            <div class="footer-title">💬 THÔNG ĐIỆP TỪ APLUS</div>
-            <p>Cảm ơn bạn vì đã <strong>hiện diện trọn vẹn</strong> – không chỉ trong thời gian làm việc, mà trong tinh thần, thái độ và cam kết mà bạn mang đến mỗi ngày.</p>
-            <p>Chúng ta đang làm việc trong một bối cảnh hoàn toàn mới – nơi <strong>"văn phòng" không còn là bốn bức tường, mà là một không gian số tốc độ cao</strong>, nơi mọi thứ vận hành như chiếc máy bay đang cất cánh.</p>
-            <p>Và trong hành trình đó, A Plus đang đồng hành cùng bạn – để bạn <strong>làm quen, thích nghi và dẫn dắt</strong> với tư duy số, công cụ số và năng lực số.</p>
-            <p><strong>Không ai bị bỏ lại phía sau</strong> – mỗi bước bạn thành thạo thêm một công cụ, là cả tập thể tiến gần hơn đến tầm nhìn "Digital – Smart – A Plus 2028."</p>
-            <p>Hãy tiếp tục duy trì tinh thần cam kết và Integrity – vì chính bạn là một phần trong hành trình đưa APLUS trở thành <strong>minh chứng cho một công ty Việt Nam có Integrity hiện diện. </strong>💪</p>
-        </div>
-    </div>
-</body>
-</html>
-    """
-    return html_template
+        workflow_content_box = WORKFLOW_EMPTY.render()
+
+    # --- HTML TEMPLATE CHÍNH (template + CSS biên dịch sẵn trong email_templates) ---
+    sections = []
+    if wework_data:
+        sections.append(SECTION.render(
+            title_class='wework-title', title='🧭 BASE WEWORK – QUẢN LÝ CÔNG VIỆC',
+            desc='Không gian làm việc số – nơi toàn bộ công việc, dự án, và kết quả của bạn được ghi nhận và kết nối liền mạch với đội nhóm.',
+            content=wework_content_box,
+        ))
+    if goal_data:
+        sections.append(SECTION.render(
+            title_class='goal-title', title='🥇 BASE GOAL – TIẾN ĐỘ OKR',
+            desc='OKR là kim chỉ nam giúp mỗi cá nhân kết nối mục tiêu của mình với tầm nhìn chung của APLUS.',
+            content=goal_content_box,
+        ))
+    if workflow_data:
+        sections.append(SECTION.render(
+            title_class='workflow-title', title='⚙️ BASE WORKFLOW – QUY TRÌNH & CÔNG VIỆC',
+            desc='Hệ thống quản lý quy trình và công việc – nơi các công việc được theo dõi, quản lý và hoàn thành một cách có hệ thống.',
+            content=workflow_content_box,
+        ))
+    if checkin_data and employee_name != "Hoang Tran":
+        sections.append(SECTION.render(
+            title_class='checkin-title', title='⏰ BASE CHECKIN – CHẤM CÔNG & CHUYÊN CẦN',
+            desc='Ghi nhận sự hiện diện của bạn – không chỉ về mặt thời gian, mà còn thể hiện tính kỷ luật, sự tôn trọng và cam kết khi làm việc cùng đội ngũ.',
+            content=checkin_content_box,
+        ))
+    sections.append(SECTION.render(
+        title_class='inside-title', title='💬 BASE INSIDE – CỘNG ĐỒNG & TƯƠNG TÁC',
+        desc='Không gian chia sẻ và kết nối – nơi mỗi thành viên thể hiện sự tham gia tích cực, chia sẻ ý tưởng và xây dựng văn hóa công ty.',
+        content=inside_content_box,
+    ))
+
+    html_template = REPORT_PAGE.render(
+        css=REPORT_CSS, employee_name=employee_name, current_time_str=current_time_str,
+        sections='\n'.join(sections),
+    )
+    return pending_ai.fill(html_template)
 
 
 def normalize_search_name(name):
@@ -1280,38 +760,18 @@ def get_employee_info_from_api(target_name):
         # Nếu không tìm thấy, thử tìm từ Account API (tất cả users)
         print(f"⚠️ Không tìm thấy nhân viên trong WeWork group, đang tìm trong Account API...")
         
-        # Tải user mapping nếu chưa có
-        if not user_id_to_name_map:
-            load_user_mapping()
-        
-        # Tìm trong Account API
-        url = "https://account.base.vn/extapi/v1/users"
-        payload = get_account_auth_data()
-        headers = {}
-        
-        response = requests.post(url, headers=headers, data=payload, timeout=30)
-        
-        if response.status_code == 200:
-            response_json = response.json()
-            
-            user_list = []
-            if isinstance(response_json, list):
-                user_list = response_json
-            elif isinstance(response_json, dict):
-                user_list = response_json.get('users', [])
-            
-            # Tìm nhân viên theo tên
-            for user in user_list:
-                if normalize_search_name(user.get('name', '')) == target_normalized:
-                    # Chuyển đổi format để tương thích với WeWork format
-                    return {
-                        'id': str(user.get('id', '')),
-                        'name': user.get('name', ''),
-                        'username': user.get('username', ''),
-                        'job': user.get('title', ''),
-                        'email': user.get('email', ''),
-                        'since': user.get('since', '')
-                    }
+        # Tìm trong danh bạ Account dùng chung (index theo tên)
+        user = get_directory().by_name(target_name)
+        if user:
+            # Chuyển đổi format để tương thích với WeWork format
+            return {
+                'id': str(user.get('id', '')),
+                'name': user.get('name', ''),
+                'username': user.get('username', ''),
+                'job': user.get('title', ''),
+                'email': user.get('email', ''),
+                'since': user.get('since', '')
+            }
         
         print(f"⚠️ Không tìm thấy nhân viên: {target_name}")
         return None
@@ -1319,27 +779,208 @@ def get_employee_info_from_api(target_name):
         print(f"❌ Lỗi khi lấy thông tin nhân viên: {e}")
         return None
 
+_mailer = None
+_mailer_lock = threading.Lock()
+
+def get_mailer():
+    """Hàng đợi gửi email dùng chung (giữ kết nối SMTP đã đăng nhập giữa các email)"""
+    global _mailer
+    if _mailer is None:
+        with _mailer_lock:
+            if _mailer is None:
+                _mailer = MailDispatcher(default_backend(EMAIL_GUI, MAT_KHAU))
+    return _mailer
+
+def close_mailer():
+    """Gửi nốt email còn trong hàng đợi và đóng kết nối SMTP"""
+    global _mailer
+    with _mailer_lock:
+        mailer, _mailer = _mailer, None
+    if mailer is not None:
+        mailer.close()
+    return mailer
+
+def build_email_message(to_email, subject, html_content):
+    """Email HTML gửi từ EMAIL_GUI"""
+    msg = MIMEMultipart('alternative')
+    msg['From'] = EMAIL_GUI
+    msg['To'] = to_email
+    msg['Subject'] = subject
+    part_html = MIMEText(html_content, 'html', 'utf-8')
+    msg.attach(part_html)
+    return msg
+
 def send_email(to_email, subject, html_content):
     """Gửi email"""
     try:
-        msg = MIMEMultipart('alternative')
-        msg['From'] = EMAIL_GUI
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        part_html = MIMEText(html_content, 'html', 'utf-8')
-        msg.attach(part_html)
-        
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.starttls()
-        server.login(EMAIL_GUI, MAT_KHAU)
-        server.send_message(msg)
-        server.quit()
+        msg = build_email_message(to_email, subject, html_content)
+        result = get_mailer().send(msg)
+        if not result.ok:
+            print(f"❌ Lỗi khi gửi email: {result.error}")
+            return False
         print(f"✅ Email đã được gửi thành công đến {to_email}")
         return True
     except Exception as e:
         print(f"❌ Lỗi khi gửi email: {str(e)}")
         return False
 
+# ============================================================================
+# CÁC GIAI ĐOẠN XỬ LÝ MỘT NHÂN VIÊN (report_pipeline)
+# ============================================================================
+def employee_key(row):
+    """Khóa của nhân viên trong run journal"""
+    return str(row.get('username') or row.get('email') or row.get('name'))
+
+def has_valid_email(row):
+    employee_email = row.get('email')
+    return bool(employee_email) and '@' in str(employee_email)
+
+def analyze_employee(row, snapshot, one_month_ago, journal=None):
+    """Giai đoạn 1: lấy + phân tích dữ liệu của nhân viên từ snapshot (None nếu bỏ qua)
+
+    Có journal: dùng lại HTML / dữ liệu đã có từ lần chạy trước thay vì phân tích lại.
+    """
+    employee_name = row['name']
+    employee_username = row['username']
+    employee_email = row['email']
+    
+    # Bỏ qua nếu không có email
+    if not has_valid_email(row):
+        print(f"\\n⚠️ Bỏ qua {employee_name} ({employee_username}): Không có email hợp lệ.")
+        return None
+
+    print(f"\\n-----------------------------------------------------------")
+    print(f"🔄 Đang xử lý: {employee_name} ({employee_email})")
+
+    key = employee_key(row)
+    if journal is not None:
+        html_content = journal.load(key, 'render')
+        if html_content is not None:
+            print(f"⏭️ {employee_name}: Dùng lại email đã dựng ở lần chạy trước.")
+            return {'employee_key': key, 'employee_name': employee_name,
+                    'employee_email': employee_email, 'html_content': html_content}
+        report = journal.load(key, 'analyze')
+        if report is not None:
+            print(f"⏭️ {employee_name}: Dùng lại dữ liệu đã phân tích ở lần chạy trước.")
+            return report
+
+    # --- NEW: Fetch server logic data (app_v2_logic) ---
+    server_data = None
+    try:
+        server_data = snapshot.get_review_user_work_plus_data(employee_name)
+    except Exception as e:
+        print(f"  > ⚠️ Lỗi khi lấy server data: {e}")
+    # ---------------------------------------------------
+    
+    # Lấy dữ liệu
+    join_date = row.get('since', '')
+    checkin_data = snapshot.get_checkin_data(employee_name, join_date=join_date)
+    wework_data = snapshot.get_wework_data(employee_username)
+    goal_data = snapshot.get_goal_data(employee_name)
+    inside_data = snapshot.get_inside_data(employee_name)
+    workflow_data = snapshot.get_workflow_data(employee_name)
+    
+    # Kiểm tra dữ liệu gần đây
+    one_month_ago_ts = one_month_ago.timestamp()
+    has_recent_wework = False
+    if wework_data and wework_data.get('recent_tasks'):
+        for task in wework_data['recent_tasks']:
+            since_ts = task.get('since', 0)
+            if since_ts and float(since_ts) >= one_month_ago_ts:
+                has_recent_wework = True
+                break
+    
+    has_recent_workflow = False
+    if workflow_data and workflow_data.get('latest_jobs'):
+        for job in workflow_data['latest_jobs']:
+            date_str = job.get('date', '')
+            if date_str and date_str != 'N/A':
+                try:
+                    job_date = datetime.strptime(date_str, '%d/%m/%Y %H:%M:%S')
+                    if job_date >= one_month_ago:
+                        has_recent_workflow = True
+                        break
+                except:
+                    pass
+    
+    has_recent_goal = bool(goal_data and goal_data.get('weekly'))
+    active_sections_count = sum([has_recent_wework, has_recent_workflow, has_recent_goal])
+    
+    if active_sections_count == 0:
+        print(f"⚠️ {employee_name}: Không có dữ liệu gần đây. Vẫn gửi email cảnh báo.")
+        wework_data = {
+            'summary': {'total_tasks': 0},
+            'is_warning_only': True
+        }
+        goal_data = None
+        workflow_data = None
+    else:
+        if not has_recent_wework: wework_data = None
+        if not has_recent_workflow: workflow_data = None
+        if not has_recent_goal: goal_data = None
+
+    report = {
+        'employee_key': key,
+        'employee_name': employee_name,
+        'employee_email': employee_email,
+        'checkin_data': checkin_data,
+        'wework_data': wework_data,
+        'goal_data': goal_data,
+        'inside_data': inside_data,
+        'workflow_data': workflow_data,
+        'server_data': server_data,
+    }
+    if journal is not None:
+        journal.record(key, 'analyze', report)
+    return report
+
+def email_subject(employee_name):
+    return f"BÁO CÁO TỔNG HỢP BASE.VN - {employee_name}"
+
+def render_employee_report(report, journal=None, outbox=None, render_dir=None):
+    """Giai đoạn 2: AI insight + dựng HTML email (bỏ qua nếu đã có HTML từ journal)
+
+    Có outbox: đưa email vào outbox để OutboxSender gửi. Có render_dir (--render-only):
+    chỉ ghi HTML ra file, không gửi.
+    """
+    if report.get('html_content') is None:
+        report['html_content'] = create_email_html(
+            report['employee_name'], report['checkin_data'], report['wework_data'], report['goal_data'],
+            report['inside_data'], report['workflow_data'], report['server_data']
+        )
+    if render_dir is not None:
+        file_name = re.sub(r'[^\w.@-]+', '_', report['employee_key']) + '.html'
+        with open(os.path.join(render_dir, file_name), 'w', encoding='utf-8') as f:
+            f.write(report['html_content'])
+        print(f"📝 Đã ghi báo cáo của {report['employee_name']} vào {file_name}")
+    elif outbox is not None:
+        run_id = journal.run_id if journal is not None else default_run_id()
+        outbox.put(run_id, report['employee_key'], report['employee_email'],
+                   email_subject(report['employee_name']), report['html_content'])
+        if journal is not None:
+            # HTML đã nằm trong outbox, journal chỉ cần ghi nhận giai đoạn
+            journal.record(report['employee_key'], 'render')
+    elif journal is not None:
+        journal.record(report['employee_key'], 'render', report['html_content'])
+    return report
+
+def deliver_outbox_message(message):
+    """Gửi một email từ outbox (raise khi lỗi để outbox thử lại sau)"""
+    print(f"📤 Đang gửi email đến {message.to_email}...")
+    result = get_mailer().send(build_email_message(message.to_email, message.subject, message.html))
+    if not result.ok:
+        raise RuntimeError(result.error)
+    print(f"✅ Gửi thành công cho {message.to_email}")
+
+def render_only_dir():
+    """Thư mục của chế độ --render-only[=DIR] (chỉ dựng HTML, không gửi); None nếu không bật"""
+    for arg in sys.argv[1:]:
+        if arg == '--render-only':
+            return 'rendered_reports'
+        if arg.startswith('--render-only='):
+            return arg.split('=', 1)[1]
+    return None
+
 def main():
     print("="*80)
     print("📧 HỆ THỐNG GỬI EMAIL BÁO CÁO TỔNG HỢP BASE.VN CHO TOÀN BỘ NHÂN VIÊN")
@@ -1371,103 +1012,95 @@ def main():
     month_to_check = now.month
     
     one_month_ago = now - timedelta(days=30)
-    one_month_ago_ts = one_month_ago.timestamp()
     
-    success_count = 0
-    fail_count = 0
-    
-
-
-    for index, row in members_df.iterrows():
-        try:
-            employee_name = row['name']
-            employee_username = row['username']
-            employee_email = row['email']
-            
-            # Bỏ qua nếu không có email
-            if not employee_email or '@' not in str(employee_email):
-                print(f"\\n⚠️ Bỏ qua {employee_name} ({employee_username}): Không có email hợp lệ.")
+    # Chế độ --render-only: chỉ dựng HTML ra thư mục để kiểm tra, không gửi email
+    render_dir = render_only_dir()
+    if render_dir is not None:
+        os.makedirs(render_dir, exist_ok=True)
+        print(f"📝 Chế độ --render-only: ghi HTML vào '{render_dir}', không gửi email.")
+
+    # Run journal: bỏ qua nhân viên đã gửi, tiếp tục đúng giai đoạn còn dở của lần chạy trước.
+    # --render-only không đọc / ghi journal: dữ liệu của lượt kiểm tra không bị lượt gửi thật
+    # cùng run-id dùng lại
+    journal = RunJournal(enabled=render_dir is None)
+    outbox = Outbox() if render_dir is None else None
+    if outbox is not None:
+        requeued = outbox.requeue(journal.run_id)
+        if requeued:
+            print(f"🔁 {requeued} email chưa gửi được ở lần chạy trước được đưa lại vào hàng đợi.")
+    pending_rows = []
+    already_sent = 0
+    queued = 0
+    needs_data = False
+    for row in members_df.to_dict('records'):
+        key = employee_key(row)
+        completed_stages = journal.completed_stages(key)
+        if outbox is not None:
+            outbox_status = outbox.status(journal.run_id, key)
+            if 'send' in completed_stages or outbox_status == 'sent':
+                already_sent += 1
                 continue
-            
-
-
-            print(f"\\n-----------------------------------------------------------")
-            print(f"🔄 Đang xử lý: {employee_name} ({employee_email})")
-
-            # --- NEW: Fetch server logic data (app_v2_logic) ---
-            server_data = None
-            try:
-                # print("  > Fetching server logic data...")
-                server_data = app_v2_logic.get_review_user_work_plus_data(employee_name)
-            except Exception as e:
-                print(f"  > ⚠️ Lỗi khi lấy server data: {e}")
-            # ---------------------------------------------------
-            
-            # Lấy dữ liệu
-            join_date = row.get('since', '')
-            checkin_data = get_checkin_data(employee_name, year_to_check, month_to_check, join_date=join_date)
-            wework_data = get_wework_data(employee_username)
-            goal_data = get_goal_data(employee_name)
-            inside_data = get_inside_data(employee_name)
-            workflow_data = get_workflow_data(employee_name)
-            
-            # Kiểm tra dữ liệu gần đây
-            has_recent_wework = False
-            if wework_data and wework_data.get('recent_tasks'):
-                for task in wework_data['recent_tasks']:
-                    since_ts = task.get('since', 0)
-                    if since_ts and float(since_ts) >= one_month_ago_ts:
-                        has_recent_wework = True
-                        break
-            
-            has_recent_workflow = False
-            if workflow_data and workflow_data.get('latest_jobs'):
-                for job in workflow_data['latest_jobs']:
-                    date_str = job.get('date', '')
-                    if date_str and date_str != 'N/A':
-                        try:
-                            job_date = datetime.strptime(date_str, '%d/%m/%Y %H:%M:%S')
-                            if job_date >= one_month_ago:
-                                has_recent_workflow = True
-                                break
-                        except:
-                            pass
-            
-            has_recent_goal = bool(goal_data and goal_data.get('weekly'))
-            active_sections_count = sum([has_recent_wework, has_recent_workflow, has_recent_goal])
-            
-            if active_sections_count == 0:
-                print(f"⚠️ {employee_name}: Không có dữ liệu gần đây. Vẫn gửi email cảnh báo.")
-                wework_data = {
-                    'summary': {'total_tasks': 0},
-                    'is_warning_only': True
-                }
-                goal_data = None
-                workflow_data = None
-            else:
-                if not has_recent_wework: wework_data = None
-                if not has_recent_workflow: workflow_data = None
-                if not has_recent_goal: goal_data = None
-
-            # Tạo nội dung email
-            html_content = create_email_html(employee_name, checkin_data, wework_data, goal_data, inside_data, workflow_data, server_data)
-            
-            # Gửi email
-            print(f"📤 Đang gửi email đến {employee_email}...")
-            send_email(employee_email, f"BÁO CÁO TỔNG HỢP BASE.VN - {employee_name}", html_content)
-            # send_email("tts122403@gmail.com", f"BÁO CÁO TỔNG HỢP BASE.VN - {employee_name} (Test Send)", html_content) # Uncomment to test
-            
-            print(f"✅ Gửi thành công cho {employee_name}")
-            success_count += 1
-            
-        except Exception as e:
-            print(f"❌ Lỗi xử lý nhân viên {row.get('name', 'Unknown')}: {e}")
-            traceback.print_exc()
-            fail_count += 1
+            if outbox_status == 'pending':
+                # Email đã dựng, nằm trong outbox: chỉ còn gửi
+                queued += 1
+                continue
+        pending_rows.append(row)
+        if has_valid_email(row) and not completed_stages & {'analyze', 'render'}:
+            needs_data = True
+    if already_sent:
+        print(f"⏭️ Lượt chạy '{journal.run_id}': {already_sent} nhân viên đã được gửi trước đó, bỏ qua.")
+    if queued:
+        print(f"📬 {queued} email đã dựng ở lần chạy trước đang chờ gửi trong outbox.")
+
+    # Dữ liệu toàn công ty: tải 1 lần, dùng chung cho mọi nhân viên (chỉ khi còn nhân viên cần phân tích)
+    snapshot = BaseSnapshot(year_to_check, month_to_check, members_df=members_df)
+    if needs_data:
+        snapshot.preload()
+
+    # Bộ gửi chạy song song với pipeline, lấy email từ outbox (gửi lỗi thì thử lại, không dựng lại)
+    sender = None
+    if outbox is not None:
+        sender = OutboxSender(outbox, journal.run_id, deliver_outbox_message, workers=stage_workers('send', 2),
+                              on_sent=lambda message: journal.record(message.employee, 'send')).start()
+
+    def render(report):
+        report = render_employee_report(report, journal, outbox, render_dir)
+        if sender is not None:
+            sender.notify()
+        return report
+
+    # Pipeline: phân tích -> AI insight + HTML -> outbox, mỗi giai đoạn một pool worker
+    stages = [
+        Stage('analyze', lambda row: analyze_employee(row, snapshot, one_month_ago, journal),
+              stage_workers('analyze', 4)),
+        Stage('render', render, stage_workers('render', max(1, len(API_KEYS)) * LLM_PER_KEY_CONCURRENCY)),
+    ]
+
+    def on_error(row, stage_name, e):
+        print(f"❌ Lỗi xử lý nhân viên {row.get('name', 'Unknown')}: {e}")
+        traceback.print_exc()
+
+    result = run_pipeline(pending_rows, stages, on_error=on_error)
+    if sender is not None:
+        sender.finish()
+        success_count = len(sender.sent)
+        fail_count = len(result.failed) + len(sender.failed)
+        outbox.close()
+    else:
+        success_count = len(result.completed)
+        fail_count = len(result.failed)
+    journal.close()
+    mailer = close_mailer()
+    if mailer is not None and mailer.results:
+        delivered = sum(1 for r in mailer.results if r.ok)
+        print(f"📬 SMTP: {delivered}/{len(mailer.results)} email gửi thành công.")
             
     print("\\n" + "="*80)
     print(f"🏁 HOÀN TẤT! Thành công: {success_count} - Thất bại: {fail_count}")
+    if fail_count:
+        print(f"🔁 Chạy lại với cùng run-id '{journal.run_id}' để tiếp tục từ giai đoạn bị lỗi.")
     print("="*80)
+    base_http.close_all()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,4 +1,6 @@
 import requests
+import base_http
+from user_directory import get_directory
 import pandas as pd
 from datetime import datetime, timedelta, timezone
 import pytz
@@ -54,7 +56,7 @@ TEAM_ID_MAPPING = {
 def _make_request(url: str, data: dict, description: str = "") -> requests.Response:
     """Make HTTP request with simple error handling"""
     try:
-        response = requests.post(url, data=data, timeout=30)
+        response = base_http.post(url, data=data, timeout=30)
         response.raise_for_status()
         return response
     except Exception as e:
@@ -91,68 +93,56 @@ def get_cycle_list() -> list:
 
 def get_checkins_data(cycle_path: str) -> list:
     url = "https://goal.base.vn/extapi/v1/cycle/checkins"
-    all_checkins = []
     print(f"Fetching checkins for {cycle_path}...")
-    for page in range(1, 51):
+
+    def fetch_page(page):
         data = {"access_token_v2": GOAL_ACCESS_TOKEN, "path": cycle_path, "page": page}
         try:
-            response = requests.post(url, data=data, timeout=30)
-            if response.status_code != 200: break
+            response = base_http.post(url, data=data, timeout=30)
+            if response.status_code != 200: return []
             
             response_data = response.json()
             if isinstance(response_data, list) and len(response_data) > 0:
                 response_data = response_data[0]
             
-            checkins = response_data.get('checkins', [])
-            if not checkins: break
-            all_checkins.extend(checkins)
-            if len(checkins) < 10: break
-        except: break
-    return all_checkins
+            return response_data.get('checkins', [])
+        except: return []
+
+    # Trang lỗi / rỗng / ít hơn 10 checkins là trang cuối
+    return base_http.fetch_pages(fetch_page, 1, 50, lambda checkins: len(checkins) < 10, key='id')
 
 def get_goals_and_krs(cycle_path: str) -> tuple:
     url = "https://goal.base.vn/extapi/v1/cycle/get.full"
     data = {'access_token_v2': GOAL_ACCESS_TOKEN, 'path': cycle_path}
     try:
-        response = requests.post(url, data=data, timeout=30)
+        response = base_http.post(url, data=data, timeout=30)
         cycle_data = response.json()
         goals = cycle_data.get('goals', [])
         
         krs_url = "https://goal.base.vn/extapi/v1/cycle/krs"
-        all_krs = []
-        for page in range(1, 20):
+
+        def fetch_krs_page(page):
             krs_data = {"access_token_v2": GOAL_ACCESS_TOKEN, "path": cycle_path, "page": page}
-            res = requests.post(krs_url, data=krs_data, timeout=30)
+            res = base_http.post(krs_url, data=krs_data, timeout=30)
             kd = res.json()
             if isinstance(kd, list) and kd: kd = kd[0]
-            krs = kd.get("krs", [])
-            if not krs: break
-            all_krs.extend(krs)
-            if len(krs) < 20: break
-            
+            return kd.get("krs", [])
+
+        all_krs = base_http.fetch_pages(fetch_krs_page, 1, 19, lambda krs: len(krs) < 20, key='id')
         return goals, all_krs
     except:
         return [], []
 
 def get_user_names() -> list:
-    """Get list of users from Account API"""
-    url = "https://account.base.vn/extapi/v1/users"
-    # Account token logic
-    key = "access_token_v2" if "~" in ACCOUNT_ACCESS_TOKEN else "access_token"
-    data = {key: ACCOUNT_ACCESS_TOKEN}
-    try:
-        response = requests.post(url, data=data, timeout=30)
-        res_json = response.json()
-        users_list = res_json.get('users', [])
-        return [{'id': str(u.get('id', '')), 'name': u.get('name', ''), 'username': u.get('username', '')} for u in users_list]
-    except:
-        return []
+    """Get list of users from the shared UserDirectory (Account API, TTL-cached)"""
+    users_list = get_directory().users
+    return [{'id': str(u.get('id', '')), 'name': u.get('name', ''), 'username': u.get('username', '')} for u in users_list]
 
 def get_target_sub_goal_ids(target_id: str) -> list:
     url = "https://goal.base.vn/extapi/v1/target/get"
     data = {'access_token_v2': GOAL_ACCESS_TOKEN, 'id': str(target_id)}
     try:
-        response = requests.post(url, data=data, timeout=10)
+        response = base_http.post(url, data=data, timeout=10)
         response_data = response.json()
         if response_data and 'target' in response_data:
             cached_objs = response_data['target'].get('cached_objs', [])
@@ -166,7 +156,7 @@ def parse_targets_logic(cycle_path: str) -> pd.DataFrame:
     url = "https://goal.base.vn/extapi/v1/cycle/get.full"
     data = {'access_token_v2': GOAL_ACCESS_TOKEN, 'path': cycle_path}
     try:
-        response = requests.post(url, data=data, timeout=30)
+        response = base_http.post(url, data=data, timeout=30)
         response_data = response.json()
         if not response_data or 'targets' not in response_data: return pd.DataFrame()
         
@@ -362,9 +352,43 @@ def find_user_by_name(name_query, user_list):
             best_match = (u['id'], u['name'], u['username'])
     return best_match if highest_score >= 0.3 else None
 
-def get_review_user_work_plus_data(user_name: str, cycle_arg: str = None) -> dict:
+def get_wework_auth() -> dict:
+    k = "access_token_v2" if "~" in WEWORK_ACCESS_TOKEN else "access_token"
+    return {k: WEWORK_ACCESS_TOKEN}
+
+def get_project_map() -> dict:
+    """Project/department id -> name (shared by every user)"""
+    auth_wework = get_wework_auth()
+    proj_map = {}
+    try:
+        r = base_http.post("https://wework.base.vn/extapi/v3/project/list", data=auth_wework, timeout=10)
+        if r.status_code==200: 
+            for p in r.json().get('projects', []): proj_map[str(p['id'])] = p['name']
+        r = base_http.post("https://wework.base.vn/extapi/v3/department/list", data=auth_wework, timeout=10)
+        if r.status_code==200:
+             for d in r.json().get('departments', []): proj_map[str(d['id'])] = d['name']
+    except: pass
+    return proj_map
+
+def load_okr_full_data(cycle_arg: str = None) -> list:
+    """Full KR/checkin rows of the selected cycle for the whole org"""
+    cycles = get_cycle_list()
+    if not cycles:
+        return []
+    cycle_path = cycles[0]['path']
+    if cycle_arg:
+        # Simple match
+        for c in cycles:
+            if cycle_arg.lower() in c['name'].lower():
+                cycle_path = c['path']
+                break
+    return _get_full_data_logic(cycle_path)
+
+def get_review_user_work_plus_data(user_name: str, cycle_arg: str = None, user_list: list = None,
+                                   full_data: list = None, proj_map: dict = None) -> dict:
+    """user_list / full_data / proj_map: org-wide data preloaded by BaseSnapshot (optional)"""
     # 1. User Map
-    user_map = get_user_names()
+    user_map = user_list if user_list is not None else get_user_names()
     user_info = find_user_by_name(user_name, user_map)
     if not user_info:
         raise ValueError(f"Không tìm thấy user '{user_name}'")
@@ -373,42 +397,25 @@ def get_review_user_work_plus_data(user_name: str, cycle_arg: str = None) -> dic
     
     # 2. OKR Data
     okr_data = []
-    cycles = get_cycle_list()
-    if cycles:
-        cycle_path = cycles[0]['path']
-        if cycle_arg:
-            # Simple match
-            for c in cycles:
-                if cycle_arg.lower() in c['name'].lower():
-                    cycle_path = c['path']
-                    break
-        
-        full_data = _get_full_data_logic(cycle_path)
-        for item in full_data:
-            if str(item.get('goal_user_id', '')) == str(target_user_id) or str(item.get('checkin_user_id', '')) == str(target_user_id):
-                okr_data.append(item)
+    if full_data is None:
+        full_data = load_okr_full_data(cycle_arg)
+    for item in full_data:
+        if str(item.get('goal_user_id', '')) == str(target_user_id) or str(item.get('checkin_user_id', '')) == str(target_user_id):
+            okr_data.append(item)
     
     # 3. WeWork Data
     wework_result = {"tasks": [], "count": 0}
     try:
         # Auth header
-        k = "access_token_v2" if "~" in WEWORK_ACCESS_TOKEN else "access_token"
-        auth_wework = {k: WEWORK_ACCESS_TOKEN}
+        auth_wework = get_wework_auth()
         
         # Project map
-        proj_map = {}
-        try:
-            r = requests.post("https://wework.base.vn/extapi/v3/project/list", data=auth_wework, timeout=10)
-            if r.status_code==200: 
-                for p in r.json().get('projects', []): proj_map[str(p['id'])] = p['name']
-            r = requests.post("https://wework.base.vn/extapi/v3/department/list", data=auth_wework, timeout=10)
-            if r.status_code==200:
-                 for d in r.json().get('departments', []): proj_map[str(d['id'])] = d['name']
-        except: pass
+        if proj_map is None:
+            proj_map = get_project_map()
         
         url_tasks = "https://wework.base.vn/extapi/v3/user/tasks"
         payload = {**auth_wework, 'user': target_user_id}
-        resp = requests.post(url_tasks, data=payload, timeout=30)
+        resp = base_http.post(url_tasks, data=payload, timeout=30)
         
         if resp.status_code == 200:
             all_tasks = resp.json().get('tasks', [])
@@ -0,0 +1,377 @@
+"""
+base_async - lớp HTTP bất đồng bộ (httpx) cho các nguồn dữ liệu Base.vn.
+
+Dùng cho MCP server: năm nguồn (Checkin/Timeoff, WeWork, Goal, Workflow, Inside) và các
+endpoint phân trang của chúng được tải đồng thời trên event loop, mỗi host bị giới hạn
+bởi một semaphore riêng. Phần parse/phân tích dùng lại nguyên code đồng bộ của từng module
+và chạy trong thread (asyncio.to_thread) để không chặn event loop.
+
+Cấu hình qua biến môi trường:
+    BASE_ASYNC_PER_HOST  số request đồng thời tối đa cho mỗi host (mặc định 6)
+    BASE_ASYNC_WINDOW    số trang tải song song mỗi đợt khi phân trang (mặc định 4)
+Timeout / retry / backoff dùng chung cấu hình BASE_HTTP_* của base_http.
+"""
+import asyncio
+import os
+import weakref
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+import pandas as pd
+
+import base_cache
+import base_http
+from user_directory import get_directory
+import checkin_timeoff
+import goal
+import inside
+import wework
+import workflow
+
+PER_HOST_CONCURRENCY = int(os.getenv('BASE_ASYNC_PER_HOST', '6'))
+PAGE_WINDOW = int(os.getenv('BASE_ASYNC_WINDOW', '4'))
+
+
+class AsyncBaseClient:
+    """httpx.AsyncClient dùng chung + semaphore theo host + retry/backoff giống base_http"""
+
+    def __init__(self, per_host: int = PER_HOST_CONCURRENCY):
+        self.per_host = per_host
+        self._client = httpx.AsyncClient(
+            timeout=base_http.DEFAULT_TIMEOUT,
+            limits=httpx.Limits(max_keepalive_connections=base_http.POOL_SIZE),
+            headers={'Accept-Encoding': 'gzip, deflate'},
+        )
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def _semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc.lower()
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.per_host)
+        return self._semaphores[host]
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Gửi request (endpoint tham chiếu được phục vụ từ base_cache)"""
+        if base_cache.get_ttl(url) is None:
+            return await self._send(method, url, **kwargs)
+
+        # Đọc / ghi cache là I/O file: chạy trong thread để không chặn event loop
+        data = kwargs.get('data')
+        cached_body = await asyncio.to_thread(base_cache.load, url, data)
+        if cached_body is not None:
+            return httpx.Response(200, content=cached_body.encode('utf-8'),
+                                  headers={'Content-Type': 'application/json', 'X-Base-Cache': 'hit'},
+                                  request=httpx.Request(method, url))
+
+        response = await self._send(method, url, **kwargs)
+        await asyncio.to_thread(base_cache.store, url, data, response.status_code, response.text)
+        return response
+
+    async def _send(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Gửi request, thử lại khi lỗi kết nối hoặc 429/5xx"""
+        for attempt in range(base_http.MAX_RETRIES + 1):
+            is_last_attempt = attempt == base_http.MAX_RETRIES
+            try:
+                async with self._semaphore(url):
+                    response = await self._client.request(method, url, **kwargs)
+                if response.status_code not in base_http.RETRY_STATUSES or is_last_attempt:
+                    return response
+            except httpx.TransportError:
+                if is_last_attempt:
+                    raise
+            await asyncio.sleep(base_http.BACKOFF_FACTOR * (2 ** attempt))
+
+    async def post_json(self, url: str, data: Dict) -> Any:
+        response = await self.request('POST', url, data=data)
+        response.raise_for_status()
+        return response.json()
+
+    async def get_json(self, url: str) -> Any:
+        response = await self.request('GET', url)
+        response.raise_for_status()
+        return response.json()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+# Theo chính đối tượng loop (không theo id(loop)): loop đã đóng bị thu hồi thì client của nó
+# (và connection pool) cũng được giải phóng, loop mới không nhận nhầm client của loop cũ
+_clients: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncBaseClient]' = weakref.WeakKeyDictionary()
+
+
+def get_client() -> AsyncBaseClient:
+    """Client dùng chung cho event loop hiện tại (httpx/semaphore gắn với một loop)"""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = AsyncBaseClient()
+        _clients[loop] = client
+    return client
+
+
+async def fetch_pages(fetch_page: Callable[[int], Awaitable[List]], first_page: int, max_pages: int,
+                      is_last: Callable[[List], bool], window: int = PAGE_WINDOW,
+                      key: Optional[str] = None) -> List[Dict]:
+    """Tải các trang theo từng đợt `window` trang song song, giữ đúng thứ tự trang.
+
+    Dừng ở trang cuối đầu tiên (is_last), các trang sau nó trong cùng đợt bị bỏ qua. Nếu có
+    `key`, item trùng key chỉ giữ lần xuất hiện đầu tiên (như base_http.fetch_pages).
+    """
+    items: List[Dict] = []
+    seen = set()
+    end_page = first_page + max_pages
+    page = first_page
+    while page < end_page:
+        batch = range(page, min(page + window, end_page))
+        results = await asyncio.gather(*(fetch_page(p) for p in batch))
+        for page_items in results:
+            for item in page_items:
+                if key is not None:
+                    item_key = item.get(key)
+                    if item_key is not None:
+                        if item_key in seen:
+                            continue
+                        seen.add(item_key)
+                items.append(item)
+            if is_last(page_items):
+                return items
+        page += window
+    return items
+
+
+# ----------------------------------------------------------------------
+# Checkin / Timeoff
+# ----------------------------------------------------------------------
+async def load_checkin_month_data(year: int, month: int, client: Optional[AsyncBaseClient] = None) -> Dict:
+    """Bản async của checkin_timeoff.load_checkin_month_data"""
+    client = client or get_client()
+    print(f"🔄 Đang tải dữ liệu Checkin/Timeoff toàn công ty ({month}/{year})...")
+
+    checkin_loader = checkin_timeoff.CheckinLoader(checkin_timeoff.CHECKIN_TOKEN)
+    employee_manager = checkin_timeoff.EmployeeManager(checkin_timeoff.ACCOUNT_TOKEN, members=[])
+    timeoff_processor = checkin_timeoff.TimeoffProcessor(
+        checkin_timeoff.TIMEOFF_TOKEN, checkin_timeoff.ACCOUNT_TOKEN, employee_manager=employee_manager
+    )
+    start_date, end_date = checkin_timeoff.get_month_range(year, month)
+
+    async def fetch_checkin():
+        try:
+            return await client.post_json("https://checkin.base.vn/extapi/v1/getlogs",
+                                          checkin_loader.build_payload(start_date, end_date))
+        except Exception as e:
+            print(f"❌ Error loading checkin: {e}")
+            return None
+
+    def fetch_timeoff_page(page):
+        return client.post_json(checkin_timeoff.TIMEOFF_URL, timeoff_processor.build_timeoff_payload(
+            start_date_from=start_date.strftime('%Y-%m-%d'),
+            end_date_to=end_date.strftime('%Y-%m-%d'),
+            page=page
+        ))
+
+    async def fetch_timeoffs():
+        first_page = await fetch_timeoff_page(1)
+        timeoffs = list(first_page.get('timeoffs', []))
+        if len(timeoffs) >= checkin_timeoff.TIMEOFF_PAGE_SIZE:
+            async def fetch_items(page):
+                return (await fetch_timeoff_page(page)).get('timeoffs', [])
+            timeoffs += await fetch_pages(fetch_items, 2, timeoff_processor.remaining_pages(first_page),
+                                          lambda items: len(items) < checkin_timeoff.TIMEOFF_PAGE_SIZE)
+        return checkin_timeoff.TimeoffProcessor.merge_timeoffs(timeoffs)
+
+    directory, checkin_json, raw_timeoff = await asyncio.gather(
+        asyncio.to_thread(get_directory),
+        fetch_checkin(),
+        fetch_timeoffs(),
+    )
+
+    def build():
+        employee_manager.set_members(directory.members)
+        df_checkin = checkin_loader.parse_response(checkin_json) if checkin_json is not None else pd.DataFrame()
+        df_timeoff = timeoff_processor.extract_timeoff_to_dataframe(raw_timeoff)
+        return checkin_timeoff.build_checkin_month_data(year, month, df_checkin, df_timeoff, employee_manager)
+
+    return await asyncio.to_thread(build)
+
+
+async def get_checkin_data(employee_name, year, month, join_date=None, client: Optional[AsyncBaseClient] = None):
+    month_data = await load_checkin_month_data(year, month, client)
+    return await asyncio.to_thread(checkin_timeoff.get_checkin_data, employee_name, year, month,
+                                   join_date, month_data)
+
+
+# ----------------------------------------------------------------------
+# Goal
+# ----------------------------------------------------------------------
+async def load_goal_context(client: Optional[AsyncBaseClient] = None) -> Optional[Dict]:
+    """Bản async của goal.load_goal_context: KR/checkin phân trang và target/get tải song song"""
+    client = client or get_client()
+    api = goal.GoalAPIClient(goal.GOAL_ACCESS_TOKEN, goal.ACCOUNT_ACCESS_TOKEN)
+    goal_auth = {'access_token_v2': goal.GOAL_ACCESS_TOKEN}
+
+    cycles = api.parse_cycle_list(await client.post_json("https://goal.base.vn/extapi/v1/cycle/list", goal_auth))
+    if not cycles:
+        return None
+    cycle_path = cycles[0]['path']
+
+    async def fetch_cycle_page(url: str, key: str, page: int) -> List[Dict]:
+        response_data = await client.post_json(url, {**goal_auth, "path": cycle_path, "page": page})
+        if isinstance(response_data, list) and len(response_data) > 0:
+            response_data = response_data[0]
+        return response_data.get(key, [])
+
+    full_data, all_krs, all_checkins, directory = await asyncio.gather(
+        client.post_json("https://goal.base.vn/extapi/v1/cycle/get.full", {**goal_auth, 'path': cycle_path}),
+        fetch_pages(lambda p: fetch_cycle_page("https://goal.base.vn/extapi/v1/cycle/krs", "krs", p),
+                    1, goal.MAX_PAGES_KRS, lambda items: not items, key='id'),
+        fetch_pages(lambda p: fetch_cycle_page("https://goal.base.vn/extapi/v1/cycle/checkins", "checkins", p),
+                    1, goal.MAX_PAGES_CHECKINS, lambda items: len(items) < 20, key='id'),
+        asyncio.to_thread(get_directory),
+    )
+
+    async def fetch_sub_goal_ids(target_id: str) -> List[str]:
+        try:
+            response = await client.request('POST', "https://goal.base.vn/extapi/v1/target/get",
+                                            data={**goal_auth, 'id': str(target_id)})
+            if response.status_code == 200:
+                return api.parse_target_sub_goal_ids(response.json())
+            return []
+        except Exception as e:
+            print(f"Error fetching sub-goal {target_id}: {e}")
+            return []
+
+    target_ids = [t['target_id'] for t in api.build_target_rows(full_data)]
+    sub_goal_lists = await asyncio.gather(*(fetch_sub_goal_ids(t_id) for t_id in target_ids))
+    sub_goal_ids = dict(zip(target_ids, sub_goal_lists))
+
+    def build():
+        goal.load_user_mapping()
+        raw_data = {
+            'goals_df': api.parse_goals_data(full_data),
+            'krs_df': api.parse_krs(all_krs),
+            'target_df': api.parse_targets_data(cycle_path, full_data=full_data, sub_goal_ids=sub_goal_ids),
+            'all_checkins': all_checkins,
+            'account_df': api.parse_members({'group': {'members': directory.members}}),
+            'all_users_df': api.parse_account_users({'users': directory.users}),
+        }
+        return goal.load_goal_context(cycles=cycles, raw_data=raw_data)
+
+    return await asyncio.to_thread(build)
+
+
+async def get_goal_data(employee_name, client: Optional[AsyncBaseClient] = None):
+    goal_context = await load_goal_context(client)
+    if not goal_context:
+        return None
+    return await asyncio.to_thread(goal.get_goal_data, employee_name, goal_context)
+
+
+# ----------------------------------------------------------------------
+# WeWork
+# ----------------------------------------------------------------------
+async def get_wework_data(username, client: Optional[AsyncBaseClient] = None):
+    """Bản async của wework.get_wework_data"""
+    client = client or get_client()
+    auth = wework.get_wework_auth_data()
+
+    async def load_project_map() -> Dict[str, str]:
+        # Giống bản đồng bộ: lỗi tải project/department chỉ ghi log, tiếp tục với mapping rỗng
+        try:
+            projects_json, depts_json = await asyncio.gather(
+                client.post_json("https://wework.base.vn/extapi/v3/project/list", auth),
+                client.post_json("https://wework.base.vn/extapi/v3/department/list", auth),
+            )
+            return wework.build_project_map(projects_json, depts_json)
+        except Exception as e:
+            print(f"⚠️ Error loading project mapping: {e}")
+            return {}
+
+    directory, project_map = await asyncio.gather(asyncio.to_thread(get_directory), load_project_map())
+    members_df = wework.WeWorkAPIClient.parse_members({'group': {'members': directory.members}})
+
+    all_tasks = []
+    if 'username' in members_df.columns:
+        employee_info = members_df[members_df['username'] == username]
+        if not employee_info.empty and employee_info.iloc[0]['id']:
+            try:
+                data = await client.post_json("https://wework.base.vn/extapi/v3/user/tasks",
+                                              {**auth, 'user': employee_info.iloc[0]['id']})
+                all_tasks = data.get('tasks', [])
+            except Exception as e:
+                print(f"❌ Lỗi khi gọi API /user/tasks: {e}")
+                return None
+
+    return await asyncio.to_thread(wework.get_wework_data, username, members_df, project_map, all_tasks)
+
+
+# ----------------------------------------------------------------------
+# Inside
+# ----------------------------------------------------------------------
+async def get_all_news_and_articles(max_pages: int = 10, client: Optional[AsyncBaseClient] = None) -> List[Dict]:
+    """Bản async của inside.get_all_news_and_articles (news và articles tải song song)"""
+    client = client or get_client()
+    token_key = inside.get_inside_token_key()
+
+    def page_fetcher(endpoint: str, key: str, item_type: str):
+        async def fetch_page(page: int) -> List[Dict]:
+            url = f"https://inside.base.vn/extapi/v2/{endpoint}?{token_key}={inside.INSIDE_API_KEY}&page={page}"
+            try:
+                response = await client.request('GET', url)
+                if response.status_code != 200:
+                    return []
+                data = response.json()
+                if data.get('code') != 1:
+                    return []
+                items = data.get(key) or []
+            except Exception as e:
+                print(f"      ⚠️ Lỗi khi lấy {key} trang {page}: {e}")
+                return []
+            for item in items:
+                item['item_type'] = item_type
+            return items
+        return fetch_page
+
+    news, articles = await asyncio.gather(
+        fetch_pages(page_fetcher("companynews/get", "news", "news"), 1, max_pages, lambda items: len(items) < 20),
+        fetch_pages(page_fetcher("articles/get", "updates", "article"), 1, max_pages, lambda items: len(items) < 20),
+    )
+    return news + articles
+
+
+async def get_inside_data(employee_name, limit=5, client: Optional[AsyncBaseClient] = None):
+    _, all_items = await asyncio.gather(
+        asyncio.to_thread(inside.load_user_mapping),
+        get_all_news_and_articles(max_pages=50, client=client),
+    )
+    return await asyncio.to_thread(inside.get_inside_data, employee_name, limit, all_items)
+
+
+# ----------------------------------------------------------------------
+# Workflow
+# ----------------------------------------------------------------------
+async def get_all_workflow_jobs(max_pages: int = 10, client: Optional[AsyncBaseClient] = None) -> List[Dict]:
+    """Bản async của workflow.get_all_workflow_jobs"""
+    client = client or get_client()
+
+    async def fetch_page(page_id: int) -> List[Dict]:
+        try:
+            data = await client.post_json("https://workflow.base.vn/extapi/v1/jobs/get",
+                                          {**workflow.get_workflow_auth_data(), 'page_id': page_id})
+        except Exception as e:
+            print(f"⚠️ Lỗi khi lấy trang {page_id}: {e}")
+            return []
+        if data.get('code') == 1 and 'jobs' in data:
+            return data.get('jobs', [])
+        return []
+
+    return await fetch_pages(fetch_page, 0, max_pages, lambda items: not items)
+
+
+async def get_workflow_data(employee_name, limit=10, client: Optional[AsyncBaseClient] = None):
+    _, all_jobs = await asyncio.gather(
+        asyncio.to_thread(workflow.load_user_mapping),
+        get_all_workflow_jobs(client=client),
+    )
+    return await asyncio.to_thread(workflow.get_workflow_data, employee_name, limit, all_jobs)
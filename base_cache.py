@@ -0,0 +1,201 @@
+"""
+base_cache - cache response trên đĩa cho các endpoint dữ liệu tham chiếu của Base.vn.
+
+Các endpoint ít thay đổi (cycle/list, cycle/get.full, project/list, department/list,
+users, users/get_list, group/get, target/get) được lưu theo khóa nội dung:
+sha256(endpoint + payload đã chuẩn hóa, bỏ token). Mỗi endpoint có TTL riêng, tổng dung
+lượng bị giới hạn và file ít dùng nhất bị xóa trước (LRU theo mtime). Tổng dung lượng được
+cộng dồn theo từng lần ghi; chỉ khi vượt giới hạn mới quét lại thư mục và xóa bớt xuống
+EVICT_TARGET giới hạn.
+
+Cấu hình qua biến môi trường:
+    BASE_CACHE_DIR      thư mục cache (mặc định .base_cache cạnh source)
+    BASE_CACHE_MAX_MB   dung lượng tối đa (mặc định 200)
+    BASE_CACHE_DISABLE  =1 để tắt cache
+    BASE_CACHE_REFRESH  =1 (hoặc chạy với cờ --refresh) để bỏ qua cache khi đọc
+                        nhưng vẫn ghi lại dữ liệu mới
+"""
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qsl, urlsplit
+
+CACHE_DIR = os.getenv('BASE_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.base_cache'))
+MAX_BYTES = int(float(os.getenv('BASE_CACHE_MAX_MB', '200')) * 1024 * 1024)
+DISABLED = os.getenv('BASE_CACHE_DISABLE') == '1'
+REFRESH = '--refresh' in sys.argv or os.getenv('BASE_CACHE_REFRESH') == '1'
+
+# TTL (giây) theo đường dẫn endpoint; endpoint không có trong bảng thì không cache
+ENDPOINT_TTLS = {
+    '/extapi/v1/cycle/list': 6 * 3600,
+    '/extapi/v1/cycle/get.full': 30 * 60,
+    '/extapi/v1/target/get': 30 * 60,
+    '/extapi/v3/project/list': 6 * 3600,
+    '/extapi/v3/department/list': 6 * 3600,
+    '/extapi/v1/users': 3600,
+    '/extapi/v1/users/get_list': 3600,
+    '/extapi/v1/group/get': 3600,
+}
+
+TOKEN_KEYS = {'access_token', 'access_token_v2'}
+
+# Sau khi xóa bớt, tổng dung lượng còn lại tối đa EVICT_TARGET * max_bytes (chừa chỗ để các
+# lần ghi sau không phải quét lại thư mục ngay)
+EVICT_TARGET = 0.9
+
+_write_lock = threading.Lock()
+# Tổng dung lượng đã biết của từng thư mục cache (quét đầy đủ ở lần ghi đầu và khi xóa bớt)
+_dir_sizes: Dict[str, int] = {}
+
+
+def get_ttl(url: str) -> Optional[int]:
+    """TTL của endpoint, None nếu endpoint không được cache"""
+    if DISABLED:
+        return None
+    return ENDPOINT_TTLS.get(urlsplit(url).path)
+
+
+def make_key(url: str, data: Any = None) -> str:
+    """Khóa nội dung: endpoint + payload (query + body) đã chuẩn hóa, bỏ token"""
+    parts = urlsplit(url)
+    params = parse_qsl(parts.query, keep_blank_values=True)
+    if isinstance(data, bytes):
+        data = data.decode('utf-8')
+    if isinstance(data, str):
+        params += parse_qsl(data, keep_blank_values=True)
+    elif isinstance(data, dict):
+        params += [(str(k), str(v)) for k, v in data.items()]
+    normalized = sorted((k, v) for k, v in params if k not in TOKEN_KEYS)
+    raw = json.dumps([parts.netloc.lower(), parts.path, normalized], ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _path_for(key: str) -> str:
+    return os.path.join(CACHE_DIR, key[:2], f"{key}.json")
+
+
+def load(url: str, data: Any = None) -> Optional[str]:
+    """Body JSON đã cache (còn hạn) của request, None nếu không có"""
+    ttl = get_ttl(url)
+    if ttl is None or REFRESH:
+        return None
+    entry = read_entry(_path_for(make_key(url, data)), ttl)
+    return entry.get('body') if entry else None
+
+
+def store(url: str, data: Any, status_code: int, body: str):
+    """Lưu response thành công (HTTP 200, không phải lỗi API) vào cache"""
+    if get_ttl(url) is None or status_code != 200:
+        return
+    try:
+        parsed = json.loads(body)
+    except ValueError:
+        return
+    if isinstance(parsed, dict) and 'code' in parsed and str(parsed.get('code')) != '1':
+        return
+
+    entry = {'created': time.time(), 'endpoint': urlsplit(url).path, 'body': body}
+    put_entry(_path_for(make_key(url, data)), entry)
+
+
+def read_entry(path: str, ttl: float) -> Optional[Dict]:
+    """Đọc entry JSON còn hạn (theo trường 'created') và đánh dấu vừa dùng cho LRU"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if time.time() - entry.get('created', 0) > ttl:
+        return None
+    try:
+        os.utime(path)  # đánh dấu vừa dùng cho LRU
+    except OSError:
+        pass
+    return entry
+
+
+def write_entry(path: str, entry: Dict) -> bool:
+    """Ghi entry JSON một cách nguyên tử (file tạm + os.replace)"""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"⚠️ Không thể ghi cache {os.path.basename(path)}: {e}")
+        return False
+    return True
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def put_entry(path: str, entry: Dict, cache_dir: str = CACHE_DIR, max_bytes: int = MAX_BYTES) -> bool:
+    """Ghi entry và cộng dồn dung lượng của cache_dir; chỉ quét / xóa bớt khi vượt max_bytes"""
+    previous_size = _file_size(path)
+    if not write_entry(path, entry):
+        return False
+    with _write_lock:
+        total = _dir_sizes.get(cache_dir)
+        if total is not None:
+            total += _file_size(path) - previous_size
+            _dir_sizes[cache_dir] = total
+    if total is None or total > max_bytes:
+        evict(cache_dir, max_bytes)
+    return True
+
+
+def evict(cache_dir: str = CACHE_DIR, max_bytes: int = MAX_BYTES):
+    """Quét cache_dir; khi tổng dung lượng vượt max_bytes thì xóa các file ít dùng nhất
+    cho đến khi còn EVICT_TARGET * max_bytes
+
+    Bỏ qua file *.tmp: write_entry ghi chúng ngoài _write_lock, xóa giữa chừng sẽ làm hỏng
+    lần ghi của thread khác.
+    """
+    with _write_lock:
+        files = []
+        total = 0
+        for root, _, names in os.walk(cache_dir):
+            for name in names:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        if total > max_bytes:
+            target = max_bytes * EVICT_TARGET
+            for _, size, path in sorted(files):
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                if total <= target:
+                    break
+        _dir_sizes[cache_dir] = total
+
+
+def clear():
+    """Xóa toàn bộ cache"""
+    with _write_lock:
+        _dir_sizes.pop(CACHE_DIR, None)
+    for root, _, names in os.walk(CACHE_DIR):
+        for name in names:
+            try:
+                os.remove(os.path.join(root, name))
+            except OSError:
+                pass
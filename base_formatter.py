@@ -1,9 +1,128 @@
 from datetime import datetime, timedelta
 import pytz
 
+from email_templates import Template, minify_css
+
 
 hcm_tz = pytz.timezone('Asia/Ho_Chi_Minh')
 
+# Minimal CSS for portability, based on the email template. Repeated table/row styles are
+# shared classes instead of per-cell inline styles.
+CSS_STYLES = minify_css("""
+    body { font-family: -apple-system, system-ui, sans-serif; line-height: 1.6; color: #333; }
+    .email-container { max-width: 700px; margin: 0 auto; padding: 20px; border: 1px solid #ddd; border-radius: 8px; }
+    .section { margin-bottom: 30px; }
+    .section-title { font-size: 18px; font-weight: bold; border-left: 4px solid #ccc; padding-left: 10px; margin-bottom: 10px; }
+    .goal-title { border-color: #ffc107; } .wework-title { border-color: #20c997; }
+    .checkin-title { border-color: #17a2b8; } .inside-title { border-color: #6f42c1; }
+    .workflow-title { border-color: #fd7e14; }
+    .stats-box { background: #fff; border: 1px solid #eee; padding: 15px; border-radius: 6px; }
+    .success-box { border-left: 4px solid #28a745; background: #e6f7ec; }
+    .warning-box { border-left: 4px solid #dc3545; background: #fff3f3; }
+    .wework-box { border-left: 4px solid #20c997; background: #e0f2f1; }
+    .checkin-box { border-left: 4px solid #17a2b8; background: #e0f7fa; }
+    .inside-box { border-left: 4px solid #6f42c1; background: #f3e5f5; }
+    .workflow-box { border-left: 4px solid #fd7e14; background: #fff3e0; }
+    .footer-message { background: #eef6f8; padding: 15px; border-radius: 6px; border-left: 4px solid #17a2b8; margin-top: 30px; font-size: 14px; }
+    .detail-block { margin-top: 15px; border-top: 1px dashed #ccc; padding-top: 10px; }
+    .overdue-block { border-top-color: #ef9a9a; }
+    .detail-title { font-weight: 600; margin-bottom: 8px; }
+    .data-table { width: 100%; border-collapse: collapse; font-size: 13px; }
+    .data-table th { background-color: #f0f0f0; text-align: left; }
+    .data-table th, .data-table td { padding: 5px; border: 1px solid #ddd; }
+    .data-table .center { text-align: center; }
+    .overdue-table th { background-color: #ffebee; }
+    .overdue-table th, .overdue-table td { padding: 6px; border-color: #ffcdd2; }
+    .jobs-table th, .jobs-table td { padding: 6px; }
+    .speed-good { background-color: #d4edda; color: #155724; font-weight: bold; }
+    .speed-fair { background-color: #fff3cd; color: #856404; font-weight: bold; }
+    .speed-slow { background-color: #f8d7da; color: #721c24; font-weight: bold; }
+    .item-name { font-weight: 600; color: #333; }
+    .item-meta { font-size: 11px; color: #666; }
+    .deadline { color: #c62828; font-weight: bold; }
+    .upcoming-box { margin-top: 10px; background-color: #fff3cd; padding: 8px; border-radius: 4px; border-left: 3px solid #ffc107; }
+    .upcoming-list { font-size: 13px; margin-top: 4px; }
+    .upcoming-name { color: #e65100; font-weight: 600; }
+    .feed-item { padding: 10px; border-bottom: 1px dashed #e0e0e0; display: flex; align-items: flex-start; }
+    .feed-icon { font-size: 20px; margin-right: 10px; }
+    .feed-body { flex: 1; }
+    .feed-title { font-weight: 600; color: #2c3e50; text-decoration: none; display: block; margin-bottom: 4px; }
+    .feed-meta { font-size: 12px; color: #888; }
+""")
+
+GOAL_TABLE = Template("""
+<div class="detail-block">
+    <div class="detail-title">📋 Chi tiết Mục tiêu & Tốc độ:</div>
+    <table class="data-table">
+        <tr><th>Mục tiêu</th><th style="width: 80px;">Tiến độ</th><th style="width: 80px;">Tốc độ</th></tr>
+        {rows}
+    </table>
+</div>
+""")
+GOAL_ROW = Template(
+    '<tr><td>{name}</td><td class="center">{value:.1f}%</td>'
+    '<td class="center {speed_class}">{speed:.2f} ({speed_text})</td></tr>'
+)
+
+UPCOMING_ITEM = Template('<div>• <span class="upcoming-name">{name}</span> ({day_str})</div>')
+
+OVERDUE_TABLE = Template("""
+<div class="detail-block overdue-block">
+    <div class="detail-title" style="color: #c62828;">🚨 Công việc QUÁ HẠN (Cần xử lý ngay):</div>
+    <table class="data-table overdue-table">
+        <tr><th>Công việc / Dự án</th><th style="width: 80px;">Ngày tạo</th><th style="width: 90px;">Deadline</th></tr>
+        {rows}
+    </table>
+</div>
+""")
+OVERDUE_ROW = Template(
+    '<tr><td><div class="item-name">{name}</div><div class="item-meta">📂 {project}</div></td>'
+    '<td class="center">{created}</td><td class="center deadline">{deadline}</td></tr>'
+)
+
+POST_ITEM = Template("""
+<div class="feed-item">
+    <div class="feed-icon">{icon}</div>
+    <div class="feed-body">
+        <a href="{link}" class="feed-title">{post[title]}</a>
+        <div class="feed-meta">👤 {post[author]} • {post[date]} • ❤️ {post[reactions_count]}</div>
+    </div>
+</div>
+""")
+
+JOBS_TABLE = Template("""
+<div class="detail-block">
+    <div class="detail-title" style="color: #555;">⚙️ Các công việc đang xử lý:</div>
+    <table class="data-table jobs-table">
+        <tr><th>Công việc</th><th style="width: 120px;">Giai đoạn</th></tr>
+        {rows}
+    </table>
+</div>
+""")
+JOB_ROW = Template(
+    '<tr><td><div class="item-name">{title}</div><div class="item-meta">📂 {workflow}</div></td>'
+    '<td class="center">{stage}</td></tr>'
+)
+
+SECTION = Template('<div class="section"><div class="section-title {title_class}">{title}</div>{content}</div>')
+
+EMAIL_PAGE = Template("""
+<html><head><style>{css}</style></head><body>
+<div class="email-container">
+    <div style="font-size: 24px; font-weight: bold; color: #004a99; border-bottom: 2px solid #004a99; padding-bottom: 15px; margin-bottom: 20px;">
+        📊 BÁO CÁO TỔNG HỢP BASE.VN
+    </div>
+    <p>Thân gửi Anh/Chị: <strong>{employee_name}</strong></p>
+    <p style="font-style: italic; color: #666; font-size: 13px;">Ngày tạo báo cáo: {current_time_str}</p>
+    {sections}
+    <div class="footer-message">
+        <strong>💬 THÔNG ĐIỆP TỪ APLUS</strong><br>
+        Cảm ơn bạn vì đã hiện diện trọn vẹn...<br>
+        Base là "tấm gương số" phản chiếu cách làm việc của chúng ta.
+    </div>
+</div>
+</body></html>
+""")
 
 
 def format_email_content(employee_name, checkin_data, wework_data, goal_data, inside_data, workflow_data):
@@ -40,31 +159,18 @@ def format_email_content(employee_name, checkin_data, wework_data, goal_data, in
         goals_html = ""
         goals_list = goal_data.get('goals_list', [])
         if goals_list:
-            goals_html += '<div style="margin-top: 15px; border-top: 1px dashed #ccc; padding-top: 10px;">'
-            goals_html += '<div style="font-weight: 600; margin-bottom: 8px;">📋 Chi tiết Mục tiêu & Tốc độ:</div>'
-            goals_html += '<table style="width: 100%; border-collapse: collapse; font-size: 13px;">'
-            goals_html += '<tr style="background-color: #f0f0f0; text-align: left;">'
-            goals_html += '<th style="padding: 5px; border: 1px solid #ddd;">Mục tiêu</th>'
-            goals_html += '<th style="padding: 5px; border: 1px solid #ddd; width: 80px;">Tiến độ</th>'
-            goals_html += '<th style="padding: 5px; border: 1px solid #ddd; width: 80px;">Tốc độ</th>'
-            goals_html += '</tr>'
-            
+            goal_rows = []
             for goal in goals_list:
-                g_name = goal['name']
-                g_val = goal['current_value']
                 g_speed = goal['speed']
-                
                 if g_speed >= 1.0:
-                    speed_color, speed_bg, speed_text = "#155724", "#d4edda", "Tốt"
+                    speed_class, speed_text = "speed-good", "Tốt"
                 elif g_speed >= 0.5:
-                    speed_color, speed_bg, speed_text = "#856404", "#fff3cd", "Khá"
+                    speed_class, speed_text = "speed-fair", "Khá"
                 else:
-                    speed_color, speed_bg, speed_text = "#721c24", "#f8d7da", "Chậm"
-                
-                goals_html += f'<tr><td style="padding: 5px; border: 1px solid #ddd;">{g_name}</td>'
-                goals_html += f'<td style="padding: 5px; border: 1px solid #ddd; text-align: center;">{g_val:.1f}%</td>'
-                goals_html += f'<td style="padding: 5px; border: 1px solid #ddd; text-align: center; background-color: {speed_bg}; color: {speed_color}; font-weight: bold;">{g_speed:.2f} ({speed_text})</td></tr>'
-            goals_html += '</table></div>'
+                    speed_class, speed_text = "speed-slow", "Chậm"
+                goal_rows.append(GOAL_ROW.render(name=goal['name'], value=goal['current_value'], speed=g_speed,
+                                                 speed_class=speed_class, speed_text=speed_text))
+            goals_html = GOAL_TABLE.render(rows=''.join(goal_rows))
 
         goal_content_box = f"""
         <div class="stats-box success-box"> 
@@ -103,7 +209,7 @@ def format_email_content(employee_name, checkin_data, wework_data, goal_data, in
             
             upcoming_html = ""
             if upcoming_tasks:
-                upcoming_list_items = ""
+                upcoming_list_items = []
                 for t in upcoming_tasks[:5]:
                     deadline_ts = t.get('deadline')
                     days = 0
@@ -113,23 +219,13 @@ def format_email_content(employee_name, checkin_data, wework_data, goal_data, in
                             days = max(0, (deadline_date - datetime.now(hcm_tz)).days)
                         except: pass
                     day_str = "Hôm nay" if days == 0 else f"{days} ngày nữa"
-                    upcoming_list_items += f"<div>• <span style='color:#e65100; font-weight:600;'>{t.get('name')}</span> ({day_str})</div>"
+                    upcoming_list_items.append(UPCOMING_ITEM.render(name=t.get('name'), day_str=day_str))
                 
-                upcoming_html = f"""
-                <li style="margin-top: 10px; background-color: #fff3cd; padding: 8px; border-radius: 4px; border-left: 3px solid #ffc107;">
-                    <strong>⚠️ Sắp đến hạn (7 ngày tới):</strong>
-                    <div style="font-size: 13px; margin-top: 4px;">{upcoming_list_items}</div>
-                </li>
-                """
+                upcoming_html = f'<li class="upcoming-box"><strong>⚠️ Sắp đến hạn (7 ngày tới):</strong><div class="upcoming-list">{"".join(upcoming_list_items)}</div></li>'
                 
             overdue_table_html = ""
             if overdue_tasks:
-                overdue_table_html += '<div style="margin-top: 15px; border-top: 1px dashed #ef9a9a; padding-top: 10px;">'
-                overdue_table_html += '<div style="font-weight: 600; margin-bottom: 8px; color: #c62828;">🚨 Công việc QUÁ HẠN (Cần xử lý ngay):</div>'
-                overdue_table_html += '<table style="width: 100%; border-collapse: collapse; font-size: 13px;">'
-                overdue_table_html += '<tr style="background-color: #ffebee; text-align: left;">'
-                overdue_table_html += '<th style="padding: 6px; border: 1px solid #ffcdd2;">Công việc / Dự án</th><th style="padding: 6px; border: 1px solid #ffcdd2; width: 80px;">Ngày tạo</th><th style="padding: 6px; border: 1px solid #ffcdd2; width: 90px;">Deadline</th></tr>'
-                
+                overdue_rows = []
                 for task in overdue_tasks[:10]:
                     t_name = task.get('name', 'No Name')
                     p_name = task.get('project_name', 'Unknown Project')
@@ -142,9 +238,8 @@ def format_email_content(employee_name, checkin_data, wework_data, goal_data, in
                         try: deadline_str = datetime.fromtimestamp(int(task.get('deadline')), hcm_tz).strftime('%d/%m')
                         except: pass
                     
-                    overdue_table_html += f'<tr><td style="padding: 6px; border: 1px solid #ffcdd2;"><div style="font-weight: 600; color: #333;">{t_name}</div><div style="font-size: 11px; color: #666;">📂 {p_name}</div></td>'
-                    overdue_table_html += f'<td style="padding: 6px; border: 1px solid #ffcdd2; text-align: center;">{created_date}</td><td style="padding: 6px; border: 1px solid #ffcdd2; text-align: center; color: #c62828; font-weight: bold;">{deadline_str}</td></tr>'
-                overdue_table_html += '</table></div>'
+                    overdue_rows.append(OVERDUE_ROW.render(name=t_name, project=p_name, created=created_date, deadline=deadline_str))
+                overdue_table_html = OVERDUE_TABLE.render(rows=''.join(overdue_rows))
 
             wework_content_box = f"""
             <div class="stats-box wework-box">
@@ -268,18 +363,11 @@ def format_email_content(employee_name, checkin_data, wework_data, goal_data, in
         else:
              archetype, archetype_desc, archetype_color, archetype_bg = "👻 Người ẩn danh", "Hệ thống chưa ghi nhận tương tác.", "#343a40", "#e9ecef"
              
-        posts_html = ""
         if latest_posts:
-            for post in latest_posts[:3]:
-                p_icon = "📰" if post['type'] == 'news' else "📝"
-                posts_html += f"""
-                <div style="padding: 10px; border-bottom: 1px dashed #e0e0e0; display: flex; align-items: flex-start;">
-                    <div style="font-size: 20px; margin-right: 10px;">{p_icon}</div>
-                    <div style="flex: 1;">
-                        <a href="{post.get('link', '#')}" style="font-weight: 600; color: #2c3e50; text-decoration: none; display: block; margin-bottom: 4px;">{post['title']}</a>
-                        <div style="font-size: 12px; color: #888;">👤 {post['author']} • {post['date']} • ❤️ {post['reactions_count']}</div>
-                    </div>
-                </div>"""
+            posts_html = ''.join(
+                POST_ITEM.render(icon="📰" if post['type'] == 'news' else "📝", link=post.get('link', '#'), post=post)
+                for post in latest_posts[:3]
+            )
         else:
              posts_html = "<div style='padding:10px; font-style:italic; color:#999'>Chưa có bài viết mới.</div>"
              
@@ -330,20 +418,20 @@ def format_email_content(employee_name, checkin_data, wework_data, goal_data, in
              
         upcoming_html = ""
         if upcoming_jobs:
-            upcoming_list_items = ""
+            upcoming_list_items = []
             for j in upcoming_jobs[:5]:
                 days = j.get('days_left', 0)
                 day_str = "Hôm nay" if days == 0 else f"{days} ngày nữa"
-                upcoming_list_items += f"<div>• <span style='color:#e65100; font-weight:600;'>{j.get('name') or j.get('title')}</span> ({day_str})</div>"
-            upcoming_html = f'<li style="margin-top: 10px; background-color: #fff3cd; padding: 8px; border-radius: 4px; border-left: 3px solid #ffc107;"><strong>⚠️ Sắp đến hạn:</strong><div style="font-size: 13px; margin-top: 4px;">{upcoming_list_items}</div></li>'
+                upcoming_list_items.append(UPCOMING_ITEM.render(name=j.get('name') or j.get('title'), day_str=day_str))
+            upcoming_html = f'<li class="upcoming-box"><strong>⚠️ Sắp đến hạn:</strong><div class="upcoming-list">{"".join(upcoming_list_items)}</div></li>'
             
         active_jobs = [job for job in latest_jobs if job.get('stage_metatype') not in ['done', 'failed']]
         jobs_table_html = ""
         if active_jobs:
-            jobs_table_html = '<div style="margin-top: 15px; border-top: 1px dashed #ccc; padding-top: 10px;"><div style="font-weight: 600; margin-bottom: 8px; color: #555;">⚙️ Các công việc đang xử lý:</div><table style="width: 100%; border-collapse: collapse; font-size: 13px;"><tr style="background-color: #f0f0f0; text-align: left;"><th style="padding: 6px; border: 1px solid #ddd;">Công việc</th><th style="padding: 6px; border: 1px solid #ddd; width: 120px;">Giai đoạn</th></tr>'
-            for job in active_jobs[:10]:
-                 jobs_table_html += f'<tr><td style="padding: 6px; border: 1px solid #ddd;"><div style="font-weight: 600; color: #333;">{job.get("title", "")}</div><div style="font-size: 11px; color: #666;">📂 {job.get("workflow_name", "")}</div></td><td style="padding: 6px; border: 1px solid #ddd; text-align: center;">{job.get("stage_name", "")}</td></tr>'
-            jobs_table_html += '</table></div>'
+            jobs_table_html = JOBS_TABLE.render(rows=''.join(
+                JOB_ROW.render(title=job.get("title", ""), workflow=job.get("workflow_name", ""), stage=job.get("stage_name", ""))
+                for job in active_jobs[:10]
+            ))
             
         workflow_content_box = f"""
         <div class="stats-box workflow-box">
@@ -360,50 +448,19 @@ def format_email_content(employee_name, checkin_data, wework_data, goal_data, in
         workflow_content_box = ""
 
     # --- ASSEMBLY HTML ---
-    # Minimal CSS styles inline for portability, based on template
-    css_styles = """
-    <style>
-        body { font-family: -apple-system, system-ui, sans-serif; line-height: 1.6; color: #333; }
-        .email-container { max-width: 700px; margin: 0 auto; padding: 20px; border: 1px solid #ddd; border-radius: 8px; }
-        .section { margin-bottom: 30px; }
-        .section-title { font-size: 18px; font-weight: bold; border-left: 4px solid #ccc; padding-left: 10px; margin-bottom: 10px; }
-        .goal-title { border-color: #ffc107; } .wework-title { border-color: #20c997; }
-        .checkin-title { border-color: #17a2b8; } .inside-title { border-color: #6f42c1; }
-        .workflow-title { border-color: #fd7e14; }
-        .stats-box { background: #fff; border: 1px solid #eee; padding: 15px; border-radius: 6px; }
-        .success-box { border-left: 4px solid #28a745; background: #e6f7ec; }
-        .warning-box { border-left: 4px solid #dc3545; background: #fff3f3; }
-        .wework-box { border-left: 4px solid #20c997; background: #e0f2f1; }
-        .checkin-box { border-left: 4px solid #17a2b8; background: #e0f7fa; }
-        .inside-box { border-left: 4px solid #6f42c1; background: #f3e5f5; }
-        .workflow-box { border-left: 4px solid #fd7e14; background: #fff3e0; }
-        .footer-message { background: #eef6f8; padding: 15px; border-radius: 6px; border-left: 4px solid #17a2b8; margin-top: 30px; font-size: 14px; }
-    </style>
-    """
-
-    main_html = f"""
-    <html><head>{css_styles}</head><body>
-    <div class="email-container">
-        <div style="font-size: 24px; font-weight: bold; color: #004a99; border-bottom: 2px solid #004a99; padding-bottom: 15px; margin-bottom: 20px;">
-            📊 BÁO CÁO TỔNG HỢP BASE.VN
-        </div>
-        <p>Thân gửi Anh/Chị: <strong>{employee_name}</strong></p>
-        <p style="font-style: italic; color: #666; font-size: 13px;">Ngày tạo báo cáo: {current_time_str}</p>
-        
-        {f'<div class="section"><div class="section-title wework-title">🧭 BASE WEWORK</div>{wework_content_box}</div>' if wework_content_box else ''}
-        {f'<div class="section"><div class="section-title goal-title">🥇 BASE GOAL</div>{goal_content_box}</div>' if goal_content_box else ''}
-        {f'<div class="section"><div class="section-title workflow-title">⚙️ BASE WORKFLOW</div>{workflow_content_box}</div>' if workflow_content_box else ''}
-        {f'<div class="section"><div class="section-title checkin-title">⏰ BASE CHECKIN</div>{checkin_content_box}</div>' if checkin_content_box else ''}
-        {f'<div class="section"><div class="section-title inside-title">💬 BASE INSIDE</div>{inside_content_box}</div>' if inside_content_box else ''}
-        
-        <div class="footer-message">
-            <strong>💬 THÔNG ĐIỆP TỪ APLUS</strong><br>
-            Cảm ơn bạn vì đã hiện diện trọn vẹn...<br>
-            Base là "tấm gương số" phản chiếu cách làm việc của chúng ta.
-        </div>
-    </div>
-    </body></html>
-    """
+    sections = [
+        SECTION.render(title_class=title_class, title=title, content=content)
+        for title_class, title, content in (
+            ('wework-title', '🧭 BASE WEWORK', wework_content_box),
+            ('goal-title', '🥇 BASE GOAL', goal_content_box),
+            ('workflow-title', '⚙️ BASE WORKFLOW', workflow_content_box),
+            ('checkin-title', '⏰ BASE CHECKIN', checkin_content_box),
+            ('inside-title', '💬 BASE INSIDE', inside_content_box),
+        )
+        if content
+    ]
+    main_html = EMAIL_PAGE.render(css=CSS_STYLES, employee_name=employee_name, current_time_str=current_time_str,
+                                  sections='\n'.join(sections))
 
     return {
         "full_email_html": main_html,
@@ -0,0 +1,174 @@
+"""
+base_http - transport HTTP dùng chung cho mọi client Base.vn.
+
+Mỗi host (account/goal/wework/checkin/timeoff/inside/workflow.base.vn) có một
+requests.Session riêng với connection pool keep-alive, nên một lượt chạy batch chỉ
+bắt tay TCP+TLS một lần cho mỗi kết nối thay vì mỗi request.
+
+Cấu hình qua biến môi trường:
+    BASE_HTTP_POOL_SIZE  số kết nối giữ lại cho mỗi host (mặc định 16)
+    BASE_HTTP_TIMEOUT    timeout mặc định tính bằng giây (mặc định 30)
+    BASE_HTTP_RETRIES    số lần thử lại khi lỗi kết nối / 429 / 5xx (mặc định 3)
+    BASE_HTTP_BACKOFF    hệ số backoff giữa các lần thử lại (mặc định 0.5)
+    BASE_HTTP_PAGE_WINDOW số trang tải song song khi phân trang (mặc định 8)
+    BASE_HTTP_PER_HOST   số request đồng thời tối đa tới mỗi host (mặc định 8)
+"""
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import base_cache
+
+POOL_SIZE = int(os.getenv('BASE_HTTP_POOL_SIZE', '16'))
+DEFAULT_TIMEOUT = float(os.getenv('BASE_HTTP_TIMEOUT', '30'))
+MAX_RETRIES = int(os.getenv('BASE_HTTP_RETRIES', '3'))
+BACKOFF_FACTOR = float(os.getenv('BASE_HTTP_BACKOFF', '0.5'))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+PAGE_WINDOW = int(os.getenv('BASE_HTTP_PAGE_WINDOW', '8'))
+PER_HOST_CONCURRENCY = int(os.getenv('BASE_HTTP_PER_HOST', '8'))
+
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+_host_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+
+
+def _build_session() -> requests.Session:
+    """Tạo Session với pool keep-alive, nén gzip và retry có backoff"""
+    # Các endpoint extapi của Base.vn đều là POST chỉ đọc nên retry POST là an toàn
+    retry = Retry(
+        total=MAX_RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({'GET', 'POST'}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=retry)
+
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({
+        'Accept-Encoding': 'gzip, deflate',
+        'Connection': 'keep-alive',
+    })
+    return session
+
+
+def get_session(url: str) -> requests.Session:
+    """Lấy Session dùng chung cho host của `url` (tạo mới nếu chưa có)"""
+    host = urlsplit(url).netloc.lower()
+    session = _sessions.get(host)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(host)
+            if session is None:
+                session = _build_session()
+                _sessions[host] = session
+    return session
+
+
+def _host_semaphore(url: str) -> threading.BoundedSemaphore:
+    """Semaphore giới hạn số request đồng thời tới host của `url`"""
+    host = urlsplit(url).netloc.lower()
+    semaphore = _host_semaphores.get(host)
+    if semaphore is None:
+        with _sessions_lock:
+            semaphore = _host_semaphores.setdefault(host, threading.BoundedSemaphore(PER_HOST_CONCURRENCY))
+    return semaphore
+
+
+def request(method: str, url: str, timeout: Optional[float] = None, **kwargs) -> requests.Response:
+    """Gửi request qua pool của host tương ứng (endpoint tham chiếu được phục vụ từ base_cache)"""
+    data = kwargs.get('data')
+    cached_body = base_cache.load(url, data)
+    if cached_body is not None:
+        return _cached_response(url, cached_body)
+
+    if timeout is None:
+        timeout = DEFAULT_TIMEOUT
+    with _host_semaphore(url):
+        response = get_session(url).request(method, url, timeout=timeout, **kwargs)
+    if base_cache.get_ttl(url) is not None:
+        base_cache.store(url, data, response.status_code, response.text)
+    return response
+
+
+def _cached_response(url: str, body: str) -> requests.Response:
+    """Dựng requests.Response từ body đã cache"""
+    response = requests.Response()
+    response.status_code = 200
+    response._content = body.encode('utf-8')
+    response.encoding = 'utf-8'
+    response.url = url
+    response.headers['Content-Type'] = 'application/json'
+    response.headers['X-Base-Cache'] = 'hit'
+    return response
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request('POST', url, **kwargs)
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request('GET', url, **kwargs)
+
+
+def close_all():
+    """Đóng toàn bộ connection pool (gọi khi kết thúc lượt chạy)"""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+def fetch_pages(fetch_page: Callable[[int], List[Dict]], first_page: int, max_pages: int,
+                is_last: Callable[[List[Dict]], bool], window: Optional[int] = None,
+                key: Optional[str] = None) -> List[Dict]:
+    """Tải các trang với tối đa `window` trang đang chạy song song (speculative).
+
+    Kết quả được ghép theo đúng thứ tự trang và dừng ở trang cuối đầu tiên (is_last);
+    các trang đã gửi sau trang đó bị bỏ qua. Nếu có `key`, item trùng key chỉ giữ lần
+    xuất hiện đầu tiên. Lỗi của một trang (trước trang cuối) được raise lại như khi tải tuần tự.
+    """
+    window = max(1, window or PAGE_WINDOW)
+    end_page = first_page + max_pages
+    items: List[Dict] = []
+    seen = set()
+
+    executor = ThreadPoolExecutor(max_workers=window, thread_name_prefix='base-pages')
+    pending = deque()
+    try:
+        next_page = first_page
+        while next_page < end_page and len(pending) < window:
+            pending.append(executor.submit(fetch_page, next_page))
+            next_page += 1
+
+        while pending:
+            page_items = pending.popleft().result()
+            for item in page_items:
+                if key is not None:
+                    item_key = item.get(key)
+                    if item_key is not None:
+                        if item_key in seen:
+                            continue
+                        seen.add(item_key)
+                items.append(item)
+            if is_last(page_items):
+                break
+            if next_page < end_page:
+                pending.append(executor.submit(fetch_page, next_page))
+                next_page += 1
+    finally:
+        # Bỏ các trang đã gửi sau trang cuối (shutdown(cancel_futures=True) cần Python 3.9+)
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+    return items
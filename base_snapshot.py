@@ -0,0 +1,125 @@
+"""
+BaseSnapshot - dữ liệu toàn công ty được tải MỘT LẦN cho mỗi lượt chạy.
+
+Các hàm get_*_data của từng module đều tải lại dữ liệu chung (log checkin, danh sách
+timeoff, cycle/KR/checkin của Goal, toàn bộ Inside, toàn bộ Workflow...) cho mỗi nhân viên.
+BaseSnapshot tải các dữ liệu đó lần đầu khi cần, sau đó mỗi nhân viên chỉ còn là
+thao tác lọc trong bộ nhớ. Snapshot an toàn khi dùng chung giữa nhiều thread (mỗi dataset
+chỉ được tải một lần kể cả khi nhiều worker cùng cần).
+"""
+import threading
+from typing import Any, Callable, Dict, Optional
+
+import pandas as pd
+
+import app_v2_logic
+from checkin_timeoff import load_checkin_month_data, get_checkin_data
+from goal import load_goal_context, get_goal_data
+from inside import get_all_news_and_articles, get_inside_data
+from wework import WeWorkAPIClient, load_project_map, get_wework_data
+from workflow import get_all_workflow_jobs, get_workflow_data
+
+
+class BaseSnapshot:
+    """Dữ liệu toàn công ty của một lượt chạy + các hàm trích xuất theo nhân viên"""
+
+    def __init__(self, year: int, month: int, members_df: Optional[pd.DataFrame] = None):
+        self.year = year
+        self.month = month
+        self._datasets: Dict[str, Any] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+        if members_df is not None:
+            self._datasets['members'] = members_df
+
+    def _load(self, key: str, loader: Callable[[], Any]) -> Any:
+        """Tải dataset `key` một lần; lỗi được ghi nhận là None để không tải lại mỗi nhân viên"""
+        if key not in self._datasets:
+            with self._locks_lock:
+                lock = self._locks.setdefault(key, threading.Lock())
+            # Mỗi dataset một lock: các dataset khác nhau vẫn tải song song được
+            with lock:
+                if key not in self._datasets:
+                    try:
+                        self._datasets[key] = loader()
+                    except Exception as e:
+                        print(f"⚠️ Không thể tải dữ liệu chung '{key}': {e}")
+                        self._datasets[key] = None
+        return self._datasets[key]
+
+    # ------------------------------------------------------------------
+    # Dữ liệu toàn công ty (lazy)
+    # ------------------------------------------------------------------
+    @property
+    def members_df(self) -> Optional[pd.DataFrame]:
+        return self._load('members', lambda: WeWorkAPIClient().get_filtered_members())
+
+    @property
+    def checkin_month(self) -> Optional[Dict]:
+        return self._load('checkin', lambda: load_checkin_month_data(self.year, self.month))
+
+    @property
+    def goal_context(self) -> Optional[Dict]:
+        return self._load('goal', load_goal_context)
+
+    @property
+    def inside_items(self) -> Optional[list]:
+        return self._load('inside', lambda: get_all_news_and_articles(max_pages=50))
+
+    @property
+    def workflow_jobs(self) -> Optional[list]:
+        return self._load('workflow', get_all_workflow_jobs)
+
+    @property
+    def wework_project_map(self) -> Optional[Dict[str, str]]:
+        return self._load('wework_projects', load_project_map)
+
+    @property
+    def account_users(self) -> Optional[list]:
+        return self._load('account_users', app_v2_logic.get_user_names)
+
+    @property
+    def okr_full_data(self) -> Optional[list]:
+        return self._load('okr_full_data', app_v2_logic.load_okr_full_data)
+
+    def preload(self):
+        """Tải trước toàn bộ dữ liệu chung (gọi trước vòng lặp nhân viên)"""
+        print("📦 Đang tải dữ liệu chung toàn công ty (1 lần cho cả lượt chạy)...")
+        _ = (self.members_df, self.checkin_month, self.goal_context, self.inside_items,
+             self.workflow_jobs, self.wework_project_map, self.account_users, self.okr_full_data)
+
+    # ------------------------------------------------------------------
+    # Trích xuất theo nhân viên (chỉ lọc trong bộ nhớ)
+    # ------------------------------------------------------------------
+    def get_checkin_data(self, employee_name, join_date=None):
+        if self.checkin_month is None:
+            return None
+        return get_checkin_data(employee_name, self.year, self.month,
+                                join_date=join_date, month_data=self.checkin_month)
+
+    def get_wework_data(self, username):
+        return get_wework_data(username, members_df=self.members_df,
+                               project_map=self.wework_project_map or {})
+
+    def get_goal_data(self, employee_name):
+        if self.goal_context is None:
+            return None
+        return get_goal_data(employee_name, goal_context=self.goal_context)
+
+    def get_inside_data(self, employee_name):
+        if self.inside_items is None:
+            return None
+        return get_inside_data(employee_name, all_items=self.inside_items)
+
+    def get_workflow_data(self, employee_name):
+        if self.workflow_jobs is None:
+            return None
+        return get_workflow_data(employee_name, all_jobs=self.workflow_jobs)
+
+    def get_review_user_work_plus_data(self, employee_name):
+        return app_v2_logic.get_review_user_work_plus_data(
+            employee_name,
+            user_list=self.account_users,
+            full_data=self.okr_full_data,
+            proj_map=self.wework_project_map or {}
+        )
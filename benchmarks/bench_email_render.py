@@ -0,0 +1,155 @@
+"""
+Benchmark: thời gian dựng và kích thước email báo cáo.
+
+Dựng email cho dữ liệu giả lập đủ mọi section (nhiều task sắp đến hạn / quá hạn, nhiều mục
+tiêu, bài viết Inside, job Workflow) bằng app_v2_all.create_email_html (lời gọi AI được thay
+bằng nội dung cố định, không gọi LLM) và base_formatter.format_email_content. In ra thời gian
+dựng (trung vị/min), kích thước email (byte, sau gzip) và phần <style>; với --record FILE thì
+ghi thêm một dòng JSON vào FILE để so sánh giữa các lần thay đổi.
+
+Chạy từ thư mục gốc repo:
+    python benchmarks/bench_email_render.py [số_lần] [--record benchmarks/email_render.jsonl]
+"""
+import gzip
+import json
+import os
+import re
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app_v2_all  # noqa: E402
+import base_formatter  # noqa: E402
+
+AI_CONTENT = "\n".join([
+    "- **Tiến độ** tuần này tăng đều, cần giữ nhịp check-in.",
+    "- Một số task _quá hạn_ tập trung ở dự án Marketing.",
+    "1. Ưu tiên xử lý 3 task quá hạn trước thứ 6.",
+    "2. Bổ sung deadline cho các task đang để trống.",
+    "Tổng kết: hiệu suất ổn định.",
+])
+
+
+def fake_ai_insight(data_context, section_name, insight_type="insight"):
+    return AI_CONTENT
+
+
+def build_report(n_goals: int = 8, n_tasks: int = 40, n_jobs: int = 30, n_posts: int = 5):
+    """Dữ liệu một nhân viên đủ các trường create_email_html / format_email_content đọc"""
+    now = datetime.now()
+    ts = lambda days: str(int((now + timedelta(days=days)).timestamp()))
+    goal_data = {
+        'weekly': {'current_value': 62.5, 'last_friday_value': 58.25, 'okr_shift': 4.25},
+        'checkin_behavior': {'checkin_count_period': 3, 'last_checkin_period': '10/10/2025'},
+        'overall_behavior': {'checkin_frequency_per_week': 1.5},
+        'goals_list': [
+            {'name': f'Mục tiêu {g}: Tăng trưởng doanh thu kênh {g}', 'target_value': 100,
+             'current_value': 10.0 * g % 100, 'speed': 0.4 * (g % 4), 'start_date': '01/10/2025',
+             'sub_goals': [{'name': f'KR {g}.{k}', 'progress': 20 * k} for k in range(3)]}
+            for g in range(n_goals)
+        ],
+    }
+    tasks = [
+        {'name': f'Task {t} - Chuẩn bị tài liệu dự án', 'project_name': f'Dự án {t % 5}',
+         'deadline': ts(t % 7) if t % 4 else None, 'since': ts(-20), 'deadline_str': '15/10/2025'}
+        for t in range(n_tasks)
+    ]
+    wework_data = {
+        'summary': {'total_tasks': n_tasks, 'completion_rate': 72.5, 'on_time_rate': 64.0},
+        'stats_extended': {
+            'completed_late_count': 4, 'no_deadline_count': n_tasks // 4,
+            'overdue_tasks': [dict(t, deadline=ts(-3)) for t in tasks[:12]],
+            'upcoming_deadline_tasks': [t for t in tasks if t['deadline']][:10],
+        },
+        'tasks': tasks,
+    }
+    statuses = ['early', 'standard', 'late']
+    checkin_data = {
+        'summary': {'days_present': 20, 'total_working_days': 22, 'days_missing': 1,
+                    'early_checkout_count': 2, 'adjusted_attendance_rate': 95.5},
+        'period': {'month': now.month, 'year': now.year},
+        'daily_records': [
+            {'status': 'present', 'date': now - timedelta(days=d),
+             'checkin_details': {'first_checkin': f'0{7 + d % 2}:{10 + d:02d}:00',
+                                 'checkin_status': statuses[d % 3], 'working_hours': 8 + d % 3 * 0.5}}
+            for d in range(20)
+        ],
+    }
+    inside_data = {
+        'summary': {'employee_posts': 3, 'employee_reactions': 42, 'employee_reactions_given': 25,
+                    'employee_views': 380, 'employee_views_given': 64},
+        'latest_posts': [
+            {'title': f'Bài viết {p}: Chia sẻ kinh nghiệm làm việc số', 'author': 'Nguyễn Văn A',
+             'date': '12/10/2025', 'reactions_count': 10 + p, 'views_count': 100 + p,
+             'type': 'news' if p % 2 else 'post', 'link': f'https://inside.base.vn/p/{p}'}
+            for p in range(n_posts)
+        ],
+    }
+    workflow_data = {
+        'summary': {'total_jobs': n_jobs, 'completion_rate': 55.0, 'doing_jobs': n_jobs // 2},
+        'stats_extended': {
+            'completed_late_count': 3, 'no_deadline_count': 5, 'overdue_jobs': [],
+            'upcoming_deadline_jobs': [{'name': f'Job {j}', 'days_left': j % 3} for j in range(6)],
+        },
+        'latest_jobs': [
+            {'title': f'Job {j} - Duyệt đề xuất', 'workflow_name': f'Quy trình {j % 4}',
+             'stage_metatype': 'done' if j % 3 == 0 else 'doing', 'stage_name': 'Đang duyệt'}
+            for j in range(n_jobs)
+        ],
+    }
+    return checkin_data, wework_data, goal_data, inside_data, workflow_data
+
+
+def style_bytes(html: str) -> int:
+    return sum(len(block.encode('utf-8')) for block in re.findall(r'<style>.*?</style>', html, re.S))
+
+
+def measure(render, runs: int) -> dict:
+    """Dựng `runs` lần, trả về thời gian và kích thước của email cuối"""
+    seconds = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        html = render()
+        seconds.append(time.perf_counter() - start)
+    raw = html.encode('utf-8')
+    return {'median_ms': round(statistics.median(seconds) * 1000, 3), 'min_ms': round(min(seconds) * 1000, 3),
+            'bytes': len(raw), 'gzip_bytes': len(gzip.compress(raw)), 'style_bytes': style_bytes(html)}
+
+
+def main():
+    args = sys.argv[1:]
+    record_path = None
+    if '--record' in args:
+        index = args.index('--record')
+        record_path = args[index + 1]
+        del args[index:index + 2]
+    runs = int(args[0]) if args else 200
+
+    app_v2_all.generate_ai_insight = fake_ai_insight
+    checkin, wework, goal, inside, workflow = build_report()
+    renderers = {
+        'create_email_html': lambda: app_v2_all.create_email_html(
+            'Nguyễn Văn A', checkin, wework, goal, inside, workflow),
+        'format_email_content': lambda: base_formatter.format_email_content(
+            'Nguyễn Văn A', checkin, wework, goal, inside, workflow)['full_email_html'],
+    }
+
+    record = {'time': datetime.now().isoformat(timespec='seconds'), 'python': sys.version.split()[0], 'runs': runs}
+    for name, render in renderers.items():
+        render()  # warm-up
+        result = measure(render, runs)
+        print(f"[{name}] trung vị: {result['median_ms']:.2f}ms | min: {result['min_ms']:.2f}ms | "
+              f"{result['bytes']:,} byte (gzip {result['gzip_bytes']:,}) | <style>: {result['style_bytes']:,} byte")
+        record[name] = result
+
+    if record_path:
+        with open(record_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        print(f"📝 Đã ghi kết quả vào {record_path}")
+
+
+if __name__ == '__main__':
+    main()
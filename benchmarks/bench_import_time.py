@@ -0,0 +1,67 @@
+"""
+Benchmark: thời gian import (cold start) của server và app_v2_all.
+
+Mỗi lần đo chạy một process Python mới chỉ để import module, ghi lại thời gian import
+và các thư viện nặng (pandas, sklearn, ollama...) đã bị kéo theo. In ra trung vị/min/max;
+với --record FILE thì ghi thêm một dòng JSON vào FILE để theo dõi qua các lần thay đổi.
+
+Chạy từ thư mục gốc repo:
+    python benchmarks/bench_import_time.py [số_lần] [--record benchmarks/import_time.jsonl]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ['server', 'app_v2_all']
+HEAVY_MODULES = ['pandas', 'numpy', 'sklearn', 'ollama', 'httpx', 'fastmcp']
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'loaded': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module: str) -> dict:
+    """Import `module` trong một process mới, trả về thời gian và thư viện nặng đã load"""
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+    )
+    # Module có thể print khi import, dòng JSON luôn là dòng cuối
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    args = sys.argv[1:]
+    record_path = None
+    if '--record' in args:
+        index = args.index('--record')
+        record_path = args[index + 1]
+        del args[index:index + 2]
+    runs = int(args[0]) if args else 5
+
+    record = {'time': datetime.now().isoformat(timespec='seconds'), 'python': sys.version.split()[0], 'runs': runs}
+    for module in MODULES:
+        samples = [measure(module) for _ in range(runs)]
+        seconds = [sample['seconds'] for sample in samples]
+        median = statistics.median(seconds)
+        print(f"[{module}] trung vị: {median:.3f}s | min: {min(seconds):.3f}s | max: {max(seconds):.3f}s | "
+              f"đã load: {', '.join(samples[-1]['loaded']) or '-'}")
+        record[module] = {'median': round(median, 4), 'min': round(min(seconds), 4),
+                          'loaded': samples[-1]['loaded']}
+
+    if record_path:
+        with open(record_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        print(f"📝 Đã ghi kết quả vào {record_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark: giá trị OKR tại mốc (as-of) cho toàn bộ user.
+
+So sánh cách cũ (mỗi user gọi calculate_reference_value, bên trong lặp từng KR và lọc
+cả frame) với OKRCalculator.calculate_reference_values (một lần sort + drop_duplicates
+cho cả final_df). Dữ liệu tổng hợp ~50k dòng, kiểm tra hai cách cho cùng kết quả.
+
+Chạy từ thư mục gốc repo:
+    python benchmarks/bench_reference_value.py [số_dòng]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from goal import DateUtils, OKRCalculator  # noqa: E402
+
+
+def build_final_df(n_rows: int = 50_000, n_users: int = 120, krs_per_user: int = 12, seed: int = 7) -> pd.DataFrame:
+    """final_df giả lập: mỗi dòng là một checkin của một KR (KR chưa checkin có checkin_name rỗng)"""
+    rng = np.random.default_rng(seed)
+    n_krs = n_users * krs_per_user
+    kr_index = rng.integers(0, n_krs, n_rows)
+    user_index = kr_index // krs_per_user
+    goal_index = kr_index // 3
+
+    quarter_start = pd.Timestamp(DateUtils.get_quarter_start_date()) - pd.Timedelta(days=30)
+    offsets = rng.integers(0, 120 * 86400, n_rows)
+    since = (quarter_start + pd.to_timedelta(offsets, unit='s')).strftime('%Y-%m-%d %H:%M:%S')
+
+    checkin_name = np.where(rng.random(n_rows) < 0.1, '', 'Checkin')
+    return pd.DataFrame({
+        'goal_user_name': [f'User {u}' for u in user_index],
+        'goal_name': [f'Goal {g}' for g in goal_index],
+        'kr_id': kr_index.astype(str),
+        'checkin_name': checkin_name,
+        'checkin_since': since,
+        'checkin_kr_current_value': rng.integers(0, 100, n_rows).astype(float),
+    })
+
+
+def legacy_reference_value(reference_date, df):
+    """Cách cũ: lặp từng KR, lọc và sort lại cho mỗi KR"""
+    df = df.copy()
+    df['checkin_since_dt'] = pd.to_datetime(df['checkin_since'], errors='coerce')
+    goal_values = {}
+    kr_count = 0
+    for kr_id in df['kr_id'].dropna().unique():
+        kr_data = df[df['kr_id'] == kr_id].copy()
+        before = kr_data[
+            (kr_data['checkin_since_dt'] <= reference_date) &
+            (kr_data['checkin_name'].notna()) &
+            (kr_data['checkin_name'] != '')
+        ]
+        goal_name = kr_data.iloc[0]['goal_name']
+        kr_value = 0
+        if len(before) > 0:
+            latest = before.sort_values('checkin_since_dt', kind='stable').iloc[-1]
+            kr_value = pd.to_numeric(latest['checkin_kr_current_value'], errors='coerce')
+            kr_value = kr_value if not pd.isna(kr_value) else 0
+        goal_values.setdefault(goal_name, []).append(kr_value)
+        kr_count += 1
+    averages = [np.mean(v) for v in goal_values.values()]
+    return (np.mean(averages) if averages else 0), kr_count
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    final_df = build_final_df(n_rows)
+    users = final_df['goal_user_name'].dropna().unique()
+    print(f"final_df: {len(final_df):,} dòng, {final_df['kr_id'].nunique():,} KR, {len(users)} user")
+
+    for label, reference_date in (('weekly', DateUtils.get_last_friday_date()),
+                                  ('monthly', DateUtils.get_last_month_end_date())):
+        start = time.perf_counter()
+        legacy = {
+            user: legacy_reference_value(reference_date, final_df[final_df['goal_user_name'] == user])
+            for user in users
+        }
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batch = OKRCalculator.calculate_reference_values(reference_date, final_df)
+        batch_time = time.perf_counter() - start
+
+        mismatches = [
+            user for user in users
+            if not np.isclose(legacy[user][0], batch[user][0]) or legacy[user][1] != len(batch[user][1])
+        ]
+        print(f"[{label}] cũ: {legacy_time:.3f}s | một lượt: {batch_time:.3f}s | "
+              f"x{legacy_time / batch_time:.0f} | lệch: {len(mismatches)}")
+        if mismatches:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
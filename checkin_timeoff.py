@@ -4,18 +4,19 @@ from dotenv import load_dotenv
 load_dotenv()
 import json
 import requests
+import base_http
+from user_directory import get_directory
 import pandas as pd
 import numpy as np
 import pytz
 import re
 import unicodedata
 import calendar
+import threading
 import warnings
 from datetime import datetime, timedelta, date
 from typing import Dict, List, Optional, Any, Tuple
-from collections import defaultdict
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from collections import OrderedDict, defaultdict
 
 # Time Constants
 STANDARD_START_HOUR = 8
@@ -32,10 +33,56 @@ ACCOUNT_TOKEN = os.getenv('ACCOUNT_ACCESS_TOKEN')
 hcm_tz = pytz.timezone('Asia/Ho_Chi_Minh')
 DEFAULT_EMPLOYEE_NAME = "Trần Thanh Sơn" # Default fallback
 
+# Timeoff/list phân trang: TIMEOFF_PAGE_SIZE đơn mỗi trang, tối đa TIMEOFF_MAX_PAGES trang
+TIMEOFF_URL = "https://timeoff.base.vn/extapi/v1/timeoff/list"
+TIMEOFF_PAGE_SIZE = 100
+TIMEOFF_MAX_PAGES = int(os.getenv('TIMEOFF_MAX_PAGES', '50'))
+TIMEOFF_TIMEOUT = float(os.getenv('TIMEOFF_TIMEOUT', '30'))
+
+# Số lý do nghỉ (đã chuẩn hóa) được ReasonClassifier nhớ kết quả phân loại
+REASON_CACHE_SIZE = int(os.getenv('REASON_CACHE_SIZE', '4096'))
+
+# Ngày nghỉ lễ: ngày có <= 10% nhân viên chấm công được coi là nghỉ lễ.
+# CHECKIN_HOLIDAYS: lịch nghỉ lễ cố định (YYYY-MM-DD, phân tách bằng dấu phẩy)
+# CHECKIN_HOLIDAY_MODE: 'augment' (lịch + heuristic, mặc định) hoặc 'override' (chỉ dùng lịch)
+HOLIDAY_PRESENCE_THRESHOLD = 0.1
+HOLIDAY_CALENDAR = os.getenv('CHECKIN_HOLIDAYS', '')
+HOLIDAY_MODE = os.getenv('CHECKIN_HOLIDAY_MODE', 'augment')
+
+
+def parse_holiday_calendar(holidays) -> set:
+    """Chuẩn hóa lịch nghỉ lễ (chuỗi 'YYYY-MM-DD,...' hoặc danh sách date/str) thành set[date]"""
+    if not holidays:
+        return set()
+    if isinstance(holidays, str):
+        holidays = holidays.split(',')
+
+    parsed = set()
+    for day in holidays:
+        if isinstance(day, datetime):
+            parsed.add(day.date())
+        elif isinstance(day, date):
+            parsed.add(day)
+        elif str(day).strip():
+            try:
+                parsed.add(datetime.strptime(str(day).strip(), '%Y-%m-%d').date())
+            except ValueError:
+                print(f"⚠️ Bỏ qua ngày nghỉ lễ không hợp lệ: {day}")
+    return parsed
+
 class ReasonClassifier:
-    """Class để phân loại lý do nghỉ bằng cosine similarity"""
+    """Class để phân loại lý do nghỉ bằng cosine similarity
+
+    Kết quả được nhớ theo lý do đã chuẩn hóa (LRU, REASON_CACHE_SIZE mục); classify_many
+    vectorize mọi lý do chưa có trong cache bằng một lần transform + một phép nhân ma trận.
+    Dùng get_reason_classifier() để chia sẻ một classifier đã fit cho cả process.
+    scikit-learn chỉ được import và TF-IDF chỉ được fit khi có lý do đầu tiên cần vectorize.
+    """
     
-    def __init__(self):
+    def __init__(self, cache_size: int = REASON_CACHE_SIZE):
+        self.cache_size = cache_size
+        self._cache: OrderedDict = OrderedDict()
+        self._cache_lock = threading.Lock()
         self.categories = {
             'annual_leave': {
                 'keywords': [
@@ -119,14 +166,37 @@ class ReasonClassifier:
             self.corpus.append(combined_text)
             self.category_names.append(category)
         
-        self.vectorizer = TfidfVectorizer(
-            ngram_range=(1, 2),
-            stop_words=None,
-            lowercase=True,
-            max_features=1000
-        )
-        
-        self.category_vectors = self.vectorizer.fit_transform(self.corpus)
+        self._vectorizer = None
+        self._category_vectors = None
+        self._fit_lock = threading.Lock()
+
+    def _fit(self):
+        """Fit TF-IDF trên từ khóa của các nhóm (lần đầu cần dùng)"""
+        if self._vectorizer is not None:
+            return
+        with self._fit_lock:
+            if self._vectorizer is not None:
+                return
+            from sklearn.feature_extraction.text import TfidfVectorizer
+
+            vectorizer = TfidfVectorizer(
+                ngram_range=(1, 2),
+                stop_words=None,
+                lowercase=True,
+                max_features=1000
+            )
+            self._category_vectors = vectorizer.fit_transform(self.corpus)
+            self._vectorizer = vectorizer
+
+    @property
+    def vectorizer(self):
+        self._fit()
+        return self._vectorizer
+
+    @property
+    def category_vectors(self):
+        self._fit()
+        return self._category_vectors
     
     def preprocess_text(self, text: str) -> str:
         if not text or pd.isna(text):
@@ -137,35 +207,66 @@ class ReasonClassifier:
         return text
     
     def classify_reason(self, reason: str, threshold: float = 0.15) -> Dict:
-        if not reason or pd.isna(reason):
-            return self.get_default_category()
-        
-        processed_reason = self.preprocess_text(reason)
-        if not processed_reason:
-            return self.get_default_category()
-        
-        rule_based_result = self._rule_based_classify(processed_reason)
-        if rule_based_result:
-            return rule_based_result
-        
-        try:
-            reason_vector = self.vectorizer.transform([processed_reason])
-            similarities = cosine_similarity(reason_vector, self.category_vectors)[0]
-            max_similarity_idx = np.argmax(similarities)
-            max_similarity = similarities[max_similarity_idx]
-            
-            if max_similarity >= threshold:
-                best_category = self.category_names[max_similarity_idx]
-                category_info = self.categories[best_category].copy()
-                category_info['similarity'] = max_similarity
-                category_info['category'] = best_category
-                return category_info
+        return self.classify_many([reason], threshold)[0]
+
+    def classify_many(self, reasons: List[str], threshold: float = 0.15) -> List[Dict]:
+        """Phân loại nhiều lý do một lượt (cùng kết quả với classify_reason cho từng lý do)"""
+        processed = [
+            self.preprocess_text(reason) if reason and not pd.isna(reason) else ""
+            for reason in reasons
+        ]
+
+        results: Dict[str, Dict] = {}
+        with self._cache_lock:
+            for text in processed:
+                if text and text not in results and (text, threshold) in self._cache:
+                    self._cache.move_to_end((text, threshold))
+                    results[text] = self._cache[(text, threshold)]
+
+        misses = [text for text in dict.fromkeys(processed) if text and text not in results]
+        failed = set()
+        vector_texts = []
+        for text in misses:
+            rule_based_result = self._rule_based_classify(text)
+            if rule_based_result:
+                results[text] = rule_based_result
             else:
-                return self.get_default_category()
-                
-        except Exception as e:
-            print(f"Error in classify_reason: {e}")
-            return self.get_default_category()
+                vector_texts.append(text)
+
+        if vector_texts:
+            try:
+                from sklearn.metrics.pairwise import cosine_similarity
+
+                reason_vectors = self.vectorizer.transform(vector_texts)
+                similarities = cosine_similarity(reason_vectors, self.category_vectors)
+                best_indices = np.argmax(similarities, axis=1)
+                for row, text in enumerate(vector_texts):
+                    max_similarity_idx = best_indices[row]
+                    max_similarity = similarities[row][max_similarity_idx]
+                    if max_similarity >= threshold:
+                        best_category = self.category_names[max_similarity_idx]
+                        category_info = self.categories[best_category].copy()
+                        category_info['similarity'] = max_similarity
+                        category_info['category'] = best_category
+                        results[text] = category_info
+                    else:
+                        results[text] = self.get_default_category()
+            except Exception as e:
+                print(f"Error in classify_reason: {e}")
+                for text in vector_texts:
+                    results[text] = self.get_default_category()
+                # Không nhớ kết quả mặc định do lỗi, lần sau sẽ phân loại lại
+                failed.update(vector_texts)
+
+        with self._cache_lock:
+            for text in misses:
+                if text not in failed:
+                    self._cache[(text, threshold)] = results[text]
+                    self._cache.move_to_end((text, threshold))
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        return [results[text].copy() if text else self.get_default_category() for text in processed]
     
     def _rule_based_classify(self, processed_reason: str) -> Optional[Dict]:
         sick_patterns = [
@@ -218,17 +319,35 @@ class ReasonClassifier:
         }
 
 
+_reason_classifier: Optional[ReasonClassifier] = None
+_reason_classifier_lock = threading.Lock()
+
+
+def get_reason_classifier() -> ReasonClassifier:
+    """ReasonClassifier dùng chung của process (fit TF-IDF một lần)"""
+    global _reason_classifier
+    if _reason_classifier is None:
+        with _reason_classifier_lock:
+            if _reason_classifier is None:
+                _reason_classifier = ReasonClassifier()
+    return _reason_classifier
+
+
 class EmployeeManager:
     """Class để quản lý thông tin nhân viên"""
     
-    def __init__(self, account_token: str):
+    def __init__(self, account_token: str, members: Optional[List[Dict]] = None):
+        """members: danh sách members (group/get) đã tải sẵn, nếu có thì không gọi API"""
         self.account_token = account_token
         self.request_timeout = 30
         self.username_to_name_map = {}
         self.username_to_since_map = {}
         # Auto-detect token version
         self.account_token_key = "access_token_v2" if "~" in account_token else "access_token"
-        self._load_employee_mapping()
+        if members is not None:
+            self.set_members(members)
+        else:
+            self._load_employee_mapping()
     
     def _get_account_auth_data(self):
         """Get authentication data with correct key"""
@@ -236,7 +355,7 @@ class EmployeeManager:
     
     def _make_request(self, url: str, data: Dict, description: str = "") -> requests.Response:
         try:
-            response = requests.post(url, data=data, timeout=self.request_timeout)
+            response = base_http.post(url, data=data, timeout=self.request_timeout)
             response.raise_for_status()
             return response
         except requests.exceptions.RequestException as e:
@@ -244,27 +363,26 @@ class EmployeeManager:
             raise
     
     def _load_employee_mapping(self):
-        url = "https://account.base.vn/extapi/v1/group/get"
-        data = {**self._get_account_auth_data(), "path": "nvvanphong"}
-        
         try:
-            response = self._make_request(url, data, "fetching account members")
-            response_data = response.json()
-            members = response_data.get('group', {}).get('members', [])
-            self.username_to_name_map = {
-                m.get('username', ''): m.get('name', '') 
-                for m in members 
-                if m.get('username') and m.get('name')
-            }
-            self.username_to_since_map = {
-                m.get('username', ''): m.get('since', '') 
-                for m in members 
-                if m.get('username') and m.get('since')
-            }
+            # Thành viên nhóm nvvanphong lấy từ danh bạ dùng chung (không gọi lại group/get)
+            self.set_members(get_directory().members)
         except Exception as e:
             print(f"Lỗi khi lấy danh sách nhân viên: {e}")
             self.username_to_name_map = {}
             self.username_to_since_map = {}
+
+    def set_members(self, members: List[Dict]):
+        """Cập nhật mapping username -> name/since từ danh sách members (group/get)"""
+        self.username_to_name_map = {
+            m.get('username', ''): m.get('name', '') 
+            for m in members 
+            if m.get('username') and m.get('name')
+        }
+        self.username_to_since_map = {
+            m.get('username', ''): m.get('since', '') 
+            for m in members 
+            if m.get('username') and m.get('since')
+        }
     
     def get_name_by_username(self, username: str) -> str:
         if not username:
@@ -281,17 +399,65 @@ class EmployeeManager:
 class TimeoffProcessor:
     """Class để xử lý dữ liệu timeoff"""
     
-    def __init__(self, timeoff_token: str, account_token: str):
+    def __init__(self, timeoff_token: str, account_token: str, employee_manager: Optional[EmployeeManager] = None):
         self.timeoff_token = timeoff_token
-        self.employee_manager = EmployeeManager(account_token)
+        self.employee_manager = employee_manager or EmployeeManager(account_token)
         # Auto-detect token version  
         self.timeoff_token_key = "access_token_v2" if "~" in timeoff_token else "access_token"
         
     def get_base_timeoff_data(self, start_date=None, end_date=None, start_date_from=None, start_date_to=None, end_date_from=None, end_date_to=None):
-        url = "https://timeoff.base.vn/extapi/v1/timeoff/list"
+        """Tải toàn bộ đơn timeoff (tất cả các trang, tải song song) và gộp theo id"""
+        def fetch_page(page):
+            payload = self.build_timeoff_payload(start_date_from, start_date_to, end_date_from, end_date_to, page=page)
+            response = base_http.post(TIMEOFF_URL, data=payload, timeout=TIMEOFF_TIMEOUT)
+            response.raise_for_status()
+            return response.json()
+
+        # Trang đầu cho biết total_items -> tải song song đúng số trang còn lại
+        first_page = fetch_page(1)
+        timeoffs = list(first_page.get('timeoffs', []))
+        if len(timeoffs) >= TIMEOFF_PAGE_SIZE:
+            timeoffs += base_http.fetch_pages(lambda page: fetch_page(page).get('timeoffs', []), 2,
+                                              self.remaining_pages(first_page),
+                                              lambda items: len(items) < TIMEOFF_PAGE_SIZE)
+        return self.merge_timeoffs(timeoffs)
+
+    @staticmethod
+    def remaining_pages(first_page: Dict) -> int:
+        """Số trang còn lại sau trang 1 (theo total_items, nếu API không trả thì tối đa TIMEOFF_MAX_PAGES)"""
+        try:
+            total_items = int(first_page.get('total_items'))
+        except (TypeError, ValueError):
+            return TIMEOFF_MAX_PAGES - 1
+        total_pages = -(-total_items // TIMEOFF_PAGE_SIZE)
+        return max(0, min(total_pages, TIMEOFF_MAX_PAGES) - 1)
 
-        # Tạo payload với các tham số tùy chọn
-        payload_data = {self.timeoff_token_key: self.timeoff_token, 'items_per_page': 100}
+    @staticmethod
+    def merge_timeoffs(timeoffs: List[Dict]) -> Dict:
+        """Gộp đơn timeoff từ các trang theo id (đơn trùng giữ bản cập nhật mới nhất)"""
+        def last_update(timeoff):
+            try:
+                return int(timeoff.get('last_update') or 0)
+            except (TypeError, ValueError):
+                return 0
+
+        merged: Dict[Any, Dict] = {}
+        for timeoff in timeoffs:
+            timeoff_id = timeoff.get('id')
+            if timeoff_id is None:
+                merged[id(timeoff)] = timeoff
+                continue
+            current = merged.get(timeoff_id)
+            if current is None or last_update(timeoff) >= last_update(current):
+                merged[timeoff_id] = timeoff
+        return {'timeoffs': list(merged.values()), 'total_items': len(merged)}
+
+    def build_timeoff_payload(self, start_date_from=None, start_date_to=None, end_date_from=None, end_date_to=None,
+                              page: Optional[int] = None) -> Dict:
+        """Tạo payload cho timeoff/list với các tham số tùy chọn"""
+        payload_data = {self.timeoff_token_key: self.timeoff_token, 'items_per_page': TIMEOFF_PAGE_SIZE}
+        if page is not None:
+            payload_data['page'] = page
 
         if start_date_from:
             payload_data['start_date_from'] = start_date_from
@@ -301,11 +467,7 @@ class TimeoffProcessor:
             payload_data['end_date_from'] = end_date_from
         if end_date_to:
             payload_data['end_date_to'] = end_date_to
-
-        payload = '&'.join([f'{k}={v}' for k, v in payload_data.items()])
-        headers = {'Content-Type': 'application/x-www-form-urlencoded'}
-        response = requests.post(url, headers=headers, data=payload)
-        return response.json()
+        return payload_data
     
     def extract_form_data(self, form_list):
         form_data = {}
@@ -498,13 +660,41 @@ class TimeoffProcessor:
 
         return {'is_all_day': True, 'start_time': None, 'end_time': None}
 
-    def process_and_structure_timeoff(self, row: pd.Series, classifier: ReasonClassifier) -> Optional[List[Dict]]:
-        """Xử lý chi tiết một yêu cầu nghỉ và trả về một list các bản ghi đã được cấu trúc"""
+    @staticmethod
+    def _reason_text(row) -> Optional[str]:
+        """Lý do dùng để phân loại (None nếu trống)"""
+        return str(row['ly_do']) if row['ly_do'] and str(row['ly_do']).strip() else None
+
+    def process_and_structure_timeoffs(self, df_timeoff: pd.DataFrame,
+                                       classifier: Optional[ReasonClassifier] = None) -> List[Dict]:
+        """Xử lý toàn bộ df_timeoff: phân loại mọi lý do một lượt rồi cấu trúc từng đơn"""
+        if df_timeoff is None or df_timeoff.empty:
+            return []
+        classifier = classifier or get_reason_classifier()
+        rows = [row for _, row in df_timeoff.iterrows()]
+        reason_results = classifier.classify_many([self._reason_text(row) for row in rows])
+
+        processed_leaves = []
+        for row, reason_result in zip(rows, reason_results):
+            leaves = self.process_and_structure_timeoff(row, classifier, reason_result=reason_result)
+            if leaves:
+                processed_leaves.extend(leaves)
+        return processed_leaves
+
+    def process_and_structure_timeoff(self, row: pd.Series, classifier: Optional[ReasonClassifier] = None,
+                                      reason_result: Optional[Dict] = None) -> Optional[List[Dict]]:
+        """Xử lý chi tiết một yêu cầu nghỉ và trả về một list các bản ghi đã được cấu trúc
+
+        reason_result: kết quả phân loại đã tính sẵn (xem process_and_structure_timeoffs)
+        """
         if pd.isna(row['start_date']) or pd.isna(row['end_date']):
             return None
 
         # Phân loại lý do
-        reason_result = classifier.classify_reason(str(row['ly_do'])) if row['ly_do'] and str(row['ly_do']).strip() else classifier.get_default_category()
+        if reason_result is None:
+            classifier = classifier or get_reason_classifier()
+            reason_text = self._reason_text(row)
+            reason_result = classifier.classify_reason(reason_text) if reason_text else classifier.get_default_category()
 
         # Tạo tiêu đề cơ bản
         base_title = f"{reason_result['icon']} {row['employee_name']}"
@@ -583,7 +773,19 @@ class CheckinLoader:
     
     def load_checkin_data(self, start_date=None, end_date=None):
         url = "https://checkin.base.vn/extapi/v1/getlogs"
+        payload = self.build_payload(start_date, end_date)
         
+        try:
+            response = base_http.post(url, data=payload, timeout=30)
+            response.raise_for_status()
+            return self.parse_response(response.json())
+        except Exception as e:
+            # st.error(f"❌ Error loading checkin: {e}") # Removed st dependency
+            print(f"❌ Error loading checkin: {e}")
+            return pd.DataFrame()
+
+    def build_payload(self, start_date=None, end_date=None) -> Dict:
+        """Tạo payload cho getlogs (mặc định: từ đầu tháng đến hiện tại)"""
         if start_date is None:
             now = datetime.now(hcm_tz)
             start_date = datetime(now.year, now.month, 1, 0, 0, 0)
@@ -599,25 +801,19 @@ class CheckinLoader:
             'start_date': start_timestamp,
             'end_date': end_timestamp
         }
-        
-        try:
-            response = requests.post(url, data=payload, timeout=30)
-            response.raise_for_status()
-            data = response.json()
-            
-            if data.get('code') != 1:
-                print(f"DEBUG: CheckinLoader API returned code {data.get('code')}")
-                return pd.DataFrame()
-            
-            df = self._parse_checkin_data(data)
-            print(f"DEBUG: CheckinLoader loaded {len(df)} records. Columns: {df.columns.tolist()}")
-            if not df.empty:
-                 print(f"DEBUG: Sample employee_name from logs: {df['employee_name'].unique()[:3]}")
-            return df
-        except Exception as e:
-            # st.error(f"❌ Error loading checkin: {e}") # Removed st dependency
-            print(f"❌ Error loading checkin: {e}")
+        return payload
+
+    def parse_response(self, data: Dict) -> pd.DataFrame:
+        """Parse getlogs response thành DataFrame checkin"""
+        if data.get('code') != 1:
+            print(f"DEBUG: CheckinLoader API returned code {data.get('code')}")
             return pd.DataFrame()
+        
+        df = self._parse_checkin_data(data)
+        print(f"DEBUG: CheckinLoader loaded {len(df)} records. Columns: {df.columns.tolist()}")
+        if not df.empty:
+             print(f"DEBUG: Sample employee_name from logs: {df['employee_name'].unique()[:3]}")
+        return df
     
     def _parse_checkin_data(self, data):
         checkin_records = []
@@ -674,13 +870,190 @@ class CheckinLoader:
         return df
 
 
+class DailyAttendanceIndex:
+    """Kết quả chấm công theo (nhân viên, ngày) cho toàn bộ df_checkin
+
+    Log được sort và group theo (employee_name, ngày) một lần; check-in đầu, bản ghi cuối,
+    giờ làm, cờ đi trễ / về sớm được tính dạng cột. Mỗi ngày của mỗi nhân viên chỉ còn là
+    một lần tra dict; đây là nơi duy nhất áp dụng quy tắc chấm công theo ngày.
+    """
+
+    def __init__(self, df_checkin: pd.DataFrame):
+        self.days: Dict[Tuple[Any, date], Dict] = {}
+        if df_checkin is None or df_checkin.empty:
+            return
+
+        keys = ['employee_name', 'day']
+        df = df_checkin.assign(day=df_checkin['checkin_date'].dt.date).sort_values('checkin_datetime', kind='stable')
+        grouped = df.groupby(keys, sort=False)
+
+        summary = grouped['checkin_datetime'].agg(['first', 'last', 'size'])
+        # Giờ làm việc: check-out cuối - check-in đầu - 1 (nghỉ trưa)
+        summary['first_in'] = df[df['is_checkout'] == 0].groupby(keys, sort=False)['checkin_datetime'].first()
+        summary['last_out'] = df[df['is_checkout'] == 1].groupby(keys, sort=False)['checkin_datetime'].last()
+        summary['hours'] = (summary['last_out'] - summary['first_in']).dt.total_seconds() / 3600 - 1
+
+        # Early: < 8:00, Standard: 8:00 - 8:30, Late: > 8:30
+        first_minutes = summary['first'].dt.hour * 60 + summary['first'].dt.minute
+        summary['checkin_status'] = np.select(
+            [first_minutes < 8 * 60, first_minutes > 8 * 60 + 30], ['early', 'late'], 'standard'
+        )
+        # Về sớm: bản ghi cuối trước 17:30 (chỉ khi có hơn 1 lần chấm công)
+        last_hour, last_minute = summary['last'].dt.hour, summary['last'].dt.minute
+        summary['is_early_checkout'] = (summary['size'] > 1) & (
+            (last_hour < STANDARD_END_HOUR) |
+            ((last_hour == STANDARD_END_HOUR) & (last_minute < STANDARD_END_MINUTE))
+        )
+        summary['first_str'] = summary['first'].dt.strftime('%H:%M:%S')
+        summary['first_hm'] = summary['first'].dt.strftime('%H:%M')
+        summary['last_str'] = summary['last'].dt.strftime('%H:%M:%S')
+        summary['last_hm'] = summary['last'].dt.strftime('%H:%M')
+
+        times = df['checkin_datetime'].dt.strftime('%H:%M:%S').tolist()
+        is_checkout = df['is_checkout'].astype(bool).tolist()
+        notes = df['note'].tolist() if 'note' in df.columns else [''] * len(df)
+        positions_by_key = grouped.indices
+
+        for row in summary.itertuples():
+            key = row.Index
+            total_records = int(row.size)
+            checkins = [
+                {'time': times[i], 'is_checkout': is_checkout[i], 'note': notes[i]}
+                for i in positions_by_key[key]
+            ]
+            checkin_status = str(row.checkin_status)
+            is_late = checkin_status == 'late'
+            warnings = []
+            if is_late:
+                warnings.append(f'⏰ Đi trễ: Check-in lúc {row.first_hm}')
+            if total_records > 1:
+                if row.is_early_checkout:
+                    warnings.append(f'🏃 Về sớm: Check-out lúc {row.last_hm}')
+            else:
+                warnings.append('⚠️ Chỉ có 1 lần chấm công (thiếu check-out)')
+            if total_records > 4:
+                warnings.append(f'❓ Số lần chấm công nhiều ({total_records} lần)')
+
+            working_hours = 0 if pd.isna(row.hours) else max(0, float(row.hours))
+            self.days[key] = {
+                'status': 'present',
+                'checkins': checkins,
+                'first_checkin': row.first_str,
+                'last_checkout': row.last_str if total_records > 1 else None,
+                'is_late': is_late,
+                'checkin_status': checkin_status,
+                'is_early_checkout': bool(row.is_early_checkout),
+                'total_records': total_records,
+                'working_hours': round(working_hours, 2),
+                'warnings': warnings if warnings else ['✅ Bình thường']
+            }
+
+    def get(self, emp_name: str, day: date) -> Dict:
+        """Phân tích chấm công của nhân viên trong một ngày (bản sao, có thể sửa)"""
+        entry = self.days.get((emp_name, day))
+        if entry is None:
+            return {
+                'status': 'missing',
+                'checkins': [],
+                'first_checkin': None,
+                'last_checkout': None,
+                'is_late': False,
+                'is_early_checkout': False,
+                'total_records': 0,
+                'working_hours': 0,
+                'warnings': ['❌ Không có bản ghi chấm công']
+            }
+        return {**entry, 'checkins': list(entry['checkins']), 'warnings': list(entry['warnings'])}
+
+
+class TimeoffDayIndex:
+    """Đơn nghỉ phép đã trải ra theo (nhân viên, ngày) cho toàn bộ df_timeoff
+
+    Mỗi đơn được trải từ start_date tới end_date đúng một lần; tên nhân viên khớp mờ
+    (normalize) được cache theo tên tra cứu. Tra ngày nghỉ của một nhân viên trong tháng
+    chỉ còn O(số ngày làm việc) lần tra dict.
+    """
+
+    def __init__(self, df_timeoff: pd.DataFrame, normalize):
+        self.normalize = normalize
+        self.days: Dict[Tuple[Any, date], List[Tuple[Tuple[int, int], Dict]]] = {}
+        self.names: List[Any] = []
+        self._normalized_names: List[str] = []
+        self._resolved: Dict[str, Any] = {}
+        if df_timeoff is None or df_timeoff.empty:
+            return
+
+        self.names = list(df_timeoff['employee_name'].unique())
+        self._normalized_names = [normalize(name) for name in self.names]
+
+        for row in df_timeoff.to_dict('records'):
+            start, end = row.get('start_date'), row.get('end_date')
+            if pd.isna(start) or pd.isna(end):
+                continue
+            start_month = (start.year, start.month)
+            detail = {
+                'reason': row.get('ly_do', 'Không có lý do'),
+                'type': row.get('metatype', 'unknown'),
+                'state': row.get('state', 'unknown'),
+                'timeoff_id': row.get('id', '')
+            }
+            current, end_day = start.date(), end.date()
+            while current <= end_day:
+                self.days.setdefault((row['employee_name'], current), []).append(
+                    (start_month, {'date': current, **detail})
+                )
+                current += timedelta(days=1)
+
+    def resolve_name(self, emp_name: str):
+        """Tên trong df_timeoff ứng với emp_name (khớp chính xác, rồi khớp normalize/chứa nhau)"""
+        if emp_name in self._resolved:
+            return self._resolved[emp_name]
+
+        resolved = emp_name
+        if emp_name not in self.names:
+            emp_name_normalized = self.normalize(emp_name)
+            for name, name_normalized in zip(self.names, self._normalized_names):
+                if (emp_name_normalized == name_normalized or
+                    emp_name_normalized in name_normalized or
+                    name_normalized in emp_name_normalized):
+                    resolved = name
+                    break
+        self._resolved[emp_name] = resolved
+        return resolved
+
+    def get(self, emp_name: str, working_days, year: int, month: int) -> Dict:
+        """Ngày nghỉ phép (thuộc working_days) của các đơn bắt đầu trong tháng year/month"""
+        name = self.resolve_name(emp_name)
+        dates, details = [], []
+        for day in sorted(set(working_days)):
+            day_details = [dict(detail) for start_month, detail in self.days.get((name, day), ())
+                           if start_month == (year, month)]
+            if day_details:
+                dates.append(day)
+                details.extend(day_details)
+        return {'dates': dates, 'total_days': len(dates), 'details': details}
+
+
 class DetailedAttendanceAnalyzer:
     """Phân tích chi tiết chấm công từng nhân viên"""
     
-    def __init__(self, df_checkin: pd.DataFrame, df_timeoff: pd.DataFrame, employee_manager=None):
+    def __init__(self, df_checkin: pd.DataFrame, df_timeoff: pd.DataFrame, employee_manager=None,
+                 holiday_calendar=None, holiday_mode: Optional[str] = None):
+        """holiday_calendar / holiday_mode: lịch nghỉ lễ cấu hình sẵn (mặc định lấy từ CHECKIN_HOLIDAYS /
+        CHECKIN_HOLIDAY_MODE)"""
         self.df_checkin = df_checkin.copy() if not df_checkin.empty else pd.DataFrame()
         self.df_timeoff = df_timeoff.copy() if df_timeoff is not None and not df_timeoff.empty else pd.DataFrame()
         self.employee_manager = employee_manager
+        # Các chỉ mục / cache dưới đây dựng lười và dùng chung giữa các worker của pipeline
+        self._lock = threading.RLock()
+        self._daily_index = None
+        self._timeoff_index = None
+        self.holiday_calendar = parse_holiday_calendar(
+            HOLIDAY_CALENDAR if holiday_calendar is None else holiday_calendar
+        )
+        self.holiday_mode = holiday_mode or HOLIDAY_MODE
+        self._daily_presence = None
+        self._holidays_by_month: Dict[Tuple[int, int], List] = {}
         
         # Tạo mapping name -> username để tra cứu
         self.name_to_username_map = {}
@@ -732,6 +1105,24 @@ class DetailedAttendanceAnalyzer:
                 if name and name not in self.name_to_username_map:
                     self.name_to_username_map[name] = username
     
+    @property
+    def daily_index(self) -> DailyAttendanceIndex:
+        """Chỉ mục chấm công (nhân viên, ngày), dựng một lần cho mọi nhân viên"""
+        if self._daily_index is None:
+            with self._lock:
+                if self._daily_index is None:
+                    self._daily_index = DailyAttendanceIndex(self.df_checkin)
+        return self._daily_index
+
+    @property
+    def timeoff_index(self) -> TimeoffDayIndex:
+        """Chỉ mục nghỉ phép (nhân viên, ngày), dựng một lần cho mọi nhân viên"""
+        if self._timeoff_index is None:
+            with self._lock:
+                if self._timeoff_index is None:
+                    self._timeoff_index = TimeoffDayIndex(self.df_timeoff, self._normalize_name)
+        return self._timeoff_index
+
     def _get_working_days(self, year: int, month: int, include_today: bool = False):
         """Lấy danh sách ngày làm việc trong tháng (chỉ thứ 2-6, không tính thứ 7 và CN)"""
         cal = calendar.monthcalendar(year, month)
@@ -760,182 +1151,49 @@ class DetailedAttendanceAnalyzer:
         
         return working_days
     
+    def get_holidays(self, year: int, month: int) -> List:
+        """Ngày nghỉ lễ trong các ngày làm việc của tháng (tính một lần cho mỗi tháng)"""
+        key = (year, month)
+        if key not in self._holidays_by_month:
+            with self._lock:
+                if key not in self._holidays_by_month:
+                    working_days = self._get_working_days(year, month, include_today=False)
+                    self._holidays_by_month[key] = self._detect_holidays(working_days, self.df_checkin)
+        return self._holidays_by_month[key]
+
+    def _get_daily_presence(self, df_checkin: pd.DataFrame) -> Dict:
+        """Số nhân viên có chấm công theo từng ngày (một lượt groupby, cache cho df_checkin của analyzer)"""
+        if df_checkin is self.df_checkin and self._daily_presence is not None:
+            return self._daily_presence
+        presence = df_checkin.groupby(df_checkin['checkin_date'].dt.date)['employee_name'].nunique().to_dict()
+        if df_checkin is self.df_checkin:
+            self._daily_presence = presence
+        return presence
+
     def _detect_holidays(self, working_days: List, df_checkin: pd.DataFrame) -> List:
-        """Tự động phát hiện ngày nghỉ lễ dựa trên tỷ lệ chấm công thấp"""
-        if df_checkin.empty:
-            return []
-        
-        all_employees = df_checkin['employee_name'].nunique()
-        if all_employees == 0:
-            return []
-        
-        holidays = []
-        for day in working_days:
-            employees_present = df_checkin[
-                df_checkin['checkin_date'].dt.date == day
-            ]['employee_name'].nunique()
-            
-            # Nếu < 10% nhân viên có mặt thì coi như ngày nghỉ lễ
-            if (employees_present / all_employees) <= 0.1:
-                holidays.append(day)
-        
-        return holidays
+        """Phát hiện ngày nghỉ lễ: tỷ lệ chấm công thấp và/hoặc lịch nghỉ lễ cấu hình sẵn"""
+        if self.holiday_mode == 'override':
+            return [day for day in working_days if day in self.holiday_calendar]
+
+        low_presence_days = set()
+        if not df_checkin.empty:
+            all_employees = df_checkin['employee_name'].nunique()
+            if all_employees > 0:
+                presence = self._get_daily_presence(df_checkin)
+                # Nếu <= 10% nhân viên có mặt thì coi như ngày nghỉ lễ
+                low_presence_days = {
+                    day for day in working_days
+                    if presence.get(day, 0) / all_employees <= HOLIDAY_PRESENCE_THRESHOLD
+                }
+
+        return [day for day in working_days if day in low_presence_days or day in self.holiday_calendar]
     
     def _get_employee_timeoff_days(self, emp_name: str, working_days: List, 
                                    year: int, month: int) -> Dict:
         """Lấy chi tiết ngày nghỉ phép của nhân viên"""
         if self.df_timeoff.empty:
             return {'dates': [], 'total_days': 0, 'details': []}
-        
-        # Tìm tên tương tự trong timeoff data nếu không tìm thấy chính xác
-        actual_timeoff_name = emp_name
-        if not self.df_timeoff.empty:
-            exact_match = self.df_timeoff[self.df_timeoff['employee_name'] == emp_name]
-            if exact_match.empty:
-                # Tìm tên tương tự
-                unique_timeoff_names = self.df_timeoff['employee_name'].unique()
-                emp_name_normalized = self._normalize_name(emp_name)
-                
-                for name in unique_timeoff_names:
-                    name_normalized = self._normalize_name(name)
-                    if (emp_name_normalized == name_normalized or
-                        emp_name_normalized in name_normalized or 
-                        name_normalized in emp_name_normalized):
-                        actual_timeoff_name = name
-                        break
-        
-        # Filter timeoff của nhân viên (sử dụng tên đã tìm được)
-        emp_timeoff = self.df_timeoff[
-            (self.df_timeoff['employee_name'] == actual_timeoff_name) &
-            (self.df_timeoff['start_date'].dt.year == year) &
-            (self.df_timeoff['start_date'].dt.month == month)
-        ]
-        
-        timeoff_dates = []
-        timeoff_details = []
-        
-        for _, row in emp_timeoff.iterrows():
-            start_date = row['start_date'].date()
-            end_date = row['end_date'].date()
-            
-            # Lấy các ngày trong khoảng timeoff
-            current = start_date
-            while current <= end_date:
-                if current in working_days:
-                    timeoff_dates.append(current)
-                    timeoff_details.append({
-                        'date': current,
-                        'reason': row.get('ly_do', 'Không có lý do'),
-                        'type': row.get('metatype', 'unknown'),
-                        'state': row.get('state', 'unknown'),
-                        'timeoff_id': row.get('id', '')
-                    })
-                current += timedelta(days=1)
-        
-        return {
-            'dates': sorted(list(set(timeoff_dates))),
-            'total_days': len(set(timeoff_dates)),
-            'details': timeoff_details
-        }
-    
-    def _analyze_daily_checkin(self, emp_name: str, date, df_checkin: pd.DataFrame) -> Dict:
-        """Phân tích chi tiết chấm công trong 1 ngày"""
-        date_checkin = df_checkin[
-            (df_checkin['employee_name'] == emp_name) &
-            (df_checkin['checkin_date'].dt.date == date)
-        ].sort_values('checkin_datetime')
-        
-        if date_checkin.empty:
-            return {
-                'status': 'missing',
-                'checkins': [],
-                'first_checkin': None,
-                'last_checkout': None,
-                'is_late': False,
-                'is_early_checkout': False,
-                'total_records': 0,
-                'working_hours': 0,
-                'warnings': ['❌ Không có bản ghi chấm công']
-            }
-        
-        warnings = []
-        checkins = []
-        
-        # Tách checkin và checkout
-        checkin_records = date_checkin[date_checkin['is_checkout'] == 0]
-        checkout_records = date_checkin[date_checkin['is_checkout'] == 1]
-        
-        for _, record in date_checkin.iterrows():
-            checkin_time = record['checkin_datetime']
-            checkins.append({
-                'time': checkin_time.strftime('%H:%M:%S'),
-                'is_checkout': bool(record['is_checkout']),
-                'note': record.get('note', '')
-            })
-        
-        first_checkin = date_checkin.iloc[0]['checkin_datetime']
-        last_checkin = date_checkin.iloc[-1]['checkin_datetime']
-        
-        # Tính số giờ làm việc: checkout - checkin - 1
-        working_hours = 0
-        if not checkin_records.empty and not checkout_records.empty:
-            # Lấy checkin đầu tiên và checkout cuối cùng
-            first_checkin_time = checkin_records.iloc[0]['checkin_datetime']
-            last_checkout_time = checkout_records.iloc[-1]['checkin_datetime']
-            
-            # Tính số giờ: checkout - checkin - 1
-            time_diff = last_checkout_time - first_checkin_time
-            working_hours = max(0, time_diff.total_seconds() / 3600 - 1)
-        
-        # Phân loại check-in (Mới)
-        # Early: < 8:00
-        # Standard: 8:00 - 8:30
-        # Late: > 8:30
-        checkin_minutes = first_checkin.hour * 60 + first_checkin.minute
-        checkin_status = 'standard'
-        
-        if checkin_minutes < 8 * 60:
-            checkin_status = 'early'
-        elif checkin_minutes > 8 * 60 + 30:
-            checkin_status = 'late'
-            
-        # Kiểm tra đi trễ (sau 8:30) - Giữ logic cũ cho tương thích nhưng cập nhật biến
-        is_late = (checkin_status == 'late')
-        
-        if is_late:
-            warnings.append(f'⏰ Đi trễ: Check-in lúc {first_checkin.strftime("%H:%M")}')
-        elif checkin_status == 'early':
-             # Có thể thêm warning hoặc info nếu muốn, hiện tại giữ nguyên
-             pass
-
-        
-        # Kiểm tra về sớm (trước 17:30)
-        is_early_checkout = False
-        if len(date_checkin) > 1:
-            is_early_checkout = (last_checkin.hour < STANDARD_END_HOUR) or \
-                                (last_checkin.hour == STANDARD_END_HOUR and last_checkin.minute < STANDARD_END_MINUTE)
-            if is_early_checkout:
-                warnings.append(f'🏃 Về sớm: Check-out lúc {last_checkin.strftime("%H:%M")}')
-        else:
-            warnings.append('⚠️ Chỉ có 1 lần chấm công (thiếu check-out)')
-        
-        # Kiểm tra số lần chấm công bất thường
-        if len(date_checkin) > 4:
-            warnings.append(f'❓ Số lần chấm công nhiều ({len(date_checkin)} lần)')
-        
-        return {
-            'status': 'present',
-            'checkins': checkins,
-            'first_checkin': first_checkin.strftime('%H:%M:%S'),
-            'last_checkout': last_checkin.strftime('%H:%M:%S') if len(date_checkin) > 1 else None,
-            'is_late': is_late,
-            'checkin_status': checkin_status, # Thêm trường này
-            'is_early_checkout': is_early_checkout,
-            'total_records': len(date_checkin),
-            'working_hours': round(working_hours, 2),
-            'warnings': warnings if warnings else ['✅ Bình thường']
-        }
-
+        return self.timeoff_index.get(emp_name, working_days, year, month)
     
     def _get_since_by_employee_name(self, emp_name: str) -> str:
         """Lấy trường 'since' (timestamp) từ employee_name"""
@@ -1091,18 +1349,14 @@ class DetailedAttendanceAnalyzer:
         
         # Lấy ngày làm việc
         working_days = self._get_working_days(year, month, include_today=False)
-        holidays = self._detect_holidays(working_days, self.df_checkin)
+        holidays = set(self.get_holidays(year, month))
         actual_working_days = [d for d in working_days if d not in holidays]
         
-        # Lọc checkin của nhân viên (sử dụng tên đã tìm được)
-        emp_checkin = self.df_checkin[
-            (self.df_checkin['employee_name'] == actual_checkin_name) &
-            (self.df_checkin['checkin_date'].dt.year == year) &
-            (self.df_checkin['checkin_date'].dt.month == month)
-        ]
-        
         # Lấy thông tin nghỉ phép (sử dụng tên gốc từ Account API)
         timeoff_info = self._get_employee_timeoff_days(emp_name, actual_working_days, year, month)
+        timeoff_by_date = {}
+        for detail in timeoff_info['details']:
+            timeoff_by_date.setdefault(detail['date'], detail)
         
         # Lấy trường 'since' (ngày vào làm)
         since_timestamp = None
@@ -1130,14 +1384,12 @@ class DetailedAttendanceAnalyzer:
             if since_date and day < since_date.date():
                 continue
             
-            # Sử dụng tên trong checkin data để phân tích
-            day_analysis = self._analyze_daily_checkin(actual_checkin_name, day, emp_checkin)
+            # Sử dụng tên trong checkin data để phân tích (tra từ chỉ mục theo ngày)
+            day_analysis = self.daily_index.get(actual_checkin_name, day)
             
             # Kiểm tra xem ngày này có nghỉ phép không
-            is_timeoff = day in timeoff_info['dates']
-            timeoff_detail = None
-            if is_timeoff:
-                timeoff_detail = next((x for x in timeoff_info['details'] if x['date'] == day), None)
+            timeoff_detail = timeoff_by_date.get(day)
+            is_timeoff = timeoff_detail is not None
             
             # Xác định status
             if is_timeoff:
@@ -1409,39 +1661,71 @@ def timestamp_to_hcm(ts):
     except:
         return 'N/A'
 
-def get_checkin_data(employee_name, year, month, join_date=None):
-    """Lấy và phân tích dữ liệu checkin"""
+def load_checkin_month_data(year, month):
+    """Tải dữ liệu checkin + timeoff toàn công ty của một tháng (dùng chung cho mọi nhân viên)"""
+    print(f"🔄 Đang tải dữ liệu Checkin/Timeoff toàn công ty ({month}/{year})...")
+
+    checkin_loader = CheckinLoader(CHECKIN_TOKEN)
+    start_date, end_date = get_month_range(year, month)
+
+    df_checkin = checkin_loader.load_checkin_data(start_date, end_date)
+
+    timeoff_processor = TimeoffProcessor(TIMEOFF_TOKEN, ACCOUNT_TOKEN)
+    # API timeoff cần start_date_from/to
+    # Nó mapping: start_date_from -> payload['start_date_from']
+    raw_timeoff = timeoff_processor.get_base_timeoff_data(
+        start_date_from=start_date.strftime('%Y-%m-%d'),
+        end_date_to=end_date.strftime('%Y-%m-%d')
+    )
+    df_timeoff = timeoff_processor.extract_timeoff_to_dataframe(raw_timeoff)
+
+    # Dùng lại EmployeeManager của TimeoffProcessor thay vì gọi Account API thêm lần nữa
+    return build_checkin_month_data(year, month, df_checkin, df_timeoff, timeoff_processor.employee_manager)
+
+def get_month_range(year, month):
+    """Khoảng thời gian cả tháng (00:00 ngày đầu -> 23:59:59 ngày cuối, giờ HCM)"""
+    start_date = datetime(year, month, 1, 0, 0, 0, tzinfo=hcm_tz)
+    _, last_day = calendar.monthrange(year, month)
+    end_date = datetime(year, month, last_day, 23, 59, 59, tzinfo=hcm_tz)
+    return start_date, end_date
+
+def build_checkin_month_data(year, month, df_checkin, df_timeoff, employee_manager):
+    """Dựng month_data (xem load_checkin_month_data) từ dữ liệu đã tải"""
+    print(f"DEBUG: load_checkin_month_data - df_checkin size: {len(df_checkin)}")
+    analyzer = DetailedAttendanceAnalyzer(df_checkin, df_timeoff, employee_manager)
+    print(f"DEBUG: analyzer created. Mapping size: {len(analyzer.name_to_username_map)}")
+
+    return {
+        'year': year,
+        'month': month,
+        'df_checkin': df_checkin,
+        'df_timeoff': df_timeoff,
+        'employee_manager': employee_manager,
+        'analyzer': analyzer
+    }
+
+def _employee_records(df, employee_name):
+    """Các dòng của một nhân viên trong df (theo cột employee_name), dạng records chuỗi"""
+    if df is None or df.empty or 'employee_name' not in df.columns:
+        return []
+    return df[df['employee_name'] == employee_name].astype(str).to_dict(orient="records")
+
+def get_checkin_data(employee_name, year, month, join_date=None, month_data=None):
+    """Lấy và phân tích dữ liệu checkin
+
+    month_data: kết quả của load_checkin_month_data (nếu đã tải sẵn cho cả công ty).
+    """
     try:
         print(f"🔄 Đang tải dữ liệu Checkin/Timeoff cho {employee_name} ({month}/{year})...")
         
-        # 1. Load data
-        checkin_loader = CheckinLoader(CHECKIN_TOKEN)
-        # Lấy range cả tháng
-        start_date = datetime(year, month, 1, 0, 0, 0, tzinfo=hcm_tz)
-        _, last_day = calendar.monthrange(year, month)
-        end_date = datetime(year, month, last_day, 23, 59, 59, tzinfo=hcm_tz)
-        
-        df_checkin = checkin_loader.load_checkin_data(start_date, end_date)
-        
-        timeoff_processor = TimeoffProcessor(TIMEOFF_TOKEN, ACCOUNT_TOKEN)
-        # Payload cho timeoff
-        timeoff_start_str = start_date.strftime('%Y-%m-%d')
-        timeoff_end_str = end_date.strftime('%Y-%m-%d')
-        # API timeoff cần start_date_from/to
-        # Lưu ý: check lại TimeoffProcessor.get_base_timeoff_data arguments
-        # Nó mapping: start_date_from -> payload['start_date_from']
-        raw_timeoff = timeoff_processor.get_base_timeoff_data(
-            start_date_from=timeoff_start_str,
-            end_date_to=timeoff_end_str
-        )
-        df_timeoff = timeoff_processor.extract_timeoff_to_dataframe(raw_timeoff)
-        
-        employee_manager = EmployeeManager(ACCOUNT_TOKEN)
+        # 1. Load data (chỉ tải khi chưa có snapshot của tháng)
+        if month_data is None:
+            month_data = load_checkin_month_data(year, month)
+        df_checkin = month_data['df_checkin']
+        df_timeoff = month_data['df_timeoff']
+        analyzer = month_data['analyzer']
         
         # 2. Analyze
-        print(f"DEBUG: get_checkin_data - df_checkin size: {len(df_checkin)}")
-        analyzer = DetailedAttendanceAnalyzer(df_checkin, df_timeoff, employee_manager)
-        print(f"DEBUG: analyzer created. Mapping size: {len(analyzer.name_to_username_map)}")
         report = analyzer.analyze_employee_detail(employee_name, year, month, join_date=join_date)
         
         if not report:
@@ -1483,9 +1767,10 @@ def get_checkin_data(employee_name, year, month, join_date=None):
                                       if rec['status'] == 'present' and 
                                       start_week <= rec['date'] <= end_week)
 
+        # Raw records cho MCP: chỉ các dòng của nhân viên này, không trả dữ liệu cả công ty
         raw_df_records = {
-            "checkin": df_checkin.astype(str).to_dict(orient="records") if df_checkin is not None else [],
-            "timeoff": df_timeoff.astype(str).to_dict(orient="records") if df_timeoff is not None else []
+            "checkin": _employee_records(df_checkin, report['actual_checkin_name']),
+            "timeoff": _employee_records(df_timeoff, analyzer.timeoff_index.resolve_name(employee_name))
         }
 
         return {
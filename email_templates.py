@@ -0,0 +1,663 @@
+"""
+email_templates - template HTML biên dịch sẵn cho email báo cáo (create_email_html, base_formatter).
+
+Template được biên dịch một lần khi import: HTML bỏ thụt lề / dòng trống, CSS bỏ comment và
+khoảng trắng, rồi mỗi template được dịch thành một hàm Python trả về một f-string (như Jinja2
+dịch template thành code), nên lúc dựng email không phải parse lại template. Danh sách (task,
+bài viết, dòng bảng...) được ghép bằng ''.join thay vì cộng chuỗi trong vòng lặp. Các style
+lặp lại (hộp AI, thẻ KPI, bài viết Inside, danh sách sắp đến hạn) dùng class CSS chung trong
+REPORT_CSS thay vì style inline ở từng phần tử.
+
+Cú pháp field giống str.format: {name}, {value:.1f}, {summary[total_tasks]}, {obj.attr}. Giá
+trị được chèn nguyên văn (không escape HTML), giống các f-string trước đây.
+"""
+import re
+from string import Formatter
+
+_NEWLINE_WS = re.compile(r'\s*\n\s*')
+_CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+_CSS_WS = re.compile(r'\s+')
+_CSS_PUNCT = re.compile(r'\s*([{};:,])\s*')
+_FIELD_PATH = re.compile(r'\.(\w+)|\[([^\]]+)\]')
+
+
+def minify_html(text: str) -> str:
+    """Gộp mỗi cụm khoảng trắng có xuống dòng thành một '\\n' (trình duyệt hiển thị như cũ)"""
+    return _NEWLINE_WS.sub('\n', text).strip()
+
+
+def minify_css(text: str) -> str:
+    """Bỏ comment và khoảng trắng thừa của CSS"""
+    text = _CSS_WS.sub(' ', _CSS_COMMENT.sub('', text))
+    return _CSS_PUNCT.sub(r'\1', text).replace(';}', '}').strip()
+
+
+def _compile(source: str):
+    """Dịch template thành hàm render(**values) trả về một f-string.
+
+    Đoạn chữ và khóa [key] được truyền vào qua default argument (_l0, _l1...) nên không phải
+    escape dấu nháy / ngoặc nhọn trong code sinh ra.
+    """
+    params, constants, parts = [], {}, []
+    for literal, field, spec, conversion in Formatter().parse(source):
+        if literal:
+            name = f"_l{len(constants)}"
+            constants[name] = literal
+            parts.append('{' + name + '}')
+        if field is None:
+            continue
+        match = re.match(r'\w+', field)
+        if not match or not match.group().isidentifier():
+            raise ValueError(f"Field không hợp lệ trong template: {{{field}}}")
+        root = match.group()
+        if root not in params:
+            params.append(root)
+        expr = root
+        for attr, key in _FIELD_PATH.findall(field[match.end():]):
+            if attr:
+                expr += '.' + attr
+            else:
+                name = f"_l{len(constants)}"
+                constants[name] = int(key) if key.isdigit() else key
+                expr += f"[{name}]"
+        if spec and '{' in spec:
+            raise ValueError(f"Không hỗ trợ field lồng trong format spec: {{{field}:{spec}}}")
+        parts.append('{' + expr + (f"!{conversion}" if conversion else '') + (f":{spec}" if spec else '') + '}')
+    signature = ', '.join(['*'] + params + [f"{name}={name}" for name in constants]) if (params or constants) else ''
+    code = f"def render({signature}):\n    return f{''.join(parts)!r}\n"
+    namespace = dict(constants)
+    exec(code, namespace)
+    return namespace['render']
+
+
+class Template:
+    """Template HTML đã minify và biên dịch sẵn; render(**values) trả về chuỗi HTML"""
+
+    __slots__ = ('source', 'render')
+
+    def __init__(self, source: str):
+        self.source = minify_html(source)
+        self.render = _compile(self.source)
+
+
+# ============================================================================
+# CSS CỦA EMAIL BÁO CÁO (app_v2_all.create_email_html)
+# ============================================================================
+REPORT_CSS = minify_css("""
+    /* RESET & CORE */
+    body {
+        font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Helvetica, Arial, sans-serif;
+        line-height: 1.6;
+        color: #212529;
+        background-color: #f4f6f8;
+        margin: 0;
+        padding: 0;
+        -webkit-text-size-adjust: 100%;
+        -ms-text-size-adjust: 100%;
+    }
+    
+    .email-container {
+        max-width: 740px; /* Rộng hơn cho PC thoáng (cũ 680px) */
+        margin: 40px auto; /* Cách xa cạnh trên dưới hơn */
+        background-color: #ffffff;
+        padding: 45px; /* Padding rộng rãi hơn */
+        border-radius: 16px; /* Bo góc mềm mại hơn */
+        box-shadow: 0 8px 30px rgba(0,0,0,0.08); /* Shadow sâu và sang hơn */
+        border: 1px solid #eaeaea;
+    }
+
+    /* RESPONSIVE MOBILE STRATEGIES - Giữ nguyên logic này */
+    @media only screen and (max-width: 600px) {
+        body {
+            padding: 0 !important;
+            background-color: #ffffff !important; /* Mobile full trắng cho sạch */
+        }
+        .email-container {
+            padding: 20px 15px !important;
+            margin: 0 !important;
+            width: 100% !important;
+            box-shadow: none !important;
+            border-radius: 0 !important;
+            border: none !important;
+            max-width: 100% !important;
+        }
+        .main-header {
+            font-size: 24px !important;
+            margin-top: 10px !important;
+        }
+        .section-title {
+            font-size: 19px !important;
+        }
+        .intro-text {
+            font-size: 14px !important;
+        }
+    }
+    
+    /* HEADER */
+    .main-header {
+        font-size: 30px; /* To hơn trên PC */
+        font-weight: 800; /* Đậm hơn */
+        color: #004a99;
+        margin-bottom: 25px;
+        border-bottom: 3px solid #004a99; /* Dày hơn chút */
+        padding-bottom: 18px;
+        letter-spacing: -0.5px;
+    }
+    .greeting {
+        font-weight: 600;
+        color: #2c3e50;
+        font-size: 16px;
+        margin-bottom: 15px;
+    }
+    .intro-text {
+        color: #495057;
+        margin-bottom: 20px;
+        font-size: 15px;
+    }
+    .intro-text em {
+        font-style: italic;
+        color: #004a99;
+    }
+    .intro-text ul {
+        padding-left: 25px;
+    }
+    .report-date {
+        font-style: italic;
+        color: #6c757d;
+        font-size: 13px;
+        margin-bottom: 30px;
+    }
+
+    /* SECTIONS GENERAL */
+    .section {
+        margin-bottom: 35px;
+    }
+    .section-title {
+        font-size: 20px;
+        font-weight: 700; /* Đậm */
+        margin-bottom: 10px;
+        color: #212529; /* Màu chữ chính, không dùng màu */
+        
+        /* Thay đổi: Dùng border-left để tạo màu nhấn */
+        padding-left: 12px;
+        border-left: 4px solid #ccc; /* Màu mặc định */
+    }
+    .section-desc {
+        font-style: italic;
+        font-weight: 500;
+        margin-bottom: 15px;
+        color: #555; /* Bỏ màu, dùng màu xám chung */
+        font-size: 15px;
+    }
+    
+    /* Cập nhật các class màu nhấn cho border */
+    .goal-title { border-left-color: #ffc107; }
+    .wework-title { border-left-color: #20c997; }
+    .checkin-title { border-left-color: #17a2b8; }
+    .inside-title { border-left-color: #6f42c1; }
+    .workflow-title { border-left-color: #fd7e14; }
+
+    /* STATS BOXES (Cải tiến thành dạng "Card") */
+    .stats-box {
+        background-color: #ffffff; /* Nền trắng */
+        border: 1px solid #e9ecef; /* Viền xám mỏng, tinh tế */
+        padding: 20px; /* Tăng padding */
+        border-radius: 8px; /* Bo góc rõ hơn */
+        margin-top: 10px;
+    }
+    
+    /* Box trạng thái Cảnh báo (Warning) */
+    .warning-box {
+        background-color: #fff3f3; /* Đỏ rất nhạt */
+        border: 1px solid #f5c6cb;
+        color: #721c24;
+        border-left: 4px solid #dc3545; /* Viền trái đỏ đậm */
+    }
+    
+    /* Box trạng thái Thành công (Success) - cho Goal */
+    .success-box {
+        background-color: #e6f7ec; /* Xanh lá rất nhạt */
+        border: 1px solid #c3e6cb;
+        color: #155724;
+        border-left: 4px solid #28a745; /* Viền trái xanh đậm */
+    }
+    
+    /* Box màu cho WeWork - Xanh ngọc bích */
+    .wework-box {
+        background-color: #e0f2f1; /* Xanh ngọc bích rất nhạt */
+        border: 1px solid #80cbc4;
+        color: #004d40;
+        border-left: 4px solid #20c997; /* Viền trái xanh ngọc đậm */
+    }
+    
+    /* Box màu cho Checkin - Xanh dương */
+    .checkin-box {
+        background-color: #e0f7fa; /* Xanh dương rất nhạt */
+        border: 1px solid #b3e5fc;
+        color: #01579b;
+        border-left: 4px solid #17a2b8; /* Viền trái xanh dương đậm */
+    }
+    
+    /* Box màu cho Inside - Tím */
+    .inside-box {
+        background-color: #f3e5f5; /* Tím rất nhạt */
+        border: 1px solid #e1bee7;
+        color: #4a148c;
+        border-left: 4px solid #6f42c1; /* Viền trái tím đậm */
+    }
+    
+    /* Box màu cho Workflow - Cam */
+    .workflow-box {
+        background-color: #fff3e0; /* Cam rất nhạt */
+        border: 1px solid #ffe0b2;
+        color: #e65100;
+        border-left: 4px solid #fd7e14; /* Viền trái cam đậm */
+    }
+    
+    .sub-header {
+        font-weight: 600; /* Semi-bold */
+        margin-bottom: 15px;
+        font-size: 16px;
+    }
+    .stat-list {
+        list-style-type: none;
+        padding-left: 5px;
+        margin: 0;
+    }
+    .stat-list li {
+        margin-bottom: 10px; /* Tăng khoảng cách */
+        font-size: 15px;
+    }
+    /* Nhấn mạnh con số bằng màu xanh */
+    .stat-list li strong {
+        color: #004a99;
+        font-weight: 600;
+    }
+    
+    /* Màu chữ cho các box có màu nền */
+    .success-box .stat-list li strong {
+        color: #155724; /* Xanh lá đậm */
+    }
+    
+    .wework-box .stat-list li strong {
+        color: #004d40; /* Xanh ngọc bích đậm */
+    }
+    
+    .checkin-box .stat-list li strong {
+        color: #01579b; /* Xanh dương đậm */
+    }
+    
+    .inside-box .stat-list li strong {
+        color: #4a148c; /* Tím đậm */
+    }
+    
+    .workflow-box .stat-list li strong {
+        color: #e65100; /* Cam đậm */
+    }
+    
+    .evaluation-section {
+        margin-top: 15px;
+        font-size: 15px;
+        background-color: #f8f9fa;
+        padding: 12px 15px;
+        border-radius: 6px;
+    }
+    
+    /* INSIDE POSTS SECTION */
+    .latest-posts-section {
+        margin-top: 15px;
+    }
+    .post-item {
+        background-color: #f8f9fa;
+        border-left: 3px solid #6f42c1;
+        padding: 15px;
+        margin-bottom: 12px;
+        border-radius: 6px;
+    }
+    .post-title {
+        font-weight: 600;
+        font-size: 15px;
+        color: #212529;
+        margin-bottom: 8px;
+    }
+    .post-meta {
+        font-size: 13px;
+        color: #6c757d;
+        margin-bottom: 8px;
+    }
+    .post-preview {
+        font-size: 14px;
+        color: #495057;
+        line-height: 1.5;
+    }
+    .post-link {
+        margin-top: 10px;
+        padding-top: 10px;
+        border-top: 1px solid #dee2e6;
+    }
+    .post-link a:hover {
+        text-decoration: underline !important;
+    }
+
+    /* FOOTER MESSAGE (Tinh chỉnh lại) */
+    .footer-message {
+        background-color: #eef6f8; /* Xanh dương nhạt hơn 1 chút */
+        padding: 25px;
+        border-radius: 8px;
+        margin-top: 40px;
+        border-left: 5px solid #17a2b8; /* Giữ nguyên viền trái */
+    }
+    .footer-title {
+        font-weight: 700;
+        color: #17a2b8; /* Dùng màu xanh của viền */
+        margin-bottom: 10px;
+        text-transform: uppercase;
+        font-size: 16px;
+    }
+    .footer-message p {
+        margin-bottom: 10px;
+        color: #34495e;
+    }
+
+    /* KHỐI DÙNG CHUNG (thay cho style inline lặp lại ở từng phần tử) */
+    .ai-block { margin-top: 15px; border-top: 1px dashed #ccc; padding-top: 10px; }
+    .ai-block-wework { border-top-color: #80cbc4; }
+    .ai-block-workflow { border-top-color: #ffe0b2; }
+    .ai-insight { background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); padding: 15px; border-radius: 8px; margin-bottom: 12px; }
+    .ai-recommend { background: linear-gradient(135deg, #11998e 0%, #38ef7d 100%); padding: 15px; border-radius: 8px; }
+    .ai-title { font-weight: 700; color: #fff; font-size: 14px; margin-bottom: 8px; }
+    .ai-insight .ai-title { margin-bottom: 10px; }
+    .ai-body { color: #fff; font-size: 13px; line-height: 1.6; }
+    .upcoming-box { margin-top: 10px; background-color: #fff3cd; padding: 8px; border-radius: 4px; border-left: 3px solid #ffc107; }
+    .upcoming-list { font-size: 13px; margin-top: 4px; }
+    .upcoming-name { color: #e65100; font-weight: 600; }
+    .kpi-card { background-color: #fff; border-radius: 8px; padding: 15px; margin-bottom: 20px; box-shadow: 0 2px 5px rgba(0,0,0,0.05); }
+    .kpi-table { width: 100%; border-collapse: collapse; }
+    .kpi-cell { width: 50%; text-align: center; vertical-align: top; }
+    .kpi-middle { vertical-align: middle; }
+    .kpi-divider { border-right: 1px solid #eee; }
+    .kpi-big { font-size: 28px; font-weight: 800; color: #01579b; line-height: 1.2; margin-bottom: 5px; }
+    .kpi-big-label { font-size: 13px; color: #666; display: block; }
+    .kpi-heading { font-size: 11px; font-weight: 700; text-transform: uppercase; margin-bottom: 5px; letter-spacing: 0.5px; }
+    .kpi-value { font-size: 26px; font-weight: 800; color: #333; line-height: 1.2; margin-bottom: 4px; }
+    .kpi-caption { font-size: 12px; color: #777; margin-bottom: 4px; }
+    .kpi-note { font-size: 11px; color: #999; }
+    .kpi-note span { font-weight: 600; }
+    .feed-item { padding: 10px; border-bottom: 1px dashed #e0e0e0; display: flex; align-items: flex-start; }
+    .feed-icon { font-size: 20px; margin-right: 10px; }
+    .feed-body { flex: 1; }
+    .feed-title { font-weight: 600; color: #2c3e50; text-decoration: none; display: block; margin-bottom: 4px; }
+    .ai-item { margin-bottom: 10px; padding-left: 18px; position: relative; }
+    .ai-bullet { position: absolute; left: 0; color: rgba(255,255,255,0.8); }
+    .ai-line { margin-bottom: 10px; }
+    .feed-meta { font-size: 12px; color: #888; display: flex; justify-content: space-between; }
+""")
+
+
+# ============================================================================
+# TEMPLATE CÁC KHỐI CỦA EMAIL BÁO CÁO
+# ============================================================================
+# Hộp AI Insight + AI Recommend cuối mỗi section (variant: '' | ' ai-block-wework' | ' ai-block-workflow')
+AI_BLOCK = Template("""
+<div class="ai-block{variant}">
+    <div class="ai-insight">
+        <div class="ai-title">🤖 AI Insight:</div>
+        <div class="ai-body">{insight}</div>
+    </div>
+    <div class="ai-recommend">
+        <div class="ai-title">💡 AI Recommend:</div>
+        <div class="ai-body">{recommend}</div>
+    </div>
+</div>
+""")
+
+# Một dòng nội dung AI (format_ai_content_to_html)
+AI_BULLET = Template('<div class="ai-item"><span class="ai-bullet">▸</span>{text}</div>')
+AI_LINE = Template('<div class="ai-line">{text}</div>')
+
+UPCOMING_ITEM = Template('<div>• <span class="upcoming-name">{name}</span> ({day_str})</div>')
+UPCOMING_BOX = Template("""
+<li class="upcoming-box">
+    <strong>⚠️ Sắp đến hạn (7 ngày tới):</strong>
+    <div class="upcoming-list">{items}</div>
+</li>
+""")
+
+GOAL_BOX = Template("""
+<div class="stats-box success-box">
+    <div class="sub-header">🎯 Hiệu suất & Kỷ luật OKR:</div>
+    <ul class="stat-list">
+        <li><strong>Biến động tuần qua:</strong> <span style="color: {trend_color}; font-weight: bold;">{trend_icon} {shift_val:+.2f}% ({trend_text})</span></li>
+        <li><strong>Kết quả hiện tại:</strong> {weekly[current_value]:.2f}% (Tuần trước: {weekly[last_friday_value]:.2f}%)</li>
+        <li style="margin-top: 10px; border-top: 1px dashed #ccc; padding-top: 5px;"><strong>🔍 Phân tích hành vi (Integrity):</strong></li>
+        <li>• Số lần Check-in trong kỳ: <strong>{checkin_count} lần</strong> - <em>{discipline_text}</em></li>
+        <li>• Tần suất trung bình: <strong>{checkin_freq:.1f} lần/tuần</strong></li>
+        <li>• Lần check-in cuối: <strong>{last_checkin}</strong></li>
+    </ul>
+    {goals_html}
+</div>
+""")
+
+GOAL_MISSING = Template("""
+<div class="stats-box warning-box">
+    <div class="sub-header">🚨 Cảnh báo OKR:</div>
+    <ul class="stat-list warning-list">
+        <li>❌ Hệ thống ghi nhận bạn <strong>chưa thiết lập OKR</strong> hoặc dữ liệu chưa đồng bộ.</li>
+        <li>👉 Hành động ngay: Vui lòng review lại OKR cá nhân trên Base Goal.</li>
+    </ul>
+</div>
+""")
+
+WEWORK_WARNING = Template("""
+<div class="stats-box warning-box">
+    <div style="font-weight: bold; font-size: 16px; margin-bottom: 5px;">⚠️ Cần lưu ý:</div>
+    <div>Hệ thống không ghi nhận hoạt động nào trên WeWork trong 1 tháng qua.</div>
+    <div style="margin-top: 5px; font-size: 13px;">Hãy rà soát lại các công việc và cập nhật tiến độ ngay nhé!</div>
+</div>
+""")
+
+WEWORK_BOX = Template("""
+<div class="stats-box wework-box">
+    <div class="sub-header">📊 Quản trị công việc & Rủi ro (1 tháng gần nhất):</div>
+    <ul class="stat-list">
+        <li>📋 Tổng quan: <strong>{summary[total_tasks]} task</strong> (Done: {summary[completion_rate]:.1f}%)</li>
+        <li>⚡ Tốc độ: <strong>{summary[on_time_rate]:.1f}%</strong> công việc hoàn thành đúng hạn.</li>
+        <li>🐢 Hoàn thành muộn: <strong>{completed_late} task</strong></li>
+        <li>⚠️ Không Deadline: <strong>{no_deadline} task</strong></li>
+        {upcoming_html}
+    </ul>
+    {ai_html}
+</div>
+""")
+
+WEWORK_EMPTY = Template('<div class="stats-box wework-box"><p><em>Chưa có dữ liệu công việc để phân tích.</em></p></div>')
+
+CHECKIN_BOX = Template("""
+<div class="stats-box checkin-box">
+    <div class="sub-header" style="display: flex; justify-content: space-between; align-items: center;">
+        <span>📊 Tổng quan tháng {period[month]}/{period[year]}:</span>
+        <span style="font-size: 12px; background: {style_color}; color: #fff; padding: 2px 8px; border-radius: 10px;">{style_tag}</span>
+    </div>
+    <div class="kpi-card">
+        <table class="kpi-table">
+            <tr>
+                <td class="kpi-cell kpi-middle kpi-divider">
+                    <div class="kpi-big">{summary[days_present]}/{summary[total_working_days]}</div>
+                    <div class="kpi-big-label">Ngày công thực tế</div>
+                </td>
+                <td class="kpi-cell kpi-middle">
+                    <div class="kpi-big">{avg_checkin_str}</div>
+                    <div class="kpi-big-label">Check-in trung bình</div>
+                </td>
+            </tr>
+        </table>
+    </div>
+    <div style="margin-bottom: 15px;">
+        <div style="font-weight: 600; font-size: 14px; color: #444;">🎯 Xu hướng giờ giấc (Arrival Trend):</div>
+        <div style="font-size: 13px; color: #555; margin-top: 4px;">
+            Bạn có xu hướng check-in lúc <strong>{avg_checkin_str}</strong>. {style_msg}
+        </div>
+        <div style="display: flex; height: 12px; width: 100%; background: #eee; border-radius: 6px; overflow: hidden; margin-top: 8px;">
+            <div style="width: {p_early}%; background: #28a745;" title="Đến sớm"></div>
+            <div style="width: {p_std}%; background: #17a2b8;" title="Đúng giờ"></div>
+            <div style="width: {p_late}%; background: #dc3545;" title="Đi trễ"></div>
+        </div>
+        <div style="display: flex; justify-content: space-between; font-size: 11px; color: #666; margin-top: 4px;">
+            <span><span style="color:#28a745">●</span> Sớm ({early_arrival})</span>
+            <span><span style="color:#17a2b8">●</span> Chuẩn ({standard_arrival})</span>
+            <span><span style="color:#dc3545">●</span> Trễ ({late_arrival})</span>
+        </div>
+    </div>
+    <div style="background-color: #fff; border: 1px solid #e0e0e0; padding: 10px; border-radius: 6px; font-size: 13px;">
+        <div style="font-weight: 600; color: #d32f2f; margin-bottom: 5px;">⚠️ Dữ liệu cần lưu ý:</div>
+        <ul style="margin: 0; padding-left: 20px; color: #333;">
+            <li>Vắng không phép/Chưa giải trình: <strong>{summary[days_missing]} ngày</strong></li>
+            <li>Về sớm: <strong>{summary[early_checkout_count]} lần</strong></li>
+            <li>Tỷ lệ chuyên cần (Adjusted): <strong>{summary[adjusted_attendance_rate]:.1f}%</strong></li>
+        </ul>
+    </div>
+</div>
+""")
+
+CHECKIN_EMPTY = Template('<div class="stats-box checkin-box"><p><em>Không có dữ liệu chấm công để phân tích.</em></p></div>')
+
+FEED_ITEM = Template("""
+<div class="feed-item">
+    <div class="feed-icon">{icon}</div>
+    <div class="feed-body">
+        <a href="{link}" class="feed-title">
+            {post[title]}
+        </a>
+        <div class="feed-meta">
+            <span>👤 {post[author]} • {post[date]}</span>
+            <span>❤️ {post[reactions_count]} • 👁️ {post[views_count]}</span>
+        </div>
+    </div>
+</div>
+""")
+
+FEED_EMPTY = Template("<div style='padding:10px; font-style:italic; color:#999'>Chưa có bài viết mới nào.</div>")
+
+INSIDE_BOX = Template("""
+<div class="stats-box inside-box">
+    <div style="background-color: {archetype_bg}; padding: 12px; border-radius: 6px; margin-bottom: 15px;">
+        <div style="font-weight: 700; color: {archetype_color}; font-size: 15px; margin-bottom: 4px;">
+            {archetype}
+        </div>
+        <div style="font-size: 13px; color: #555;">{archetype_desc}</div>
+    </div>
+    <div class="kpi-card">
+        <table class="kpi-table">
+            <tr>
+                <td class="kpi-cell kpi-divider">
+                    <div class="kpi-heading" style="color: #6f42c1;">
+                        📡 Sức lan tỏa
+                    </div>
+                    <div class="kpi-value">{summary[employee_views]}</div>
+                    <div class="kpi-caption">Lượt xem bài của bạn</div>
+                    <div class="kpi-note">
+                        (<span style="color: #6f42c1;">{summary[employee_reactions]}</span> tim nhận được)
+                    </div>
+                </td>
+                <td class="kpi-cell">
+                    <div class="kpi-heading" style="color: #e91e63;">
+                        🤝 Sự gắn kết
+                    </div>
+                    <div class="kpi-value">{reactions_given}</div>
+                    <div class="kpi-caption">Lượt thả tim cho đồng nghiệp</div>
+                    <div class="kpi-note">
+                        (<span style="color: #e91e63;">{views_given}</span> bài đã đọc)
+                    </div>
+                </td>
+            </tr>
+        </table>
+    </div>
+    <div style="font-size: 13px; color: #555; margin-bottom: 20px; padding: 8px; background-color: #f8f9fa; border-radius: 4px;">
+        💡 <strong>Insight:</strong> {impact_msg}
+    </div>
+    <div style="border-top: 1px solid #eee; padding-top: 15px;">
+        <div style="font-weight: 600; color: #444; margin-bottom: 10px; font-size: 14px;">
+            🗞️ Tiêu điểm truyền thông nội bộ:
+        </div>
+        <div style="background: #fff; border: 1px solid #eee; border-radius: 6px;">
+            {posts_html}
+        </div>
+        <div style="text-align: right; margin-top: 8px;">
+            <a href="https://inside.base.vn" style="font-size: 12px; color: #004a99; text-decoration: none;">Xem thêm trên Inside →</a>
+        </div>
+    </div>
+</div>
+""")
+
+INSIDE_EMPTY = Template('<div class="stats-box inside-box"><p><em>Không có dữ liệu Inside để phân tích.</em></p></div>')
+
+WORKFLOW_SUMMARY_ITEM = Template('<div>• <strong>{name}</strong>: {total} job ({active} đang xử lý)</div>')
+WORKFLOW_SUMMARY = Template(
+    '<div style="margin-top: 10px; padding: 8px; background-color: #fff3e0; border-radius: 4px; border-left: 3px solid #ff9800;">'
+    '<strong>📊 Phân bố theo Quy trình:</strong><div class="upcoming-list">{items}</div></div>'
+)
+
+WORKFLOW_BOX = Template("""
+<div class="stats-box workflow-box">
+    <div class="sub-header">⚙️ Vận hành & Quy trình (1 tháng gần nhất):</div>
+    <ul class="stat-list">
+        <li>📋 Tổng quan: <strong>{summary[total_jobs]} job</strong> (Done: {summary[completion_rate]:.1f}%)</li>
+        <li>🏁 Đang xử lý: <strong>{summary[doing_jobs]} job</strong> | Hoàn thành muộn: <strong>{completed_late} job</strong></li>
+        <li>⚠️ Không Deadline: <strong>{no_deadline} job</strong></li>
+        {upcoming_html}
+    </ul>
+    {summary_html}
+    {ai_html}
+</div>
+""")
+
+WORKFLOW_EMPTY = Template('<div class="stats-box workflow-box"><p><em>Không có dữ liệu quy trình xử lý.</em></p></div>')
+
+SECTION = Template("""
+<div class="section">
+    <div class="section-title {title_class}">{title}</div>
+    <div class="section-desc">{desc}</div>
+    {content}
+</div>
+""")
+
+REPORT_PAGE = Template("""
+<html>
+<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<style>{css}</style>
+</head>
+<body>
+    <div class="email-container">
+        <div class="main-header">
+            📊 BÁO CÁO TỔNG HỢP BASE.VN
+        </div>
+        <div class="greeting">
+            Thân gửi Anh/Chị: {employee_name}
+        </div>
+        <div class="intro-text">
+            <p>Tại APLUS, chúng ta tin rằng <em>"hiệu suất không chỉ là kết quả – mà là cách mỗi người hiện diện và cam kết trong hành động."</em></p>
+            <p>Khác với nhiều môi trường khác, tại A Plus, chúng ta đang làm việc trên <strong>không gian số</strong> – nơi mọi hành động đều có thể đo lường, minh bạch và kế thừa.</p>
+            <p>Ở đây, mỗi nhân sự được tạo điều kiện tối đa để thể hiện năng lực, tự chủ và sáng tạo – không giới hạn bởi giấy tờ, thủ tục hay "phòng ban".</p>
+            <p><strong>Base không chỉ là hệ thống vận hành – mà là "tấm gương số" phản chiếu cách mỗi người chúng ta làm việc, tư duy và tương tác mỗi ngày.</strong></p>
+            <p>70–90% công việc của bạn đang diễn ra trên đó – từng thao tác, phản hồi, cam kết, và kết quả đều đang nói thay bạn.</p>
+            <p>Và chính vì Base phản ánh 70–90% công việc, nên nó cũng phản ánh <strong>70–90% con người bạn trong A Plus.</strong></p>
+            <p>💡 <em>Cách bạn cập nhật task, giữ deadline, phản hồi đồng đội, xử lý vấn đề – tất cả đều là một phần của "dấu vân tay chuyên nghiệp" mà bạn đang để lại trong hệ thống.</em></p>
+        </div>
+        <div class="report-date">
+            Ngày tạo báo cáo: {current_time_str}
+        </div>
+        {sections}
+        <div class="footer-message">
+            <div class="footer-title">💬 THÔNG ĐIỆP TỪ APLUS</div>
+            <p>Cảm ơn bạn vì đã <strong>hiện diện trọn vẹn</strong> – không chỉ trong thời gian làm việc, mà trong tinh thần, thái độ và cam kết mà bạn mang đến mỗi ngày.</p>
+            <p>Chúng ta đang làm việc trong một bối cảnh hoàn toàn mới – nơi <strong>"văn phòng" không còn là bốn bức tường, mà là một không gian số tốc độ cao</strong>, nơi mọi thứ vận hành như chiếc máy bay đang cất cánh.</p>
+            <p>Và trong hành trình đó, A Plus đang đồng hành cùng bạn – để bạn <strong>làm quen, thích nghi và dẫn dắt</strong> với tư duy số, công cụ số và năng lực số.</p>
+            <p><strong>Không ai bị bỏ lại phía sau</strong> – mỗi bước bạn thành thạo thêm một công cụ, là cả tập thể tiến gần hơn đến tầm nhìn "Digital – Smart – A Plus 2028."</p>
+            <p>Hãy tiếp tục duy trì tinh thần cam kết và Integrity – vì chính bạn là một phần trong hành trình đưa APLUS trở thành <strong>minh chứng cho một công ty Việt Nam có Integrity hiện diện. </strong>💪</p>
+        </div>
+    </div>
+</body>
+</html>
+""")
@@ -2,14 +2,15 @@
 import pandas as pd
 import numpy as np
 import requests
+import base_http
+from user_directory import get_directory
 import json
 import warnings
 from datetime import datetime, timedelta, timezone
 from typing import Dict, List, Optional, Tuple, Any
-from collections import defaultdict
 import pytz
 import calendar
-import ollama
+import threading
 
 # Configuration
 warnings.filterwarnings('ignore')
@@ -67,35 +68,21 @@ TEAM_ID_MAPPING = {
 }
 
 
-def load_user_mapping():
-    """Tải mapping user_id -> name từ API Account"""
+def load_user_mapping(user_list=None):
+    """Tải mapping user_id -> name (từ UserDirectory dùng chung) và lưu vào biến global
+
+    user_list: danh sách user đã tải sẵn (nếu có thì dùng thay cho UserDirectory).
+    """
     global user_id_to_name_map
-    try:
-        url = "https://account.base.vn/extapi/v1/users"
-        payload = {'access_token_v2': ACCOUNT_ACCESS_TOKEN}
-        headers = {}
-        
-        response = requests.post(url, headers=headers, data=payload, timeout=30)
-        
-        if response.status_code == 200:
-            response_json = response.json()
-            
-            user_list = []
-            if isinstance(response_json, list):
-                user_list = response_json
-            elif isinstance(response_json, dict):
-                user_list = response_json.get('users', [])
-            
-            if user_list:
-                user_id_to_name_map = {
-                    str(user.get('id', '')): user.get('name', '') 
-                    for user in user_list 
-                    if user.get('id') and user.get('name')
-                }
-        else:
-            print(f"Không thể tải user mapping, status code: {response.status_code}")
-    except Exception as e:
-        print(f"Lỗi khi tải user mapping: {e}")
+    if user_list is None:
+        user_id_to_name_map = get_directory().id_to_name()
+        return
+    user_id_to_name_map = {
+        str(user.get('id', '')): user.get('name', '')
+        for user in user_list
+        if user.get('id') and user.get('name')
+    }
+
 
 def get_user_name(user_id):
     """Lấy tên user từ user_id"""
@@ -288,15 +275,51 @@ class User:
                 f"checkin={self.checkin}, dich_chuyen_OKR={self.dich_chuyen_OKR}, score={self.score})")
 
 
+class UserPartitions:
+    """Index dòng của final_df theo user, tạo một lần và dùng chung cho mọi phân tích
+
+    Chỉ lưu vị trí dòng của từng user (groupby().indices); DataFrame của một user được cắt
+    khi cần nên không giữ sẵn (hay copy phòng thủ) slice của mọi user.
+    """
+
+    def __init__(self, final_df: pd.DataFrame, by: str = 'goal_user_name'):
+        self.final_df = final_df
+        self.by = by
+        if final_df is None or final_df.empty or by not in final_df.columns:
+            self.indices = {}
+        else:
+            # sort=True, dropna=True giống final_df.groupby(by) mặc định
+            self.indices = final_df.groupby(by, sort=True).indices
+
+    def __contains__(self, user) -> bool:
+        return user in self.indices
+
+    def __iter__(self):
+        for user in self.indices:
+            yield user, self.get(user)
+
+    def users(self) -> List[str]:
+        return list(self.indices)
+
+    def get(self, user) -> pd.DataFrame:
+        """Các dòng của user (DataFrame rỗng cùng cột nếu user không có dữ liệu)"""
+        positions = self.indices.get(user)
+        if positions is None:
+            return self.final_df.iloc[0:0]
+        return self.final_df.take(positions)
+
+
 class UserManager:
     """Manages user data and calculations"""
     
-    def __init__(self, account_df, krs_df, checkin_df, cycle_df=None, final_df=None, users_with_okr_names=None, monthly_okr_data=None):
+    def __init__(self, account_df, krs_df, checkin_df, cycle_df=None, final_df=None, users_with_okr_names=None,
+                 monthly_okr_data=None, partitions: Optional[UserPartitions] = None):
         self.account_df = account_df
         self.krs_df = krs_df
         self.checkin_df = checkin_df
         self.cycle_df = cycle_df
         self.final_df = final_df
+        self.partitions = partitions
         self.users_with_okr_names = users_with_okr_names or set()
         self.monthly_okr_data = monthly_okr_data or []
         
@@ -362,11 +385,14 @@ class UserManager:
                 'week_details': []
             }
         
-        user_checkins = self.final_df[
-            (self.final_df['goal_user_name'] == user_name) &
-            (self.final_df['checkin_since'].notna()) &
-            (self.final_df['checkin_since'] != '')
-        ].copy()
+        if self.partitions is not None and self.partitions.final_df is self.final_df:
+            user_rows = self.partitions.get(user_name)
+        else:
+            user_rows = self.final_df[self.final_df['goal_user_name'] == user_name]
+        user_checkins = user_rows[
+            (user_rows['checkin_since'].notna()) &
+            (user_rows['checkin_since'] != '')
+        ]
         
         if user_checkins.empty:
             week_details = [{'week_range': week['week_range'], 'has_checkin': False, 'checkin_dates': []} 
@@ -379,10 +405,13 @@ class UserManager:
                 'week_details': week_details
             }
         
-        user_checkins['checkin_date'] = pd.to_datetime(user_checkins['checkin_since']).dt.date
-        user_checkins['checkin_month_year'] = pd.to_datetime(user_checkins['checkin_since']).dt.strftime('%Y-%m')
+        checkin_dt = pd.to_datetime(user_checkins['checkin_since'])
+        user_checkins = user_checkins.assign(
+            checkin_date=checkin_dt.dt.date,
+            checkin_month_year=checkin_dt.dt.strftime('%Y-%m'),
+        )
         
-        current_month_checkins = user_checkins[user_checkins['checkin_month_year'] == current_month_year].copy()
+        current_month_checkins = user_checkins[user_checkins['checkin_month_year'] == current_month_year]
         
         if current_month_checkins.empty:
             week_details = [{'week_range': week['week_range'], 'has_checkin': False, 'checkin_dates': []} 
@@ -401,7 +430,9 @@ class UserManager:
                     return week['week_number']
             return None
         
-        current_month_checkins['week_number'] = current_month_checkins['checkin_date'].apply(get_week_number)
+        current_month_checkins = current_month_checkins.assign(
+            week_number=current_month_checkins['checkin_date'].apply(get_week_number)
+        )
         user_weekly_checkins = current_month_checkins.groupby(['week_number']).size().reset_index(name='checkins_count')
         weeks_with_checkins = len(user_weekly_checkins['week_number'].unique())
         total_checkins = len(current_month_checkins)
@@ -522,32 +553,22 @@ class GoalAPIClient:
         self.account_token = account_token
 
     def _make_request(self, url: str, data: Dict, description: str = "") -> requests.Response:
-        """Make HTTP request with error handling and retry logic"""
-        max_retries = 3
-        backoff_factor = 1  # seconds
-
-        for attempt in range(max_retries + 1):
-            try:
-                response = requests.post(url, data=data, timeout=REQUEST_TIMEOUT)
-                response.raise_for_status()
-                return response
-            except requests.exceptions.RequestException as e:
-                if attempt < max_retries:
-                    wait_time = backoff_factor * (2 ** attempt)
-                    print(f"⚠️ Error {description}: {e}. Retrying in {wait_time}s ({attempt + 1}/{max_retries})...")
-                    time.sleep(wait_time)
-                else:
-                    print(f"❌ Failed {description} after {max_retries + 1} attempts: {e}")
-                    raise
+        """Make HTTP request with error handling (retry/backoff handled by base_http)"""
+        try:
+            response = base_http.post(url, data=data, timeout=REQUEST_TIMEOUT)
+            response.raise_for_status()
+            return response
+        except requests.exceptions.RequestException as e:
+            print(f"❌ Failed {description} after {base_http.MAX_RETRIES + 1} attempts: {e}")
+            raise
 
     def get_filtered_members(self) -> pd.DataFrame:
-        """Get filtered members from account API"""
-        url = "https://account.base.vn/extapi/v1/group/get"
-        data = {'access_token_v2': self.account_token, "path": "nvvanphong"}
-        
-        response = self._make_request(url, data, "fetching account members")
-        response_data = response.json()
-        
+        """Get filtered members (nhóm nvvanphong) from the shared UserDirectory"""
+        return self.parse_members({'group': {'members': get_directory().members}})
+
+    @staticmethod
+    def parse_members(response_data: Dict) -> pd.DataFrame:
+        """Parse group/get response into members DataFrame"""
         members = response_data.get('group', {}).get('members', [])
         
         df = pd.DataFrame([
@@ -570,8 +591,11 @@ class GoalAPIClient:
         data = {'access_token_v2': self.goal_token}
 
         response = self._make_request(url, data, "fetching cycle list")
-        data = response.json()
+        return self.parse_cycle_list(response.json())
 
+    @staticmethod
+    def parse_cycle_list(data: Dict) -> List[Dict]:
+        """Parse cycle/list response into quarterly cycles (newest first)"""
         quarterly_cycles = []
         for cycle in data.get('cycles', []):
             if cycle.get('metatype') == 'quarterly':
@@ -590,13 +614,12 @@ class GoalAPIClient:
         return sorted(quarterly_cycles, key=lambda x: x['start_time'], reverse=True)
 
     def get_account_users(self) -> pd.DataFrame:
-        """Get users from Account API"""
-        url = "https://account.base.vn/extapi/v1/users"
-        data = {'access_token_v2': self.account_token}
+        """Get users from the shared UserDirectory (Account API, TTL-cached)"""
+        return self.parse_account_users({'users': get_directory().users})
 
-        response = self._make_request(url, data, "fetching account users")
-        json_response = response.json()
-        
+    @staticmethod
+    def parse_account_users(json_response) -> pd.DataFrame:
+        """Parse users response into DataFrame(id, name, username)"""
         if isinstance(json_response, list) and len(json_response) > 0:
             json_response = json_response[0]
 
@@ -614,26 +637,40 @@ class GoalAPIClient:
         
         try:
             # Removed separate print to reduce noise, handled in loop or debug if needed
-            response = requests.post(url, data=data, timeout=REQUEST_TIMEOUT)
+            response = base_http.post(url, data=data, timeout=REQUEST_TIMEOUT)
             if response.status_code == 200:
-                response_data = response.json()
-                if response_data and 'target' in response_data and response_data['target']:
-                    cached_objs = response_data['target'].get('cached_objs', [])
-                    if isinstance(cached_objs, list):
-                        return [str(item.get('id')) for item in cached_objs if 'id' in item]
+                return self.parse_target_sub_goal_ids(response.json())
             return []
         except Exception as e:
             print(f"Error fetching sub-goal {target_id}: {e}")
             return []
 
-    def get_goals_data(self, cycle_path: str) -> pd.DataFrame:
-        """Get goals data from API"""
+    @staticmethod
+    def parse_target_sub_goal_ids(response_data: Dict) -> List[str]:
+        """Parse target/get response into sub-goal IDs"""
+        if response_data and 'target' in response_data and response_data['target']:
+            cached_objs = response_data['target'].get('cached_objs', [])
+            if isinstance(cached_objs, list):
+                return [str(item.get('id')) for item in cached_objs if 'id' in item]
+        return []
+
+    def get_cycle_full(self, cycle_path: str) -> Dict:
+        """Get cycle/get.full response (goals + targets)"""
         url = "https://goal.base.vn/extapi/v1/cycle/get.full"
         data = {'access_token_v2': self.goal_token, 'path': cycle_path}
 
-        response = self._make_request(url, data, "fetching goals data")
-        data = response.json()
+        response = self._make_request(url, data, "fetching cycle data")
+        return response.json()
+
+    def get_goals_data(self, cycle_path: str, full_data: Optional[Dict] = None) -> pd.DataFrame:
+        """Get goals data from API (or from a pre-fetched cycle/get.full response)"""
+        if full_data is None:
+            full_data = self.get_cycle_full(cycle_path)
+        return self.parse_goals_data(full_data)
 
+    @staticmethod
+    def parse_goals_data(data: Dict) -> pd.DataFrame:
+        """Parse cycle/get.full response into goals DataFrame"""
         # Helper function to extract form values
         def extract_form_value(form_array, field_name):
             """Extract value from form array by field name"""
@@ -676,18 +713,40 @@ class GoalAPIClient:
 
         return pd.DataFrame(goals_data)
     
-    def parse_targets_data(self, cycle_path: str) -> pd.DataFrame:
-        """Parse targets data from API to create target mapping"""
-        url = "https://goal.base.vn/extapi/v1/cycle/get.full"
-        data = {'access_token_v2': self.goal_token, 'path': cycle_path}
+    def parse_targets_data(self, cycle_path: str, full_data: Optional[Dict] = None,
+                           sub_goal_ids: Optional[Dict[str, List[str]]] = None) -> pd.DataFrame:
+        """Parse targets data from API to create target mapping
 
-        response = self._make_request(url, data, "fetching targets data")
-        response_data = response.json()
+        full_data: cycle/get.full response đã tải sẵn (nếu có).
+        sub_goal_ids: mapping target_id -> sub-goal IDs đã tải sẵn (nếu có), nếu không sẽ gọi target/get.
+        """
+        if full_data is None:
+            full_data = self.get_cycle_full(cycle_path)
+
+        collected_targets = self.build_target_rows(full_data)
+        if not collected_targets:
+            return pd.DataFrame()
+
+        all_targets = []
+        # Fetch sub-goal IDs (Original logic preserved)
+        for target_data in collected_targets:
+            if sub_goal_ids is not None:
+                target_data['list_goal_id'] = sub_goal_ids.get(target_data['target_id'], [])
+            else:
+                print(f"  Fetching sub-goals for target: {target_data['target_name']}...", end='\r')
+                target_data['list_goal_id'] = self.get_target_sub_goal_ids(target_data['target_id'])
+            
+            all_targets.append(target_data)
         
+        print("\nFinished fetching all targets.")
+        return pd.DataFrame(all_targets)
+
+    @staticmethod
+    def build_target_rows(response_data: Dict) -> List[Dict]:
+        """Build target rows (without list_goal_id) from cycle/get.full response"""
         if not response_data or 'targets' not in response_data:
-            return pd.DataFrame()
+            return []
         
-        all_targets = []
         raw_targets = response_data.get('targets', [])
         
         # 1. Map Company Targets (Top Level scope='company')
@@ -781,31 +840,22 @@ class GoalAPIClient:
         
         collected_targets = list(targets_map.values())
 
-        # 3. Post-process: Fill columns and fetch sub-goals
+        # 3. Post-process: Fill columns based on scope
         for target_data in collected_targets:
-            # Fill specific columns based on scope
             if target_data['target_scope'] == 'dept':
                 target_data['target_dept_id'] = target_data['target_id']
                 target_data['target_dept_name'] = target_data['target_name']
             elif target_data['target_scope'] == 'team':
                 target_data['target_team_id'] = target_data['target_id']
                 target_data['target_team_name'] = target_data['target_name']
-            
-            # Fetch sub-goal IDs (Original logic preserved)
-            print(f"  Fetching sub-goals for target: {target_data['target_name']}...", end='\r')
-            target_data['list_goal_id'] = self.get_target_sub_goal_ids(target_data['target_id'])
-            
-            all_targets.append(target_data)
-        
-        print("\nFinished fetching all targets.")
-        return pd.DataFrame(all_targets)
+
+        return collected_targets
 
     def get_krs_data(self, cycle_path: str) -> pd.DataFrame:
         """Get KRs data from API with pagination"""
         url = "https://goal.base.vn/extapi/v1/cycle/krs"
-        all_krs = []
-        
-        for page in range(1, MAX_PAGES_KRS + 1):
+
+        def fetch_page(page: int) -> List[Dict]:
             data = {'access_token_v2': self.goal_token, "path": cycle_path, "page": page}
 
             response = self._make_request(url, data, f"loading KRs at page {page}")
@@ -814,29 +864,34 @@ class GoalAPIClient:
             if isinstance(response_data, list) and len(response_data) > 0:
                 response_data = response_data[0]
 
-            krs_list = response_data.get("krs", [])
-            if not krs_list:
-                break
+            return response_data.get("krs", [])
 
-            for kr in krs_list:
-                all_krs.append({
-                    'kr_id': str(kr.get('id', '')),
-                    'kr_name': kr.get('name', 'Unknown KR'),
-                    'kr_content': kr.get('content', ''),
-                    'kr_since': DateUtils.convert_timestamp_to_datetime(kr.get('since')),
-                    'kr_current_value': kr.get('current_value', 0),
-                    'kr_user_id': str(kr.get('user_id', '')),
-                    'goal_id': kr.get('goal_id'),
-                })
+        # Các trang được tải song song theo cửa sổ, dừng ở trang rỗng đầu tiên
+        all_krs = base_http.fetch_pages(fetch_page, 1, MAX_PAGES_KRS, lambda krs: not krs, key='id')
+        return self.parse_krs(all_krs)
+
+    @staticmethod
+    def parse_krs(krs_list: List[Dict]) -> pd.DataFrame:
+        """Parse raw KR objects into KRs DataFrame"""
+        all_krs = []
+        for kr in krs_list:
+            all_krs.append({
+                'kr_id': str(kr.get('id', '')),
+                'kr_name': kr.get('name', 'Unknown KR'),
+                'kr_content': kr.get('content', ''),
+                'kr_since': DateUtils.convert_timestamp_to_datetime(kr.get('since')),
+                'kr_current_value': kr.get('current_value', 0),
+                'kr_user_id': str(kr.get('user_id', '')),
+                'goal_id': kr.get('goal_id'),
+            })
 
         return pd.DataFrame(all_krs)
 
     def get_all_checkins(self, cycle_path: str) -> List[Dict]:
         """Get all checkins with pagination"""
         url = "https://goal.base.vn/extapi/v1/cycle/checkins"
-        all_checkins = []
-        
-        for page in range(1, MAX_PAGES_CHECKINS + 1):
+
+        def fetch_page(page: int) -> List[Dict]:
             data = {'access_token_v2': self.goal_token, "path": cycle_path, "page": page}
 
             response = self._make_request(url, data, f"loading checkins at page {page}")
@@ -845,16 +900,11 @@ class GoalAPIClient:
             if isinstance(response_data, list) and len(response_data) > 0:
                 response_data = response_data[0]
 
-            checkins = response_data.get('checkins', [])
-            if not checkins:
-                break
-
-            all_checkins.extend(checkins)
-
-            if len(checkins) < 20:
-                break
+            return response_data.get('checkins', [])
 
-        return all_checkins
+        # Trang cuối là trang rỗng hoặc ít hơn 20 checkins
+        return base_http.fetch_pages(fetch_page, 1, MAX_PAGES_CHECKINS,
+                                     lambda checkins: len(checkins) < 20, key='id')
 
 
 class AIActionEvaluator:
@@ -891,6 +941,8 @@ class AIActionEvaluator:
             Output chỉ là số:
             """
             
+            import ollama  # chỉ import khi thực sự cần chấm điểm bằng AI
+
             response = ollama.generate(
                 model='gemini-3-flash-preview:cloud',
                 prompt=prompt
@@ -1024,123 +1076,125 @@ class OKRCalculator:
     @staticmethod
     def calculate_reference_value(reference_date: datetime, df: pd.DataFrame) -> Tuple[float, List[Dict]]:
         """Calculate OKR value as of reference date"""
+        results = OKRCalculator.calculate_reference_values(reference_date, df.assign(_all=0), by='_all')
+        return results.get(0, (0, []))
+
+    @staticmethod
+    def calculate_reference_values(reference_date: datetime, df: pd.DataFrame,
+                                   by: str = 'goal_user_name') -> Dict[Any, Tuple[float, List[Dict]]]:
+        """Calculate OKR value as of reference date for every `by` group (user) in one pass
+
+        Giá trị mỗi KR là checkin gần nhất trước mốc (0 nếu chưa có checkin), giá trị của
+        nhóm là trung bình theo goal của trung bình các KR. Trả về {nhóm: (giá trị, kr_details)}.
+        """
         try:
-            df = df.copy()
-            df['checkin_since_dt'] = pd.to_datetime(df['checkin_since'], errors='coerce')
+            keys = [by, 'kr_id']
+            df = df.loc[df['kr_id'].notna()]
+            if df.empty:
+                return {}
 
-            unique_krs = df['kr_id'].dropna().unique()
-            goal_values_dict = {}
-            kr_details = []
+            checkin_dt = pd.to_datetime(df['checkin_since'], errors='coerce')
+            has_checkin = (
+                (checkin_dt <= reference_date) &
+                df['checkin_name'].notna() &
+                (df['checkin_name'] != '')
+            )
 
-            for kr_id in unique_krs:
-                kr_data = df[df['kr_id'] == kr_id].copy()
-                
-                actual_checkins_before_date = kr_data[
-                    (kr_data['checkin_since_dt'] <= reference_date) &
-                    (kr_data['checkin_name'].notna()) &
-                    (kr_data['checkin_name'] != '')
-                ]
-
-                goal_name = kr_data.iloc[0]['goal_name'] if len(kr_data) > 0 else f"Unknown_{kr_id}"
-
-                if len(actual_checkins_before_date) > 0:
-                    latest_checkin = actual_checkins_before_date.sort_values('checkin_since_dt').iloc[-1]
-                    kr_value = pd.to_numeric(latest_checkin['checkin_kr_current_value'], errors='coerce')
-                    kr_value = kr_value if not pd.isna(kr_value) else 0
-
-                    if goal_name not in goal_values_dict:
-                        goal_values_dict[goal_name] = []
-                    goal_values_dict[goal_name].append(kr_value)
-
-                    kr_details.append({
-                        'kr_id': kr_id,
-                        'goal_name': goal_name,
-                        'kr_value': kr_value,
-                        'checkin_date': latest_checkin['checkin_since_dt'],
-                        'source': f'checkin_before_{reference_date.strftime("%Y%m%d")}'
-                    })
-                else:
-                    goal_key = f"{goal_name}_no_checkin_{kr_id}"
-                    goal_values_dict[goal_key] = [0]
-
-                    kr_details.append({
-                        'kr_id': kr_id,
-                        'goal_name': goal_name,
-                        'kr_value': 0,
-                        'checkin_date': None,
-                        'source': 'no_checkin_default'
-                    })
+            # As-of: checkin mới nhất trước mốc của từng KR (một lần sort cho cả frame)
+            latest = (
+                df.loc[has_checkin, keys + ['checkin_kr_current_value']]
+                .assign(checkin_date=checkin_dt[has_checkin])
+                .sort_values('checkin_date', kind='stable')
+                .drop_duplicates(keys, keep='last')
+            )
+            latest['kr_value'] = pd.to_numeric(latest['checkin_kr_current_value'], errors='coerce').fillna(0)
 
-            goal_averages = []
-            normalized_goal_values = {}
-            for key, values in goal_values_dict.items():
-                if '_no_checkin_' in key: # Individual KR mapped to Goal
-                     goal_averages.append(0)
-                else: # Real Goal with KRs
-                    avg_val = np.mean(values)
-                    goal_averages.append(avg_val)
-                    normalized_goal_values[key] = avg_val
-            
-            # Re-normalize: Group by Goal Name proper
-            # The logic above is slightly complex in original code, simplifying:
-            # Group KR values by goal_name
-            final_goal_values = defaultdict(list)
-            for item in kr_details:
-                final_goal_values[item['goal_name']].append(item['kr_value'])
-            
-            final_averages = []
-            for g_name, vals in final_goal_values.items():
-                final_averages.append(np.mean(vals))
+            # Mỗi KR một dòng, goal_name lấy từ dòng đầu tiên của KR
+            kr_rows = df.drop_duplicates(keys)[keys + ['goal_name']].merge(
+                latest[keys + ['kr_value', 'checkin_date']], on=keys, how='left'
+            )
+            found = kr_rows['checkin_date'].notna()
+            kr_rows['kr_value'] = kr_rows['kr_value'].fillna(0)
+            kr_rows['checkin_date'] = kr_rows['checkin_date'].astype(object).where(found, None)
+            kr_rows['source'] = np.where(
+                found, f'checkin_before_{reference_date.strftime("%Y%m%d")}', 'no_checkin_default'
+            )
 
-            return (np.mean(final_averages) if final_averages else 0), kr_details
+            goal_averages = kr_rows.groupby([by, 'goal_name'], sort=False, dropna=False)['kr_value'].mean()
+            group_values = goal_averages.groupby(level=0, sort=False, dropna=False).mean()
+
+            records = kr_rows[['kr_id', 'goal_name', 'kr_value', 'checkin_date', 'source']].to_dict('records')
+            results = {}
+            for key, positions in kr_rows.groupby(by, sort=False, dropna=False).indices.items():
+                results[key] = (group_values.get(key, 0), [records[i] for i in positions])
+            return results
 
         except Exception as e:
             print(f"Error calculating reference value: {e}")
-            return 0, []
+            return {}
 
-    @staticmethod
-    def calculate_kr_shift(row: pd.Series, reference_date: datetime, final_df: pd.DataFrame) -> float:
-        """Calculate shift for a single KR"""
-        try:
-            # Lấy thông tin KR
-            kr_id = row['kr_id']
-            current_val = pd.to_numeric(row.get('kr_current_value'), errors='coerce')
-            current_val = current_val if not pd.isna(current_val) else 0.0
-
-            if not kr_id:
-                return current_val
-
-            quarter_start = DateUtils.get_quarter_start_date()
-
-            # Lấy lịch sử checkin từ final_df của toàn hệ thống
-            # Cần lọc đúng KR đang xét
-            kr_history = final_df[final_df['kr_id'] == kr_id].copy()
-            if kr_history.empty:
-                 return current_val
-
-            kr_history['checkin_since_dt'] = pd.to_datetime(kr_history['checkin_since'], errors='coerce')
-
-            # Lọc checkin trước ngày mốc VÀ sau đầu quý
-            valid_checkins = kr_history[
-                (kr_history['checkin_since_dt'] <= reference_date) & 
-                (kr_history['checkin_since_dt'] >= quarter_start) &
-                (kr_history['checkin_name'].notna()) & 
-                (kr_history['checkin_name'] != '')
-            ]
 
-            reference_val = 0.0
-            if not valid_checkins.empty:
-                # Lấy checkin mới nhất trước mốc thời gian
-                latest_checkin = valid_checkins.sort_values('checkin_since_dt').iloc[-1]
-                val = pd.to_numeric(latest_checkin.get('checkin_kr_current_value'), errors='coerce')
-                reference_val = val if not pd.isna(val) else 0.0
-            
-            # Shift = Giá trị hiện tại - Giá trị tại mốc
-            return current_val - reference_val
+class KRShiftEngine:
+    """Batch KR shift cho toàn bộ final_df
+
+    Lịch sử checkin được index theo kr_id một lần; giá trị tại mốc (checkin mới nhất từ đầu
+    quý tới mốc) của mọi KR được tính một lượt cho mỗi mốc và cache lại, nên shift của từng
+    dòng / goal / user chỉ còn là phép tra cứu và groupby thay vì lọc lại cả final_df cho
+    từng dòng. Đây là nơi duy nhất chứa quy tắc tính shift của KR.
+    """
+
+    def __init__(self, final_df: pd.DataFrame):
+        self.final_df = final_df
+        valid = (
+            final_df['kr_id'].notna() &
+            final_df['checkin_name'].notna() &
+            (final_df['checkin_name'] != '')
+        )
+        history = pd.DataFrame({
+            'kr_id': final_df.loc[valid, 'kr_id'],
+            'checkin_since_dt': pd.to_datetime(final_df.loc[valid, 'checkin_since'], errors='coerce'),
+            'value': pd.to_numeric(final_df.loc[valid, 'checkin_kr_current_value'], errors='coerce').fillna(0.0),
+        })
+        self.history = history[history['checkin_since_dt'].notna()].sort_values('checkin_since_dt', kind='stable')
+        self._reference_cache: Dict[Tuple[datetime, datetime], pd.Series] = {}
+
+    def reference_values(self, reference_date: datetime, since: Optional[datetime] = None) -> pd.Series:
+        """Giá trị checkin mới nhất trong [since, reference_date] của mọi KR (index: kr_id)"""
+        since = since or DateUtils.get_quarter_start_date()
+        key = (reference_date, since)
+        if key not in self._reference_cache:
+            checkin_dt = self.history['checkin_since_dt']
+            latest = self.history[(checkin_dt <= reference_date) & (checkin_dt >= since)].drop_duplicates(
+                'kr_id', keep='last'
+            )
+            self._reference_cache[key] = pd.Series(latest['value'].values, index=latest['kr_id'].values)
+        return self._reference_cache[key]
+
+    def kr_shifts(self, reference_date: datetime, df: Optional[pd.DataFrame] = None) -> pd.Series:
+        """Shift của từng dòng (giá trị hiện tại - giá trị tại mốc), cùng index với df"""
+        df = self.final_df if df is None else df
+        current = pd.to_numeric(df['kr_current_value'], errors='coerce').fillna(0.0)
+        reference = df['kr_id'].map(self.reference_values(reference_date)).fillna(0.0)
+        has_kr = df['kr_id'].map(bool)
+        return current - reference.where(has_kr, 0.0)
+
+    def goal_shifts(self, reference_date: datetime, df: Optional[pd.DataFrame] = None,
+                    by: str = 'goal_user_name') -> pd.Series:
+        """Shift trung bình theo (user, goal|kr_name)"""
+        df = self.final_df if df is None else df
+        rows = df[df['goal_name'].map(bool) & df['kr_name'].map(bool)]
+        combos = pd.DataFrame({
+            by: rows[by],
+            'combo_key': rows['goal_name'].astype(str) + '|' + rows['kr_name'].astype(str),
+            'kr_shift': self.kr_shifts(reference_date, rows),
+        })
+        return combos.groupby([by, 'combo_key'], sort=False, dropna=False)['kr_shift'].mean()
+
+    def user_shifts(self, reference_date: datetime, df: Optional[pd.DataFrame] = None,
+                    by: str = 'goal_user_name') -> pd.Series:
+        """final_okr_goal_shift của mọi user: trung bình các goal|kr_name của user"""
+        return self.goal_shifts(reference_date, df, by).groupby(level=0, sort=False, dropna=False).mean()
 
-        except Exception as e:
-            # print(f"Error calculating individual KR shift: {e}")
-            return 0.0
 
 class OKRAnalysisSystem:
     """Main system for OKR analysis"""
@@ -1151,30 +1205,56 @@ class OKRAnalysisSystem:
         self.final_df = None
         self.user_manager = None
         self.target_df = None
+        self.goals_df = None
+        self.krs_df = None
         self.okr_calculator = OKRCalculator()
         self.data_processor = DataProcessor() 
+        self.shift_engine = None
+        self.user_partitions = None
 
     def get_cycle_list(self) -> List[Dict]:
         return self.api_client.get_cycle_list()
 
-    def load_and_process_data(self) -> Optional[pd.DataFrame]:
-        """Load and process all OKR data"""
+    def fetch_raw_data(self) -> Dict[str, Any]:
+        """Fetch all raw OKR inputs for the current cycle from the API"""
+        if not self.checkin_path:
+            raise ValueError("Checkin path not set")
+
+        # cycle/get.full chứa cả goals và targets nên chỉ tải một lần
+        full_data = self.api_client.get_cycle_full(self.checkin_path)
+        return {
+            'goals_df': self.api_client.get_goals_data(self.checkin_path, full_data=full_data),
+            'krs_df': self.api_client.get_krs_data(self.checkin_path),
+            'target_df': self.api_client.parse_targets_data(self.checkin_path, full_data=full_data),
+            'all_checkins': self.api_client.get_all_checkins(self.checkin_path),
+            'account_df': self.api_client.get_filtered_members(),
+            'all_users_df': self.api_client.get_account_users(),
+        }
+
+    def load_and_process_data(self, raw_data: Optional[Dict[str, Any]] = None) -> Optional[pd.DataFrame]:
+        """Load and process all OKR data
+
+        raw_data: kết quả dạng fetch_raw_data đã tải sẵn (ví dụ từ base_async), nếu có.
+        """
         if not self.checkin_path:
             raise ValueError("Checkin path not set")
 
         print("1. Loading raw data...")
-        # Sử dụng API client để lấy các DataFrame
-        goals_df = self.api_client.get_goals_data(self.checkin_path)
-        krs_df = self.api_client.get_krs_data(self.checkin_path)
+        if raw_data is None:
+            raw_data = self.fetch_raw_data()
+
+        goals_df = raw_data['goals_df']
+        krs_df = raw_data['krs_df']
+        self.goals_df = goals_df
+        self.krs_df = krs_df
         
-        # Load targets/structure data
-        self.target_df = self.api_client.parse_targets_data(self.checkin_path)
+        # Targets/structure data
+        self.target_df = raw_data['target_df']
         
-        # Load checkins
-        all_checkins = self.api_client.get_all_checkins(self.checkin_path)
-        checkin_df = DataProcessor.extract_checkin_data(all_checkins)
+        # Checkins
+        checkin_df = DataProcessor.extract_checkin_data(raw_data['all_checkins'])
         
-        account_df = self.api_client.get_filtered_members()
+        account_df = raw_data['account_df']
 
         print("2. Merging data...")
         if goals_df.empty or krs_df.empty:
@@ -1187,7 +1267,7 @@ class OKRAnalysisSystem:
             merged_df['kr_id'] = None
         
         # Map user names using ALL users in system
-        all_users_df = self.api_client.get_account_users()
+        all_users_df = raw_data['all_users_df']
         if not all_users_df.empty and 'id' in all_users_df.columns:
             id_to_name = dict(zip(all_users_df['id'].astype(str), all_users_df['name']))
             id_to_username = dict(zip(all_users_df['id'].astype(str), all_users_df['username']))
@@ -1272,12 +1352,15 @@ class OKRAnalysisSystem:
             self.final_df = self.final_df.drop(columns=cols_to_drop)
 
         self.final_df = DataProcessor.clean_final_data(self.final_df)
+        # Index dòng theo user một lần, dùng chung cho các phân tích bên dưới
+        self.user_partitions = UserPartitions(self.final_df)
         
         # Initialize User Manager
         self.user_manager = UserManager(
             account_df, krs_df, checkin_df, 
             final_df=self.final_df,
-            users_with_okr_names=users_with_okr_names
+            users_with_okr_names=users_with_okr_names,
+            partitions=self.user_partitions
         )
 
         return self.final_df
@@ -1355,10 +1438,17 @@ class OKRAnalysisSystem:
             reference_date = DateUtils.get_last_friday_date() if period == "weekly" else DateUtils.get_last_month_end_date()
             if period == "weekly":
                  print(f"Calculating shift vs {reference_date.strftime('%d/%m/%Y')}...")
+
+            # Giá trị tại mốc và shift của mọi user tính một lần trên toàn bộ final_df
+            reference_values = self.okr_calculator.calculate_reference_values(reference_date, self.final_df)
+            goal_shifts = self._get_shift_engine().user_shifts(reference_date)
+            partitions = self._get_user_partitions()
             
             for user in users:
-                user_df = self.final_df[self.final_df['goal_user_name'] == user].copy()
-                shift_data = self._calculate_user_shift_data(user_df, reference_date, period)
+                user_df = partitions.get(user)
+                shift_data = self._calculate_user_shift_data(user_df, reference_date, period,
+                                                             reference_values.get(user, (0, [])),
+                                                             goal_shifts.get(user, 0))
                 user_okr_shifts.append(shift_data)
             
             shift_key = 'okr_shift' if period == "weekly" else 'okr_shift_monthly'
@@ -1368,20 +1458,32 @@ class OKRAnalysisSystem:
             print(f"Error calculating {period} OKR shifts: {e}")
             return []
 
-    def _calculate_user_shift_data(self, user_df: pd.DataFrame, reference_date: datetime, period: str) -> Dict:
-        """Calculate shift data for a single user"""
+    def _calculate_user_shift_data(self, user_df: pd.DataFrame, reference_date: datetime, period: str,
+                                   reference: Optional[Tuple[float, List[Dict]]] = None,
+                                   goal_shift: Optional[float] = None) -> Dict:
+        """Calculate shift data for a single user
+
+        reference: (reference_value, kr_details) đã tính sẵn cho user, nếu có.
+        goal_shift: final_okr_goal_shift đã tính sẵn cho user (KRShiftEngine), nếu có.
+        """
         user_name = user_df['goal_user_name'].iloc[0] if not user_df.empty else 'Unknown'
         
         if period == "weekly":
-            return self._calculate_weekly_shift_data(user_df, user_name, reference_date)
+            return self._calculate_weekly_shift_data(user_df, user_name, reference_date, reference, goal_shift)
         else:
-            return self._calculate_monthly_shift_data(user_df, user_name, reference_date)
+            return self._calculate_monthly_shift_data(user_df, user_name, reference_date, reference, goal_shift)
 
-    def _calculate_weekly_shift_data(self, user_df: pd.DataFrame, user_name: str, reference_friday: datetime) -> Dict:
+    def _calculate_weekly_shift_data(self, user_df: pd.DataFrame, user_name: str, reference_friday: datetime,
+                                     reference: Optional[Tuple[float, List[Dict]]] = None,
+                                     goal_shift: Optional[float] = None) -> Dict:
         """Calculate weekly shift data for user"""
-        final_okr_goal_shift = self._calculate_final_okr_goal_shift(user_df, reference_friday, "weekly")
+        final_okr_goal_shift = goal_shift
+        if final_okr_goal_shift is None:
+            final_okr_goal_shift = self._calculate_final_okr_goal_shift(user_df, reference_friday, "weekly")
         current_value = self.okr_calculator.calculate_current_value(user_df)
-        reference_value, kr_details = self.okr_calculator.calculate_reference_value(reference_friday, user_df)
+        if reference is None:
+            reference = self.okr_calculator.calculate_reference_value(reference_friday, user_df)
+        reference_value, kr_details = reference
         
         # Áp dụng logic mới theo yêu cầu:
         # 1. Nếu giá trị thứ 6 tuần trước > giá trị hiện tại thì giá trị thứ 6 = giá trị hiện tại - dịch chuyển tuần
@@ -1419,11 +1521,17 @@ class OKRAnalysisSystem:
             'reference_friday': reference_friday.strftime('%d/%m/%Y')
         }
 
-    def _calculate_monthly_shift_data(self, user_df: pd.DataFrame, user_name: str, reference_month_end: datetime) -> Dict:
+    def _calculate_monthly_shift_data(self, user_df: pd.DataFrame, user_name: str, reference_month_end: datetime,
+                                      reference: Optional[Tuple[float, List[Dict]]] = None,
+                                      goal_shift: Optional[float] = None) -> Dict:
         """Calculate monthly shift data for user"""
-        final_okr_goal_shift_monthly = self._calculate_final_okr_goal_shift(user_df, reference_month_end, "monthly")
+        final_okr_goal_shift_monthly = goal_shift
+        if final_okr_goal_shift_monthly is None:
+            final_okr_goal_shift_monthly = self._calculate_final_okr_goal_shift(user_df, reference_month_end, "monthly")
         current_value = self.okr_calculator.calculate_current_value(user_df)
-        reference_value, kr_details = self.okr_calculator.calculate_reference_value(reference_month_end, user_df)
+        if reference is None:
+            reference = self.okr_calculator.calculate_reference_value(reference_month_end, user_df)
+        reference_value, kr_details = reference
         
         # Kiểm tra xem có phải tuần 4 hoặc 5 của tháng đầu quý không
         # Nếu đúng thì tính chuyển động tháng = điểm số hiện tại so với 0
@@ -1470,32 +1578,23 @@ class OKRAnalysisSystem:
             'reference_month_end': reference_month_end.strftime('%d/%m/%Y')
         }
 
+    def _get_user_partitions(self) -> UserPartitions:
+        """UserPartitions của final_df hiện tại (tạo lại nếu final_df đã thay đổi)"""
+        if self.user_partitions is None or self.user_partitions.final_df is not self.final_df:
+            self.user_partitions = UserPartitions(self.final_df)
+        return self.user_partitions
+
+    def _get_shift_engine(self) -> KRShiftEngine:
+        """KRShiftEngine của final_df hiện tại (tạo lại nếu final_df đã thay đổi)"""
+        if self.shift_engine is None or self.shift_engine.final_df is not self.final_df:
+            self.shift_engine = KRShiftEngine(self.final_df)
+        return self.shift_engine
+
     def _calculate_final_okr_goal_shift(self, user_df: pd.DataFrame, reference_date: datetime, period: str) -> float:
         """Calculate final OKR goal shift"""
         try:
-            unique_combinations = {}
-            
-            for _, row in user_df.iterrows():
-                goal_name = row.get('goal_name', '')
-                kr_name = row.get('kr_name', '')
-                
-                if not goal_name or not kr_name:
-                    continue
-                
-                combo_key = f"{goal_name}|{kr_name}"
-                kr_shift = self.okr_calculator.calculate_kr_shift(row, reference_date, self.final_df)
-                
-                if combo_key not in unique_combinations:
-                    unique_combinations[combo_key] = []
-                unique_combinations[combo_key].append(kr_shift)
-            
-            final_shifts = [
-                sum(kr_shifts) / len(kr_shifts) 
-                for kr_shifts in unique_combinations.values() 
-                if kr_shifts
-            ]
-            
-            return sum(final_shifts) / len(final_shifts) if final_shifts else 0
+            user_shifts = self._get_shift_engine().goal_shifts(reference_date, user_df)
+            return user_shifts.mean() if len(user_shifts) > 0 else 0
             
         except Exception as e:
             print(f"Error calculating final_okr_goal_shift: {e}")
@@ -1509,7 +1608,7 @@ class OKRAnalysisSystem:
         # Period checkins (Quarterly/Cycle based)
         period_checkins = []
         
-        grouped = self.final_df.groupby('goal_user_name')
+        partitions = self._get_user_partitions()
         
         # Calculate weeks in cycle approx
         # Using simple assumption or data min/max
@@ -1524,7 +1623,11 @@ class OKRAnalysisSystem:
         except:
             total_weeks = 12
 
-        for user_name, group in grouped:
+        # Overall checkins (weeks with at least one checkin), tính cùng lượt duyệt user
+        overall_checkins = []
+        last_week_start = datetime.now() - timedelta(days=7)
+
+        for user_name, group in partitions:
             # Count checkin events (unique checkin ids)
             # Filter non-empty checkin names
             checkins = group[
@@ -1541,19 +1644,6 @@ class OKRAnalysisSystem:
                 'total_weeks': total_weeks
             })
             
-        # Overall checkins (detailed weekly analysis via UserManager logic)
-        overall_checkins = []
-        
-        # Reuse logic from UserManager to get detailed weekly stats if needed
-        # Or simple grouping
-        
-        # Let's count weeks with at least one checkin
-        for user_name, group in grouped:
-            checkins = group[
-                (group['checkin_name'].notna()) & 
-                (group['checkin_name'] != '')
-            ].copy()
-            
             if checkins.empty:
                 overall_checkins.append({
                     'user_name': user_name,
@@ -1564,15 +1654,12 @@ class OKRAnalysisSystem:
                 })
                 continue
                 
-            checkins['checkin_date'] = pd.to_datetime(checkins['checkin_since'], errors='coerce')
-            checkins['week_year'] = checkins['checkin_date'].dt.strftime('%Y-%U')
-            
-            weeks_with_checkin = checkins['week_year'].nunique()
-            total_checkins = checkins['checkin_id'].nunique()
+            checkin_date = pd.to_datetime(checkins['checkin_since'], errors='coerce')
+            weeks_with_checkin = checkin_date.dt.strftime('%Y-%U').nunique()
+            total_checkins = checkin_count
             
             # Last week checkins (approximate)
-            last_week_start = datetime.now() - timedelta(days=7)
-            last_week_checkins = checkins[checkins['checkin_date'] >= last_week_start]['checkin_id'].nunique()
+            last_week_checkins = checkins.loc[checkin_date >= last_week_start, 'checkin_id'].nunique()
 
             overall_checkins.append({
                 'user_name': user_name,
@@ -2162,137 +2249,178 @@ def print_report(report: Dict):
     print("📋 BÁO CÁO HOÀN THÀNH")
     print("="*80)
 
-def get_goal_data(employee_name):
-    """Lấy dữ liệu Goal/OKR bao gồm cả điểm số và hành vi check-in"""
-    try:
-        print(f"\n🔄 Đang tải dữ liệu Goal/OKR & Phân tích hành vi cho {employee_name}...")
-        analyzer = OKRAnalysisSystem(GOAL_ACCESS_TOKEN, ACCOUNT_ACCESS_TOKEN)
+def load_goal_context(cycles: Optional[List[Dict]] = None,
+                      raw_data: Optional[Dict[str, Any]] = None) -> Optional[Dict]:
+    """Tải toàn bộ dữ liệu OKR của chu kỳ mới nhất (dùng chung cho mọi nhân viên)
+
+    cycles / raw_data: danh sách chu kỳ và dữ liệu thô (fetch_raw_data) đã tải sẵn, nếu có.
+    """
+    analyzer = OKRAnalysisSystem(GOAL_ACCESS_TOKEN, ACCOUNT_ACCESS_TOKEN)
+    if cycles is None:
         cycles = analyzer.get_cycle_list()
-        if not cycles: return None
-        
-        # Tự động chọn chu kỳ mới nhất (do API không trả về start_date/end_date đầy đủ)
-        selected_cycle = cycles[0]
-        # print(f"Selected cycle: {selected_cycle['name']}")
-        
-        analyzer.checkin_path = selected_cycle['path']
-        analyzer.load_and_process_data()
-        
-        # 1. Lấy dữ liệu biến động điểm số (Weekly Shift)
-        weekly_shifts = analyzer.calculate_okr_shifts_by_user()
-        employee_weekly = next((u for u in weekly_shifts if u['user_name'] == employee_name), None)
-        
-        # 2. Lấy dữ liệu hành vi Check-in (Discipline)
-        # goal.py có hàm analyze_checkin_behavior trả về (period_checkins, overall_checkins)
-        period_checkins, overall_checkins = analyzer.analyze_checkin_behavior()
-        
-        employee_period_checkin = next((u for u in period_checkins if u['user_name'] == employee_name), None)
-        employee_overall_checkin = next((u for u in overall_checkins if u['user_name'] == employee_name), None)
-        
-        # 3. Lấy danh sách mục tiêu chi tiết và tính tốc độ
-        # Lấy user_id từ mapping
-        employee_user_id = None
-        if not user_id_to_name_map:
-            load_user_mapping()
-            
-        for uid, name in user_id_to_name_map.items():
-            if name == employee_name:
-                employee_user_id = uid
+    if not cycles:
+        return None
+    
+    # Tự động chọn chu kỳ mới nhất (do API không trả về start_date/end_date đầy đủ)
+    selected_cycle = cycles[0]
+    
+    analyzer.checkin_path = selected_cycle['path']
+    analyzer.load_and_process_data(raw_data)
+    
+    return {
+        'analyzer': analyzer,
+        'cycles': cycles,
+        'selected_cycle': selected_cycle
+    }
+
+class OKRReportCache:
+    """Kết quả phân tích OKR toàn công ty của một chu kỳ, tính một lần cho mỗi lượt chạy
+
+    Weekly shift, hành vi check-in và thời gian đã trôi qua của chu kỳ được tính cho mọi user
+    ngay khi tạo; goals/KRs được index theo user_id / goal_id nên phần dữ liệu của từng nhân
+    viên chỉ còn là tra cứu (phần goals_list được dựng lần đầu rồi giữ lại).
+    """
+
+    def __init__(self, goal_context: Dict):
+        self.analyzer = goal_context['analyzer']
+        self.cycles = goal_context['cycles']
+        self.selected_cycle = goal_context['selected_cycle']
+
+        # 1. Biến động điểm số (Weekly Shift) và 2. hành vi Check-in của mọi user
+        self.weekly_by_name = self._index_by_user_name(self.analyzer.calculate_okr_shifts_by_user())
+        period_checkins, overall_checkins = self.analyzer.analyze_checkin_behavior()
+        self.period_by_name = self._index_by_user_name(period_checkins)
+        self.overall_by_name = self._index_by_user_name(overall_checkins)
+
+        # 3. Goals theo user_id, KRs theo goal_id
+        df_goals = self.analyzer.goals_df
+        self.has_goals = df_goals is not None and not df_goals.empty
+        self.goal_rows_by_user = df_goals.groupby('goal_user_id').indices if self.has_goals else {}
+        df_krs = self.analyzer.krs_df if self.analyzer.krs_df is not None else pd.DataFrame()
+        self.kr_rows_by_goal = df_krs.groupby(df_krs['goal_id'].astype(str)).indices if not df_krs.empty else {}
+        self.fraction_of_time = self._calculate_fraction_of_time() if self.has_goals else 0.0
+        self._goals_by_user: Dict[str, Tuple[List[Dict], List[Dict]]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _index_by_user_name(rows: List[Dict]) -> Dict[str, Dict]:
+        """user_name -> dòng đầu tiên của user (giống next(...) trên danh sách)"""
+        indexed = {}
+        for row in rows:
+            indexed.setdefault(row['user_name'], row)
+        return indexed
+
+    def _calculate_fraction_of_time(self) -> float:
+        """Tỉ lệ thời gian đã trôi qua của chu kỳ (giả định quý dài 90 ngày)"""
+        cycle_start = None
+        for cycle in self.cycles:
+            if cycle['path'] == self.analyzer.checkin_path:
+                cycle_start = cycle['start_time'] # datetime object (UTC)
                 break
-        
-        goals_list = []
-        fraction_of_time = 0.0
 
-        raw_goal_records = []
+        fraction_of_time = 1.0
+        if cycle_start:
+            # Chuyển về timezone HCM để so sánh
+            cycle_start_hcm = cycle_start.astimezone(hcm_tz)
+            now_hcm = datetime.now(hcm_tz)
 
-        if employee_user_id:
-            # Lấy dữ liệu goals từ API (thông qua analyzer.api_client)
-            # Lưu ý: analyzer.api_client là object APIClient được khởi tạo trong OKRAnalysisSystem
-            df_goals = analyzer.api_client.get_goals_data(analyzer.checkin_path)
-            
-            if not df_goals.empty:
-                # Lọc goal của user
-                user_goals = df_goals[df_goals['goal_user_id'] == str(employee_user_id)].copy()
-                
-                # Fetch KRs data
-                df_krs = analyzer.api_client.get_krs_data(analyzer.checkin_path)
-                user_krs = pd.DataFrame()
-                if not df_krs.empty:
-                    # Filter KRs for this user (optional, but safer to match by goal_id later)
-                   user_krs = df_krs.copy() # Match by goal_id is safer
-
-                # Tính toán fraction_of_time
-                # Giả sử cycle là quý, lấy start_time từ cycle info
-                cycle_start = None
-                for cycle in cycles:
-                    if cycle['path'] == analyzer.checkin_path:
-                        cycle_start = cycle['start_time'] # datetime object (UTC)
-                        break
-                
-                fraction_of_time = 1.0
-                if cycle_start:
-                    # Chuyển về timezone HCM để so sánh
-                    cycle_start_hcm = cycle_start.astimezone(hcm_tz)
-                    now_hcm = datetime.now(hcm_tz)
-                    
-                    # Giả định quý dài 90 ngày
-                    cycle_duration_days = 90
-                    possible_days_passed = (now_hcm - cycle_start_hcm).days
-                    days_passed = max(0, possible_days_passed)
-                    
-                    if days_passed <= 0:
-                        fraction_of_time = 0.01 # Tránh chia cho 0
-                    else:
-                        fraction_of_time = min(days_passed / cycle_duration_days, 1.0)
-                
-                if not user_goals.empty:
-                    raw_goal_records = user_goals.astype(str).to_dict(orient="records")
-
-                for _, row in user_goals.iterrows():
-                    current_val = float(row.get('goal_current_value', 0))
-                    # Target value thường là 100% cho OKR, hoặc cần lấy từ target nếu có. 
-                    # Ở đây giả định goal_current_value là % hoàn thành (0-100)
-                    
-                    # Tính tốc độ: percent_complete / fraction_of_time
-                    # percent_complete là 0-100, fraction_of_time là 0-1
-                    # Để ra tỉ lệ (ví dụ 1.0 là đúng tiến độ), ta dùng (current_val / 100) / fraction_of_time
-                    
-                    percent_complete = current_val # Giả sử giá trị là %, ví dụ 45.5
-                    
-                    if fraction_of_time > 0:
-                        speed = (percent_complete / 100.0) / fraction_of_time
-                    else:
-                        speed = 0
-                    
-                    # Find KRs for this goal
-                    goal_id = str(row.get('goal_id'))
-                    filtered_krs = []
-                    if not user_krs.empty:
-                        # Ensure string comparison
-                        mask = user_krs['goal_id'].astype(str) == goal_id
-                        krs_for_goal = user_krs[mask]
-                        for _, kr_row in krs_for_goal.iterrows():
-                            filtered_krs.append({
-                                'name': kr_row.get('kr_name', 'Unknown KR'),
-                                'progress': float(kr_row.get('kr_current_value', 0))
-                            })
-
-                    goals_list.append({
-                        'name': row.get('goal_name', 'Unknown'),
-                        'current_value': current_val,
-                        'speed': speed,
-                        'sub_goals': filtered_krs,
-                        'start_date': str(row.get('goal_since', ''))
+            cycle_duration_days = 90
+            days_passed = max(0, (now_hcm - cycle_start_hcm).days)
+
+            if days_passed <= 0:
+                fraction_of_time = 0.01 # Tránh chia cho 0
+            else:
+                fraction_of_time = min(days_passed / cycle_duration_days, 1.0)
+        return fraction_of_time
+
+    def _build_goals(self, user_id: str) -> Tuple[List[Dict], List[Dict]]:
+        """goals_list (kèm tốc độ và KRs) và raw records của một user"""
+        positions = self.goal_rows_by_user.get(user_id)
+        if positions is None:
+            return [], []
+        user_goals = self.analyzer.goals_df.take(positions)
+        raw_goal_records = user_goals.astype(str).to_dict(orient="records")
+
+        goals_list = []
+        for _, row in user_goals.iterrows():
+            # Giả định goal_current_value là % hoàn thành (0-100)
+            current_val = float(row.get('goal_current_value', 0))
+
+            # Tốc độ: (percent_complete / 100) / fraction_of_time, 1.0 là đúng tiến độ
+            if self.fraction_of_time > 0:
+                speed = (current_val / 100.0) / self.fraction_of_time
+            else:
+                speed = 0
+
+            filtered_krs = []
+            kr_positions = self.kr_rows_by_goal.get(str(row.get('goal_id')))
+            if kr_positions is not None:
+                for _, kr_row in self.analyzer.krs_df.take(kr_positions).iterrows():
+                    filtered_krs.append({
+                        'name': kr_row.get('kr_name', 'Unknown KR'),
+                        'progress': float(kr_row.get('kr_current_value', 0))
                     })
 
+            goals_list.append({
+                'name': row.get('goal_name', 'Unknown'),
+                'current_value': current_val,
+                'speed': speed,
+                'sub_goals': filtered_krs,
+                'start_date': str(row.get('goal_since', ''))
+            })
+        return goals_list, raw_goal_records
+
+    def get(self, employee_name: str) -> Dict:
+        """Dữ liệu Goal/OKR của một nhân viên (cùng định dạng với get_goal_data)"""
+        employee = get_directory().by_name(employee_name)
+        employee_user_id = str(employee['id']) if employee else None
+
+        goals_list, raw_goal_records = [], []
+        fraction_of_time = 0.0
+        if employee_user_id and self.has_goals:
+            if employee_user_id not in self._goals_by_user:
+                with self._lock:
+                    if employee_user_id not in self._goals_by_user:
+                        self._goals_by_user[employee_user_id] = self._build_goals(employee_user_id)
+            goals_list, raw_goal_records = self._goals_by_user[employee_user_id]
+            fraction_of_time = self.fraction_of_time
+
         return {
-            'weekly': employee_weekly,
-            'checkin_behavior': employee_period_checkin,
-            'overall_behavior': employee_overall_checkin,
-            'cycle_name': selected_cycle['name'],
+            'weekly': self.weekly_by_name.get(employee_name),
+            'checkin_behavior': self.period_by_name.get(employee_name),
+            'overall_behavior': self.overall_by_name.get(employee_name),
+            'cycle_name': self.selected_cycle['name'],
             'goals_list': goals_list,
             'fraction_of_time': fraction_of_time,
             'raw_df_records': raw_goal_records
         }
+
+
+_report_cache_lock = threading.Lock()
+
+
+def get_report_cache(goal_context: Dict) -> OKRReportCache:
+    """OKRReportCache của goal_context (tạo ở lần gọi đầu, dùng lại cho các nhân viên sau)"""
+    if goal_context.get('report_cache') is None:
+        with _report_cache_lock:
+            if goal_context.get('report_cache') is None:
+                goal_context['report_cache'] = OKRReportCache(goal_context)
+    return goal_context['report_cache']
+
+
+def get_goal_data(employee_name, goal_context: Optional[Dict] = None):
+    """Lấy dữ liệu Goal/OKR bao gồm cả điểm số và hành vi check-in
+
+    goal_context: kết quả của load_goal_context (nếu đã tải sẵn cho cả công ty). Phân tích
+    toàn công ty được tính một lần cho mỗi goal_context (OKRReportCache).
+    """
+    try:
+        print(f"\n🔄 Đang tải dữ liệu Goal/OKR & Phân tích hành vi cho {employee_name}...")
+        if goal_context is None:
+            goal_context = load_goal_context()
+        if not goal_context: return None
+        
+        return get_report_cache(goal_context).get(employee_name)
     except Exception as e:
         print(f"❌ Lỗi khi lấy dữ liệu Goal: {e}")
         return None
@@ -1,4 +1,5 @@
-import requests
+import base_http
+from user_directory import get_directory
 import re
 from html import unescape
 from datetime import datetime
@@ -28,35 +29,21 @@ def get_inside_token_key():
 # Global variable for user mapping
 user_id_to_name_map = {}
 
-def load_user_mapping():
-    """Tải user mapping từ Account API và lưu vào biến global"""
+def load_user_mapping(user_list=None):
+    """Tải mapping user_id -> name (từ UserDirectory dùng chung) và lưu vào biến global
+
+    user_list: danh sách user đã tải sẵn (nếu có thì dùng thay cho UserDirectory).
+    """
     global user_id_to_name_map
-    try:
-        url = "https://account.base.vn/extapi/v1/users/get_list"
-        payload = get_account_auth_data()
-        headers = {'Content-Type': 'application/x-www-form-urlencoded'}
-        
-        response = requests.post(url, headers=headers, data=payload, timeout=30)
-        
-        if response.status_code == 200:
-            response_json = response.json()
-            
-            user_list = []
-            if isinstance(response_json, list):
-                user_list = response_json
-            elif isinstance(response_json, dict):
-                user_list = response_json.get('users', [])
-            
-            if user_list:
-                user_id_to_name_map = {
-                    str(user.get('id', '')): user.get('name', '') 
-                    for user in user_list 
-                    if user.get('id') and user.get('name')
-                }
-        else:
-            print(f"Không thể tải user mapping, status code: {response.status_code}")
-    except Exception as e:
-        print(f"Lỗi khi tải user mapping: {e}")
+    if user_list is None:
+        user_id_to_name_map = get_directory().id_to_name()
+        return
+    user_id_to_name_map = {
+        str(user.get('id', '')): user.get('name', '')
+        for user in user_list
+        if user.get('id') and user.get('name')
+    }
+
 
 def get_user_name(user_id):
     """Lấy tên user từ user_id"""
@@ -103,7 +90,7 @@ def get_all_news_and_articles(max_pages=10):
         token_key = get_inside_token_key()
         url = f"https://inside.base.vn/extapi/v2/companynews/get?{token_key}={INSIDE_API_KEY}&page={page}"
         try:
-            response = requests.get(url, timeout=30)
+            response = base_http.get(url, timeout=30)
             if response.status_code != 200:
                 break
             
@@ -135,7 +122,7 @@ def get_all_news_and_articles(max_pages=10):
         token_key = get_inside_token_key()
         url = f"https://inside.base.vn/extapi/v2/articles/get?{token_key}={INSIDE_API_KEY}&page={page}"
         try:
-            response = requests.get(url, timeout=30)
+            response = base_http.get(url, timeout=30)
             if response.status_code != 200:
                 break
             
@@ -162,8 +149,11 @@ def get_all_news_and_articles(max_pages=10):
     
     return all_items
 
-def get_inside_data(employee_name, limit=5):
-    """Lấy dữ liệu Inside - bài viết gần nhất"""
+def get_inside_data(employee_name, limit=5, all_items=None):
+    """Lấy dữ liệu Inside - bài viết gần nhất
+
+    all_items: danh sách news + articles đã tải sẵn cho cả công ty (BaseSnapshot), nếu có.
+    """
     try:
         print(f"\n🔄 Đang tải dữ liệu Inside cho {employee_name}...")
         
@@ -172,7 +162,8 @@ def get_inside_data(employee_name, limit=5):
             load_user_mapping()
         
         # Lấy tất cả bài viết (news + articles) từ nhiều trang
-        all_items = get_all_news_and_articles(max_pages=50)
+        if all_items is None:
+            all_items = get_all_news_and_articles(max_pages=50)
         
         if not all_items:
             print("⚠️ Không có dữ liệu bài viết từ Inside")
@@ -195,13 +186,11 @@ def get_inside_data(employee_name, limit=5):
         employee_views_received = 0
         employee_reactions_given = 0
         employee_views_given = 0
+        employee_items = []
         
-        # Tìm user_id của nhân viên từ mapping
-        employee_user_id = None
-        for uid, name in user_id_to_name_map.items():
-            if name == employee_name:
-                employee_user_id = uid
-                break
+        # Tìm user_id của nhân viên từ danh bạ dùng chung
+        employee = get_directory().by_name(employee_name)
+        employee_user_id = employee['id'] if employee else None
         
         if not employee_user_id:
             print(f"⚠️ Không tìm thấy user_id cho nhân viên: {employee_name}")
@@ -235,6 +224,7 @@ def get_inside_data(employee_name, limit=5):
                 
                 if match:
                     employee_posts += 1
+                    employee_items.append(item)
                     employee_reactions_received += len(reactions)
                     employee_views_received += len(seens)
             
@@ -282,7 +272,8 @@ def get_inside_data(employee_name, limit=5):
         print(f"   - Reactions đã cho: {employee_reactions_given}")
         print(f"   - Views đã cho: {employee_views_given}")
         
-        raw_df_records = pd.DataFrame(all_items).astype(str).to_dict(orient="records") if all_items else []
+        # Raw records cho MCP: chỉ bài viết của nhân viên, không trả toàn bộ bài viết công ty
+        raw_df_records = pd.DataFrame(employee_items).astype(str).to_dict(orient="records") if employee_items else []
 
         return {
             'summary': {
@@ -0,0 +1,56 @@
+"""
+insight_cache - cache trên đĩa cho kết quả AI insight / recommend.
+
+Khóa là sha256 của (model, phiên bản prompt, section, loại insight, data_context): cùng dữ
+liệu đầu vào thì trả lại ngay kết quả lần trước thay vì gọi LLM (chạy lại batch, MCP gọi
+lặp lại). Đổi model hoặc tăng phiên bản prompt là tự động bỏ qua các kết quả cũ. Lưu trữ
+dùng chung cơ chế của base_cache: ghi nguyên tử, TTL, giới hạn dung lượng và xóa file ít
+dùng nhất trước (LRU theo mtime).
+
+Cấu hình qua biến môi trường:
+    INSIGHT_CACHE_DIR      thư mục cache (mặc định .insight_cache cạnh source)
+    INSIGHT_CACHE_TTL      thời gian sống (giây, mặc định 7 ngày)
+    INSIGHT_CACHE_MAX_MB   dung lượng tối đa (mặc định 50)
+    INSIGHT_CACHE_DISABLE  =1 để tắt cache
+Cờ --refresh / BASE_CACHE_REFRESH=1 cũng bỏ qua cache khi đọc (vẫn ghi kết quả mới).
+"""
+import hashlib
+import json
+import os
+import time
+from typing import Optional
+
+import base_cache
+
+CACHE_DIR = os.getenv('INSIGHT_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.insight_cache'))
+TTL = int(os.getenv('INSIGHT_CACHE_TTL', str(7 * 24 * 3600)))
+MAX_BYTES = int(float(os.getenv('INSIGHT_CACHE_MAX_MB', '50')) * 1024 * 1024)
+DISABLED = os.getenv('INSIGHT_CACHE_DISABLE') == '1'
+
+
+def make_key(model: str, prompt_version, section_name: str, insight_type: str, data_context) -> str:
+    """Khóa nội dung của một lần gọi AI"""
+    if not isinstance(data_context, str):
+        data_context = json.dumps(data_context, ensure_ascii=False, sort_keys=True, default=str)
+    raw = json.dumps([model, str(prompt_version), section_name, insight_type, data_context], ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _path_for(key: str) -> str:
+    return os.path.join(CACHE_DIR, key[:2], f"{key}.json")
+
+
+def load(key: str) -> Optional[str]:
+    """Nội dung AI đã cache (còn hạn), None nếu không có"""
+    if DISABLED or base_cache.REFRESH:
+        return None
+    entry = base_cache.read_entry(_path_for(key), TTL)
+    return entry.get('content') if entry else None
+
+
+def store(key: str, content: str, section_name: str = ''):
+    """Lưu kết quả AI (chỉ lưu nội dung khác rỗng)"""
+    if DISABLED or not content:
+        return
+    entry = {'created': time.time(), 'section': section_name, 'content': content}
+    base_cache.put_entry(_path_for(key), entry, CACHE_DIR, MAX_BYTES)
@@ -0,0 +1,146 @@
+"""
+llm_pool - gọi LLM (Ollama) qua pool API key, chia tải theo số request đang chạy và độ trễ.
+
+Mỗi key giữ một client dùng lại cho mọi request. Request mới được giao cho key còn chỗ
+(dưới LLM_PER_KEY_CONCURRENCY request đang chạy) có ít request đang chạy nhất, hòa thì
+chọn key có độ trễ gần đây (trung bình trượt) thấp hơn. Key bị 429 (rate limit) được cho
+nghỉ LLM_COOLDOWN giây (với mọi request) rồi request chạy lại trên key khác; lỗi khác
+(timeout, request sai, stream lỗi...) chỉ làm request đó bỏ qua key (như failover cũ), các
+request khác vẫn dùng key bình thường. Khi mọi key đều đang bận/nghỉ thì request chờ đến lượt.
+
+Cấu hình qua biến môi trường:
+    LLM_PER_KEY_CONCURRENCY   số request đồng thời tối đa trên mỗi key (mặc định 2)
+    LLM_COOLDOWN              thời gian nghỉ của key sau 429 (giây, mặc định 30)
+    LLM_RATE_LIMIT_RETRIES    số lần chạy lại thêm khi gặp 429 (mặc định 3)
+"""
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+OLLAMA_HOST = "https://ollama.com"
+PER_KEY_CONCURRENCY = int(os.getenv('LLM_PER_KEY_CONCURRENCY', '2'))
+COOLDOWN = float(os.getenv('LLM_COOLDOWN', '30'))
+RATE_LIMIT_RETRIES = int(os.getenv('LLM_RATE_LIMIT_RETRIES', '3'))
+
+# Trọng số của lần đo mới trong độ trễ trung bình trượt
+LATENCY_ALPHA = 0.3
+
+
+class LLMUnavailable(Exception):
+    """Không còn key nào gọi được cho request này"""
+
+
+def is_rate_limited(exc: Exception) -> bool:
+    """Lỗi 429 / Too Many Requests từ ollama (ResponseError.status_code) hoặc httpx"""
+    status = getattr(exc, 'status_code', None)
+    if status is None and getattr(exc, 'response', None) is not None:
+        status = getattr(exc.response, 'status_code', None)
+    return status == 429 or 'too many requests' in str(exc).lower()
+
+
+class _KeyState:
+    def __init__(self, index: int, api_key: str):
+        self.index = index
+        self.api_key = api_key
+        self.client = None
+        self.in_flight = 0
+        self.latency: Optional[float] = None
+        self.cooldown_until = 0.0
+
+
+class LLMKeyPool:
+    """Pool client Ollama theo API key, an toàn khi gọi từ nhiều thread"""
+
+    def __init__(self, api_keys: List[str], host: str = OLLAMA_HOST,
+                 per_key_concurrency: int = PER_KEY_CONCURRENCY, cooldown: float = COOLDOWN,
+                 rate_limit_retries: int = RATE_LIMIT_RETRIES):
+        self.host = host
+        self.per_key_concurrency = max(1, per_key_concurrency)
+        self.cooldown = cooldown
+        self.rate_limit_retries = rate_limit_retries
+        self._keys = [_KeyState(index, key) for index, key in enumerate(api_keys)]
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        return len(self._keys)
+
+    @property
+    def capacity(self) -> int:
+        """Số request có thể chạy đồng thời trên toàn pool"""
+        return len(self._keys) * self.per_key_concurrency
+
+    def _client(self, state: _KeyState):
+        """Client của key, tạo lần đầu (ngoài lock: import ollama / tạo Client có thể chậm hoặc lỗi)"""
+        if state.client is None:
+            from ollama import Client  # chỉ import khi thực sự gọi AI
+            client = Client(host=self.host, headers={'Authorization': 'Bearer ' + str(state.api_key)})
+            with self._cond:
+                if state.client is None:
+                    state.client = client
+        return state.client
+
+    def _acquire(self, excluded) -> Optional[_KeyState]:
+        """Chọn key cho request (chờ nếu mọi key đều bận/nghỉ); None nếu không còn key dùng được"""
+        with self._cond:
+            while True:
+                candidates = [state for state in self._keys if state.index not in excluded]
+                if not candidates:
+                    return None
+                now = time.monotonic()
+                ready = [state for state in candidates
+                         if state.cooldown_until <= now and state.in_flight < self.per_key_concurrency]
+                if ready:
+                    # Key chưa có số đo độ trễ được ưu tiên thử trước
+                    state = min(ready, key=lambda s: (s.in_flight, s.latency or 0.0, s.index))
+                    state.in_flight += 1
+                    break
+                cooling = [state.cooldown_until - now for state in candidates if state.cooldown_until > now]
+                self._cond.wait(timeout=min(cooling) if cooling else None)
+        try:
+            self._client(state)
+        except Exception:
+            # Không tạo được client: trả lại chỗ đã giữ trên key
+            self._release(state)
+            raise
+        return state
+
+    def _release(self, state: _KeyState, latency: Optional[float] = None, failed: bool = False):
+        with self._cond:
+            state.in_flight -= 1
+            if latency is not None:
+                state.latency = latency if state.latency is None else (
+                    LATENCY_ALPHA * latency + (1 - LATENCY_ALPHA) * state.latency)
+            if failed:
+                state.cooldown_until = time.monotonic() + self.cooldown
+            self._cond.notify_all()
+
+    def chat(self, model: str, messages: List[Dict], options: Optional[Dict] = None, label: str = '') -> str:
+        """Gọi chat (streaming) và trả về toàn bộ nội dung; LLMUnavailable nếu mọi key đều lỗi"""
+        excluded = set()
+        rate_limit_retries = self.rate_limit_retries
+        last_error = None
+        while True:
+            state = self._acquire(excluded)
+            if state is None:
+                raise LLMUnavailable(f"All API keys failed{' for ' + label if label else ''}: {last_error}")
+            start = time.perf_counter()
+            try:
+                full_content = ""
+                stream_response = state.client.chat(model=model, messages=messages, stream=True, options=options or {})
+                for part in stream_response:
+                    full_content += part['message']['content']
+            except Exception as e:
+                last_error = e
+                rate_limited = is_rate_limited(e)
+                # Chỉ 429 cho key nghỉ với mọi request; lỗi khác chỉ bỏ qua key cho request này
+                self._release(state, failed=rate_limited)
+                if rate_limited and rate_limit_retries > 0:
+                    rate_limit_retries -= 1
+                    print(f"⏳ Key {state.index + 1}/{len(self._keys)} bị rate limit, nghỉ {self.cooldown:g}s và chuyển key khác...")
+                else:
+                    excluded.add(state.index)
+                    print(f"⚠️ Key {state.index + 1}/{len(self._keys)} failed: {e}")
+                continue
+            self._release(state, latency=time.perf_counter() - start)
+            return full_content
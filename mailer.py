@@ -0,0 +1,269 @@
+"""
+mailer - gửi email báo cáo qua kết nối SMTP dùng lại và hàng đợi gửi có giới hạn tốc độ.
+
+Thay vì mở kết nối mới + STARTTLS + login cho từng email, mỗi worker gửi giữ một kết nối
+SMTP đã đăng nhập và dùng lại cho các email tiếp theo; kết nối bị server ngắt thì tự
+kết nối lại và gửi lại một lần. Email được đưa vào hàng đợi trong process, các worker gửi
+lần lượt với giới hạn tốc độ chung (tránh bị Gmail chặn vì gửi dồn dập). Kết quả gửi của
+từng email được giữ lại (và ghi ra file JSONL nếu cấu hình).
+
+Backend:
+    smtp  (mặc định) - SMTP server thật; để test có thể trỏ tới server local
+          (vd. `python -m aiosmtpd -n -l localhost:8025` với SMTP_PORT=8025 SMTP_STARTTLS=0)
+    file  - không gửi, ghi từng email thành file .eml trong MAIL_SINK_DIR
+
+Cấu hình qua biến môi trường:
+    MAIL_BACKEND              smtp | file (mặc định smtp)
+    MAIL_SINK_DIR             thư mục ghi .eml của backend file (mặc định .mail_sink cạnh source)
+    MAIL_DELIVERY_LOG         file JSONL ghi kết quả gửi từng email (mặc định không ghi)
+    SMTP_HOST / SMTP_PORT     server SMTP (mặc định smtp.gmail.com:587)
+    SMTP_STARTTLS             =0 để không dùng STARTTLS (server test local)
+    SMTP_CONNECTIONS          số kết nối / worker gửi song song (mặc định 2)
+    SMTP_RATE_PER_MINUTE      số email tối đa mỗi phút, 0 = không giới hạn (mặc định 60)
+    SMTP_MAX_PER_CONNECTION   số email trên một kết nối trước khi kết nối lại (mặc định 100)
+"""
+import json
+import os
+import queue
+import re
+import smtplib
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+from typing import List, NamedTuple, Optional
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+
+MAIL_BACKEND = os.getenv('MAIL_BACKEND', 'smtp')
+MAIL_SINK_DIR = os.getenv('MAIL_SINK_DIR', os.path.join(_HERE, '.mail_sink'))
+DELIVERY_LOG = os.getenv('MAIL_DELIVERY_LOG')
+SMTP_HOST = os.getenv('SMTP_HOST', 'smtp.gmail.com')
+SMTP_PORT = int(os.getenv('SMTP_PORT', '587'))
+SMTP_STARTTLS = os.getenv('SMTP_STARTTLS', '1') != '0'
+SMTP_CONNECTIONS = int(os.getenv('SMTP_CONNECTIONS', '2'))
+RATE_PER_MINUTE = float(os.getenv('SMTP_RATE_PER_MINUTE', '60'))
+MAX_PER_CONNECTION = int(os.getenv('SMTP_MAX_PER_CONNECTION', '100'))
+
+# Kết nối không dùng quá lâu thì kiểm tra lại (NOOP) trước khi gửi
+IDLE_CHECK_SECONDS = 60
+
+# Lỗi cho thấy kết nối đã hỏng (server ngắt, timeout...) -> kết nối lại và gửi lại một lần
+_CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, TimeoutError)
+
+_STOP = object()
+
+
+class DeliveryResult(NamedTuple):
+    to: str
+    subject: str
+    ok: bool
+    error: Optional[str]
+    attempts: int
+    sent_at: str
+    elapsed: float
+
+
+class SMTPBackend:
+    """Mở kết nối SMTP đã đăng nhập (login chỉ khi có tài khoản)"""
+
+    def __init__(self, user: Optional[str] = None, password: Optional[str] = None,
+                 host: str = SMTP_HOST, port: int = SMTP_PORT, starttls: bool = SMTP_STARTTLS):
+        self.user = user
+        self.password = password
+        self.host = host
+        self.port = port
+        self.starttls = starttls
+
+    def connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=60)
+        if self.starttls:
+            server.starttls()
+        if self.user and self.password:
+            server.login(self.user, self.password)
+        return server
+
+
+class _FileSinkConnection:
+    def __init__(self, sink_dir: str):
+        self.sink_dir = sink_dir
+
+    def send_message(self, msg):
+        recipient = re.sub(r'[^\w.@-]+', '_', str(msg['To'] or 'unknown'))
+        name = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{recipient}.eml"
+        with open(os.path.join(self.sink_dir, name), 'wb') as f:
+            f.write(msg.as_bytes())
+        return {}
+
+    def noop(self):
+        return (250, b'OK')
+
+    def quit(self):
+        pass
+
+
+class FileSinkBackend:
+    """Backend test: ghi email thành file .eml thay vì gửi"""
+
+    def __init__(self, sink_dir: str = MAIL_SINK_DIR):
+        self.sink_dir = sink_dir
+
+    def connect(self):
+        os.makedirs(self.sink_dir, exist_ok=True)
+        return _FileSinkConnection(self.sink_dir)
+
+
+def default_backend(user: Optional[str] = None, password: Optional[str] = None):
+    """Backend theo MAIL_BACKEND"""
+    if MAIL_BACKEND == 'file':
+        return FileSinkBackend()
+    return SMTPBackend(user, password)
+
+
+class _RateLimiter:
+    """Giãn đều các lần gửi: tối đa `per_minute` email mỗi phút trên toàn dispatcher"""
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class _Connection:
+    """Kết nối của một worker gửi: tự mở lại khi hỏng, quá cũ hoặc đã gửi đủ số email"""
+
+    def __init__(self, backend, max_messages: int):
+        self.backend = backend
+        self.max_messages = max_messages
+        self._server = None
+        self._sent = 0
+        self._last_used = 0.0
+
+    def _ensure(self):
+        if self._server is not None and self.max_messages and self._sent >= self.max_messages:
+            self.close()
+        if self._server is not None and time.monotonic() - self._last_used > IDLE_CHECK_SECONDS:
+            try:
+                if self._server.noop()[0] != 250:
+                    self.close()
+            except Exception:
+                self.close()
+        if self._server is None:
+            self._server = self.backend.connect()
+            self._sent = 0
+        return self._server
+
+    def send(self, msg):
+        refused = self._ensure().send_message(msg)
+        self._sent += 1
+        self._last_used = time.monotonic()
+        return refused
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                pass
+            self._server = None
+
+
+class MailDispatcher:
+    """Hàng đợi gửi email với `connections` worker, mỗi worker giữ một kết nối SMTP"""
+
+    def __init__(self, backend=None, connections: int = SMTP_CONNECTIONS,
+                 rate_per_minute: float = RATE_PER_MINUTE, max_per_connection: int = MAX_PER_CONNECTION,
+                 delivery_log: Optional[str] = DELIVERY_LOG):
+        self.backend = backend or default_backend()
+        self.max_per_connection = max_per_connection
+        self.delivery_log = delivery_log
+        self.results: List[DeliveryResult] = []
+        self._results_lock = threading.Lock()
+        self._rate = _RateLimiter(rate_per_minute)
+        self._queue = queue.Queue()
+        self._workers = [
+            threading.Thread(target=self._worker, name=f'mail-sender-{n}', daemon=True)
+            for n in range(max(1, connections))
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, msg) -> Future:
+        """Đưa email vào hàng đợi; Future trả về DeliveryResult"""
+        future = Future()
+        self._queue.put((msg, future))
+        return future
+
+    def send(self, msg) -> DeliveryResult:
+        """Gửi email qua hàng đợi và chờ kết quả"""
+        return self.submit(msg).result()
+
+    def _worker(self):
+        connection = _Connection(self.backend, self.max_per_connection)
+        try:
+            while True:
+                entry = self._queue.get()
+                if entry is _STOP:
+                    break
+                msg, future = entry
+                future.set_result(self._deliver(connection, msg))
+        finally:
+            connection.close()
+
+    def _deliver(self, connection: _Connection, msg) -> DeliveryResult:
+        self._rate.wait()
+        start = time.perf_counter()
+        attempts = 0
+        error = None
+        while attempts < 2:
+            attempts += 1
+            try:
+                refused = connection.send(msg)
+                error = f"Bị từ chối: {', '.join(refused)}" if refused else None
+                break
+            except smtplib.SMTPRecipientsRefused as e:
+                # Lỗi của địa chỉ nhận, kết nối vẫn dùng được
+                error = f"Bị từ chối: {', '.join(e.recipients)}"
+                break
+            except _CONNECTION_ERRORS as e:
+                # Kết nối bị ngắt giữa chừng: mở kết nối mới và gửi lại một lần
+                connection.close()
+                error = str(e) or type(e).__name__
+            except Exception as e:
+                connection.close()
+                error = str(e) or type(e).__name__
+                break
+        result = DeliveryResult(
+            to=str(msg['To']), subject=str(msg['Subject']), ok=error is None, error=error,
+            attempts=attempts, sent_at=datetime.now().isoformat(timespec='seconds'),
+            elapsed=round(time.perf_counter() - start, 3),
+        )
+        self._record(result)
+        return result
+
+    def _record(self, result: DeliveryResult):
+        with self._results_lock:
+            self.results.append(result)
+            if self.delivery_log:
+                try:
+                    with open(self.delivery_log, 'a', encoding='utf-8') as f:
+                        f.write(json.dumps(result._asdict(), ensure_ascii=False) + '\n')
+                except OSError as e:
+                    print(f"⚠️ Không ghi được delivery log {self.delivery_log}: {e}")
+
+    def close(self):
+        """Gửi nốt email trong hàng đợi rồi đóng mọi kết nối"""
+        for _ in self._workers:
+            self._queue.put(_STOP)
+        for worker in self._workers:
+            worker.join()
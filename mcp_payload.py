@@ -0,0 +1,173 @@
+"""
+mcp_payload - định hình response của MCP server: mức chi tiết, chọn cột và phân trang raw_data.
+
+raw_df_records của mỗi nguồn được chia thành các bảng raw (checkin, timeoff, wework, goal,
+workflow, inside). Response của get_base_data_by_name chỉ kèm trang đầu của mỗi bảng; các
+trang sau lấy qua tool get_base_raw_rows bằng next_cursor (chuỗi base64 mang user, tháng,
+bảng, offset và cách chọn cột). Các trang được cắt từ kết quả đã cache của server nên các
+trang liên tiếp đọc cùng một bản dữ liệu trong thời gian TTL của nguồn.
+
+Mức chi tiết (detail):
+    summary   chỉ các số liệu tổng hợp của mỗi nguồn (SUMMARY_FIELDS), không kèm dòng raw
+    standard  (mặc định) dữ liệu đã phân tích + trang đầu raw, chỉ các cột chính (RAW_COLUMNS)
+    full      dữ liệu đã phân tích + trang đầu raw, đủ mọi cột
+
+Cấu hình qua biến môi trường:
+    MCP_RAW_PAGE_SIZE      số dòng raw mỗi trang (mặc định 50)
+    MCP_RAW_MAX_PAGE_SIZE  số dòng tối đa của một trang (mặc định 500)
+"""
+import base64
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+RAW_PAGE_SIZE = int(os.getenv('MCP_RAW_PAGE_SIZE', '50'))
+MAX_PAGE_SIZE = int(os.getenv('MCP_RAW_MAX_PAGE_SIZE', '500'))
+
+DETAIL_LEVELS = ('summary', 'standard', 'full')
+
+# Bảng raw của từng nguồn (checkin trả raw_df_records dạng dict: mỗi key là một bảng)
+SOURCE_TABLES = {
+    'checkin': ('checkin', 'timeoff'),
+    'wework': ('wework',),
+    'goal': ('goal',),
+    'workflow': ('workflow',),
+    'inside': ('inside',),
+}
+TABLE_SOURCE = {table: source for source, tables in SOURCE_TABLES.items() for table in tables}
+
+# Cột trả về ở mức standard; cột nặng (nội dung bài viết, danh sách reactions/seens, export
+# của workflow...) chỉ có ở mức full hoặc khi client chọn cột
+RAW_COLUMNS = {
+    'checkin': ['employee_name', 'checkin_date', 'checkin_datetime', 'is_checkout', 'note'],
+    'timeoff': ['id', 'employee_name', 'state', 'metatype', 'paid_timeoff', 'start_date', 'end_date',
+                'total_leave_days', 'buoi_nghi', 'ly_do'],
+    'wework': ['id', 'name', 'project_name', 'complete', 'since', 'deadline', 'completed_time', 'days_left'],
+    'goal': ['goal_id', 'goal_name', 'goal_current_value', 'goal_since', 'dept_name', 'team_name'],
+    'workflow': ['id', 'name', 'status', 'since', 'deadline'],
+    'inside': ['id', 'name', 'item_type', 'since', 'link'],
+}
+
+# Trường của dữ liệu đã phân tích được giữ ở mức summary
+SUMMARY_FIELDS = {
+    'checkin': ['summary', 'period', 'evaluation', 'checkin_count_monthly', 'checkin_count_period',
+                'last_checkin', 'late_count', 'missing_days'],
+    'wework': ['employee_info', 'time_period', 'summary', 'time_performance'],
+    'goal': ['weekly', 'checkin_behavior', 'overall_behavior', 'cycle_name', 'fraction_of_time'],
+    'workflow': ['summary'],
+    'inside': ['summary'],
+}
+
+
+def check_detail(detail: str) -> str:
+    if detail not in DETAIL_LEVELS:
+        raise ValueError(f"detail must be one of: {', '.join(DETAIL_LEVELS)} (got {detail!r})")
+    return detail
+
+
+def page_size(limit: Optional[int] = None) -> int:
+    """Số dòng mỗi trang: limit của client trong khoảng [1, MAX_PAGE_SIZE], mặc định RAW_PAGE_SIZE"""
+    if limit is None:
+        return RAW_PAGE_SIZE
+    return max(1, min(int(limit), MAX_PAGE_SIZE))
+
+
+def columns_for(table: str, detail: str, columns: Optional[List[str]] = None) -> Optional[List[str]]:
+    """Cột trả về của bảng (None = mọi cột)"""
+    if columns:
+        return list(columns)
+    return None if detail == 'full' else RAW_COLUMNS.get(table)
+
+
+def raw_tables(source: str, raw) -> Dict[str, List[Dict]]:
+    """raw_df_records của một nguồn theo bảng"""
+    if isinstance(raw, dict):
+        return {table: raw.get(table) or [] for table in SOURCE_TABLES.get(source, tuple(raw))}
+    return {source: raw or []}
+
+
+def encode_cursor(state: Dict[str, Any]) -> str:
+    data = json.dumps(state, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+def _is_int(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """Trạng thái trong cursor; ValueError nếu cursor không hợp lệ
+
+    Cursor do client gửi lại (không ký) nên mọi trường đều được kiểm tra: limit bị giới hạn
+    như limit của client, columns phải là None hoặc danh sách chuỗi.
+    """
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor") from None
+    columns = state.get('columns') if isinstance(state, dict) else None
+    if (not isinstance(state, dict) or state.get('table') not in TABLE_SOURCE
+            or state.get('detail') not in DETAIL_LEVELS
+            or not isinstance(state.get('user'), (str, int))
+            or not all(_is_int(state.get(key)) for key in ('year', 'month', 'limit', 'offset'))
+            or state['offset'] < 0
+            or not (columns is None or (isinstance(columns, list)
+                                        and all(isinstance(column, str) for column in columns)))):
+        raise ValueError("Invalid cursor")
+    state['limit'] = page_size(state['limit'])
+    return state
+
+
+def cursor_state(user_id: str, year: int, month: int, detail: str, limit: int,
+                 columns: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Phần chung của cursor các bảng trong một response (chưa có table / offset)"""
+    return {'user': user_id, 'year': year, 'month': month, 'detail': detail, 'limit': limit,
+            'columns': list(columns) if columns else None}
+
+
+def raw_page(rows: List[Dict], table: str, offset: int, state: Dict[str, Any]) -> Dict[str, Any]:
+    """Một trang của bảng raw: rows (đã chọn cột), total và next_cursor (None ở trang cuối)"""
+    end = offset + state['limit']
+    columns = columns_for(table, state['detail'], state.get('columns'))
+    page = rows[offset:end]
+    if columns is not None:
+        page = [{column: row[column] for column in columns if column in row} for row in page]
+    return {
+        'rows': page,
+        'total': len(rows),
+        'offset': offset,
+        'next_cursor': encode_cursor({**state, 'table': table, 'offset': end}) if end < len(rows) else None,
+    }
+
+
+def shape_section(source: str, entry, state: Dict[str, Any]) -> Dict[str, Any]:
+    """Section của một nguồn trong response get_base_data_by_name theo state['detail']
+
+    data: dữ liệu đã phân tích (không gồm raw_df_records); raw_data: trang đầu của các bảng
+    raw (list, hoặc dict theo bảng với checkin); raw_pages: tổng số dòng và cursor trang tiếp
+    theo của từng bảng.
+    """
+    raw = None
+    analyzed = entry
+    if isinstance(entry, dict) and 'raw_df_records' in entry:
+        raw = entry['raw_df_records']
+        analyzed = {k: v for k, v in entry.items() if k != 'raw_df_records'}
+    if state['detail'] == 'summary' and isinstance(analyzed, dict):
+        analyzed = {k: analyzed[k] for k in SUMMARY_FIELDS.get(source, analyzed) if k in analyzed}
+    if raw is None:
+        return {'data': analyzed, 'raw_data': None, 'raw_pages': {}}
+
+    tables = raw_tables(source, raw)
+    if state['detail'] == 'summary':
+        raw_pages = {
+            table: {'total': len(rows), 'offset': 0,
+                    'next_cursor': encode_cursor({**state, 'table': table, 'offset': 0}) if rows else None}
+            for table, rows in tables.items()
+        }
+        return {'data': analyzed, 'raw_data': None, 'raw_pages': raw_pages}
+
+    pages = {table: raw_page(rows, table, 0, state) for table, rows in tables.items()}
+    raw_data = {table: page.pop('rows') for table, page in pages.items()}
+    if not isinstance(raw, dict):
+        raw_data = raw_data[source]
+    return {'data': analyzed, 'raw_data': raw_data, 'raw_pages': pages}
@@ -0,0 +1,238 @@
+"""
+outbox - hộp thư đi bền vững: email đã dựng được lưu lại, bộ gửi riêng lấy ra gửi dần.
+
+Giai đoạn dựng báo cáo chỉ ghi email (HTML nén zlib) vào file SQLite rồi làm tiếp nhân viên
+sau; OutboxSender chạy song song, lấy email đến hạn ra gửi, lỗi thì thử lại với thời gian
+chờ tăng dần (OUTBOX_RETRY_BACKOFF, x2 mỗi lần) tối đa OUTBOX_MAX_ATTEMPTS lần. Gửi chậm
+không làm chậm phần dựng báo cáo, email gửi lỗi được gửi lại mà không phải dựng lại báo cáo.
+
+Trạng thái một email: pending -> sending -> sent | failed (hết số lần thử). Email đang
+'sending' khi process bị dừng được đưa lại về pending ở lần chạy sau (có thể gửi trùng
+email đó một lần).
+
+Cấu hình qua biến môi trường:
+    REPORT_OUTBOX_PATH     file SQLite (mặc định .report_outbox.sqlite3 cạnh source)
+    OUTBOX_MAX_ATTEMPTS    số lần gửi tối đa cho mỗi email trong một lượt chạy (mặc định 3)
+    OUTBOX_RETRY_BACKOFF   thời gian chờ trước lần gửi lại đầu tiên (giây, mặc định 30)
+"""
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Callable, List, NamedTuple, Optional
+
+OUTBOX_PATH = os.getenv('REPORT_OUTBOX_PATH',
+                        os.path.join(os.path.dirname(os.path.abspath(__file__)), '.report_outbox.sqlite3'))
+MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '3'))
+RETRY_BACKOFF = float(os.getenv('OUTBOX_RETRY_BACKOFF', '30'))
+
+# Khoảng thời gian tối đa worker ngủ giữa hai lần kiểm tra hộp thư
+POLL_INTERVAL = 0.5
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id          TEXT NOT NULL,
+    employee        TEXT NOT NULL,
+    to_email        TEXT NOT NULL,
+    subject         TEXT NOT NULL,
+    html            BLOB NOT NULL,
+    status          TEXT NOT NULL DEFAULT 'pending',
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    last_error      TEXT,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    created_at      REAL NOT NULL,
+    sent_at         REAL,
+    UNIQUE (run_id, employee)
+)
+"""
+
+
+class OutboxMessage(NamedTuple):
+    id: int
+    run_id: str
+    employee: str
+    to_email: str
+    subject: str
+    html: str
+    attempts: int
+
+
+class Outbox:
+    """Email đã dựng, chờ gửi, theo (run-id, nhân viên)"""
+
+    def __init__(self, path: str = OUTBOX_PATH, max_attempts: int = MAX_ATTEMPTS,
+                 retry_backoff: float = RETRY_BACKOFF):
+        self.path = path
+        self.max_attempts = max(1, max_attempts)
+        self.retry_backoff = retry_backoff
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+
+    def _execute(self, sql: str, params=()):
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            self._conn.commit()
+            return cursor
+
+    def put(self, run_id: str, employee: str, to_email: str, subject: str, html: str):
+        """Thêm (hoặc thay) email chờ gửi; email đã gửi của lượt chạy thì giữ nguyên"""
+        blob = zlib.compress(html.encode('utf-8'), 6)
+        self._execute(
+            """INSERT INTO outbox (run_id, employee, to_email, subject, html, created_at)
+               VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT (run_id, employee) DO UPDATE SET
+                   to_email = excluded.to_email, subject = excluded.subject, html = excluded.html,
+                   status = 'pending', attempts = 0, last_error = NULL, next_attempt_at = 0
+               WHERE outbox.status != 'sent'""",
+            (run_id, employee, to_email, subject, blob, time.time())
+        )
+
+    def status(self, run_id: str, employee: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status FROM outbox WHERE run_id = ? AND employee = ?", (run_id, employee)
+            ).fetchone()
+        return row[0] if row else None
+
+    def requeue(self, run_id: str) -> int:
+        """Đưa email chưa gửi được (failed / đang gửi dở) của lượt chạy về pending, trả về số email"""
+        cursor = self._execute(
+            """UPDATE outbox SET status = 'pending', attempts = 0, next_attempt_at = 0
+               WHERE run_id = ? AND status IN ('failed', 'sending')""",
+            (run_id,)
+        )
+        return cursor.rowcount
+
+    def claim(self, run_id: str) -> Optional[OutboxMessage]:
+        """Lấy một email đến hạn gửi và đánh dấu 'sending' (None nếu chưa có)"""
+        with self._lock:
+            row = self._conn.execute(
+                """SELECT id, run_id, employee, to_email, subject, html, attempts FROM outbox
+                   WHERE run_id = ? AND status = 'pending' AND next_attempt_at <= ?
+                   ORDER BY next_attempt_at, id LIMIT 1""",
+                (run_id, time.time())
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE outbox SET status = 'sending' WHERE id = ?", (row[0],))
+            self._conn.commit()
+        return OutboxMessage(row[0], row[1], row[2], row[3], row[4], zlib.decompress(row[5]).decode('utf-8'), row[6])
+
+    def mark_sent(self, message: OutboxMessage):
+        self._execute(
+            "UPDATE outbox SET status = 'sent', attempts = attempts + 1, last_error = NULL, sent_at = ? WHERE id = ?",
+            (time.time(), message.id)
+        )
+
+    def mark_failed(self, message: OutboxMessage, error: str) -> bool:
+        """Ghi nhận lần gửi lỗi; True nếu email còn được thử lại"""
+        attempts = message.attempts + 1
+        retry = attempts < self.max_attempts
+        self._execute(
+            "UPDATE outbox SET status = ?, attempts = ?, last_error = ?, next_attempt_at = ? WHERE id = ?",
+            ('pending' if retry else 'failed', attempts, error,
+             time.time() + self.retry_backoff * (2 ** (attempts - 1)), message.id)
+        )
+        return retry
+
+    def counts(self, run_id: str) -> dict:
+        """Số email theo trạng thái của lượt chạy"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM outbox WHERE run_id = ? GROUP BY status", (run_id,)
+            ).fetchall()
+        return dict(rows)
+
+    def next_due_in(self, run_id: str) -> Optional[float]:
+        """Số giây đến email pending gần nhất (None nếu không còn email pending)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(next_attempt_at) FROM outbox WHERE run_id = ? AND status = 'pending'", (run_id,)
+            ).fetchone()
+        return None if row[0] is None else max(0.0, row[0] - time.time())
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class OutboxSender:
+    """Các worker gửi email từ outbox, chạy song song với giai đoạn dựng báo cáo.
+
+    deliver(message) gửi một email, raise khi lỗi. on_sent(message) được gọi sau khi gửi
+    thành công (vd. ghi run journal).
+    """
+
+    def __init__(self, outbox: Outbox, run_id: str, deliver: Callable[[OutboxMessage], None],
+                 workers: int = 2, on_sent: Optional[Callable[[OutboxMessage], None]] = None):
+        self.outbox = outbox
+        self.run_id = run_id
+        self.deliver = deliver
+        self.on_sent = on_sent
+        self.sent: List[OutboxMessage] = []
+        self.failed: List[OutboxMessage] = []
+        self._results_lock = threading.Lock()
+        self._producing = True
+        self._wakeup = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._worker, name=f'outbox-sender-{n}', daemon=True)
+            for n in range(max(1, workers))
+        ]
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def notify(self):
+        """Báo có email mới trong outbox"""
+        self._wakeup.set()
+
+    def finish(self):
+        """Không còn email mới: gửi nốt (kể cả các lần thử lại) rồi dừng worker"""
+        self._producing = False
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join()
+
+    def _worker(self):
+        while True:
+            message = self.outbox.claim(self.run_id)
+            if message is None:
+                due_in = self.outbox.next_due_in(self.run_id)
+                if due_in is None:
+                    if not self._producing:
+                        return
+                    timeout = POLL_INTERVAL
+                elif self._producing:
+                    timeout = min(due_in, POLL_INTERVAL)
+                else:
+                    # Chỉ còn email chờ thử lại: ngủ đến lượt gửi lại gần nhất
+                    timeout = max(due_in, 0.01)
+                self._wakeup.wait(timeout=timeout)
+                self._wakeup.clear()
+                continue
+            self._send(message)
+
+    def _send(self, message: OutboxMessage):
+        try:
+            self.deliver(message)
+        except Exception as e:
+            retry = self.outbox.mark_failed(message, str(e))
+            if retry:
+                wait = self.outbox.retry_backoff * (2 ** message.attempts)
+                print(f"🔁 Gửi lỗi đến {message.to_email} ({e}), thử lại sau {wait:g}s.")
+            else:
+                print(f"❌ Gửi lỗi đến {message.to_email} sau {message.attempts + 1} lần thử: {e}")
+                with self._results_lock:
+                    self.failed.append(message)
+            return
+        self.outbox.mark_sent(message)
+        with self._results_lock:
+            self.sent.append(message)
+        if self.on_sent is not None:
+            self.on_sent(message)
@@ -0,0 +1,104 @@
+"""
+report_pipeline - chạy báo cáo cho nhiều nhân viên theo pipeline nhiều giai đoạn.
+
+Mỗi giai đoạn (vd. phân tích -> AI insight + HTML -> gửi email) có pool worker riêng,
+giữa các giai đoạn là hàng đợi có giới hạn nên giai đoạn nhanh không chạy quá xa giai đoạn
+chậm. Các giai đoạn đều chủ yếu chờ I/O (API Base.vn, LLM, SMTP) nên dùng thread.
+
+Hàm của giai đoạn nhận payload của giai đoạn trước và trả payload cho giai đoạn sau;
+trả về None để dừng item đó (bỏ qua). Lỗi của một item chỉ làm hỏng item đó.
+
+Cấu hình qua biến môi trường:
+    REPORT_QUEUE_SIZE          số item tối đa chờ giữa hai giai đoạn (mặc định 8)
+    REPORT_<STAGE>_WORKERS     số worker của giai đoạn (vd. REPORT_SEND_WORKERS, xem stage_workers)
+"""
+import os
+import queue
+import threading
+from typing import Any, Callable, List, NamedTuple, Optional
+
+QUEUE_SIZE = int(os.getenv('REPORT_QUEUE_SIZE', '8'))
+
+_DONE = object()
+
+
+class Stage(NamedTuple):
+    name: str
+    func: Callable[[Any], Any]
+    workers: int = 1
+
+
+class PipelineResult(NamedTuple):
+    completed: List[Any]
+    skipped: List[Any]
+    failed: List[Any]
+
+
+def run_pipeline(items, stages: List[Stage], queue_size: int = QUEUE_SIZE,
+                 on_error: Optional[Callable[[Any, str, Exception], None]] = None) -> PipelineResult:
+    """Chạy `items` qua các `stages`, trả về item đã hoàn tất / bị bỏ qua / bị lỗi.
+
+    on_error(item, stage_name, exc) được gọi trong khối except của worker (có thể dùng
+    traceback.print_exc()).
+    """
+    queues = [queue.Queue(maxsize=max(1, queue_size)) for _ in stages]
+    completed, skipped, failed = [], [], []
+    results_lock = threading.Lock()
+    remaining_workers = [max(1, stage.workers) for stage in stages]
+    remaining_lock = threading.Lock()
+
+    def finish_stage(index: int):
+        # Worker cuối cùng của giai đoạn báo cho từng worker của giai đoạn sau
+        with remaining_lock:
+            remaining_workers[index] -= 1
+            last = remaining_workers[index] == 0
+        if last and index + 1 < len(stages):
+            for _ in range(remaining_workers[index + 1]):
+                queues[index + 1].put(_DONE)
+
+    def worker(index: int):
+        stage = stages[index]
+        while True:
+            entry = queues[index].get()
+            if entry is _DONE:
+                break
+            item, payload = entry
+            try:
+                result = stage.func(payload)
+            except Exception as e:
+                with results_lock:
+                    failed.append(item)
+                if on_error:
+                    on_error(item, stage.name, e)
+                continue
+            if result is None:
+                with results_lock:
+                    skipped.append(item)
+            elif index + 1 < len(stages):
+                queues[index + 1].put((item, result))
+            else:
+                with results_lock:
+                    completed.append(item)
+        finish_stage(index)
+
+    threads = [
+        threading.Thread(target=worker, args=(index,), name=f'report-{stage.name}-{n}', daemon=True)
+        for index, stage in enumerate(stages)
+        for n in range(max(1, stage.workers))
+    ]
+    for thread in threads:
+        thread.start()
+
+    for item in items:
+        queues[0].put((item, item))
+    for _ in range(max(1, stages[0].workers)):
+        queues[0].put(_DONE)
+
+    for thread in threads:
+        thread.join()
+    return PipelineResult(completed, skipped, failed)
+
+
+def stage_workers(name: str, default: int) -> int:
+    """Số worker của giai đoạn `name` (biến môi trường REPORT_<NAME>_WORKERS)"""
+    return max(1, int(os.getenv(f'REPORT_{name.upper()}_WORKERS', str(default))))
@@ -0,0 +1,116 @@
+"""
+run_journal - nhật ký lượt gửi báo cáo để chạy lại được từ chỗ bị dừng.
+
+Mỗi lượt chạy có một run-id (mặc định là ngày chạy theo giờ HCM). Với từng nhân viên,
+journal ghi lại giai đoạn đã hoàn tất (analyze -> render -> send) cùng kết quả trung gian
+(dữ liệu đã phân tích, HTML đã dựng) trong một file SQLite. Khi chạy lại cùng run-id:
+nhân viên đã gửi email được bỏ qua, nhân viên đã có HTML chỉ còn gửi, nhân viên đã có dữ
+liệu chỉ còn dựng HTML + gửi - không tải lại dữ liệu, không tốn thêm token LLM, không gửi trùng.
+
+Cấu hình qua biến môi trường:
+    REPORT_JOURNAL_PATH     file SQLite (mặc định .report_journal.sqlite3 cạnh source)
+    REPORT_JOURNAL_DISABLE  =1 để tắt journal
+    REPORT_RUN_ID           run-id (hoặc cờ --run-id=<id>); đổi run-id để chạy lại từ đầu
+"""
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Optional, Set
+
+import pytz
+
+JOURNAL_PATH = os.getenv('REPORT_JOURNAL_PATH',
+                         os.path.join(os.path.dirname(os.path.abspath(__file__)), '.report_journal.sqlite3'))
+DISABLED = os.getenv('REPORT_JOURNAL_DISABLE') == '1'
+
+STAGES = ('analyze', 'render', 'send')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS journal (
+    run_id     TEXT NOT NULL,
+    employee   TEXT NOT NULL,
+    stage      TEXT NOT NULL,
+    artifact   BLOB,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (run_id, employee, stage)
+)
+"""
+
+
+def default_run_id() -> str:
+    """Run-id: cờ --run-id=<id>, biến REPORT_RUN_ID, hoặc ngày hôm nay (giờ HCM)"""
+    for arg in sys.argv[1:]:
+        if arg.startswith('--run-id='):
+            return arg.split('=', 1)[1]
+    return os.getenv('REPORT_RUN_ID') or datetime.now(pytz.timezone('Asia/Ho_Chi_Minh')).strftime('%Y-%m-%d')
+
+
+class RunJournal:
+    """Giai đoạn đã hoàn tất + kết quả trung gian theo (run-id, nhân viên)"""
+
+    def __init__(self, run_id: Optional[str] = None, path: str = JOURNAL_PATH, enabled: bool = not DISABLED):
+        self.run_id = run_id or default_run_id()
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._conn = None
+        if self.enabled:
+            try:
+                self._conn = sqlite3.connect(path, check_same_thread=False)
+                self._conn.execute(_SCHEMA)
+                self._conn.commit()
+            except sqlite3.Error as e:
+                print(f"⚠️ Không mở được run journal ({path}): {e}. Chạy không có journal.")
+                self.enabled = False
+                self._conn = None
+
+    def completed_stages(self, employee: str) -> Set[str]:
+        if not self.enabled:
+            return set()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT stage FROM journal WHERE run_id = ? AND employee = ?", (self.run_id, employee)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def is_done(self, employee: str, stage: str) -> bool:
+        return stage in self.completed_stages(employee)
+
+    def load(self, employee: str, stage: str) -> Any:
+        """Kết quả trung gian của giai đoạn (None nếu chưa có hoặc không đọc được)"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT artifact FROM journal WHERE run_id = ? AND employee = ? AND stage = ?",
+                (self.run_id, employee, stage)
+            ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        try:
+            return pickle.loads(row[0])
+        except Exception as e:
+            print(f"⚠️ Không đọc được kết quả '{stage}' của {employee} trong journal: {e}")
+            return None
+
+    def record(self, employee: str, stage: str, artifact: Any = None):
+        """Ghi nhận giai đoạn đã hoàn tất (kèm kết quả trung gian nếu có)"""
+        if not self.enabled:
+            return
+        blob = pickle.dumps(artifact, protocol=pickle.HIGHEST_PROTOCOL) if artifact is not None else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO journal (run_id, employee, stage, artifact, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (self.run_id, employee, stage, blob, time.time())
+            )
+            self._conn.commit()
+
+    def close(self):
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
+                self._conn = None
+            self.enabled = False
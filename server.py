@@ -1,16 +1,15 @@
 from datetime import datetime, date
+from collections import OrderedDict
+import asyncio
 import json
 import os
-import requests
-import unicodedata
-from typing import Dict, Any, Optional
+import threading
+import time
+import mcp_payload
+from user_directory import get_directory
+from typing import Dict, Any, List, Optional
 from dotenv import load_dotenv
 from fastmcp import FastMCP
-from wework import get_wework_data
-from workflow import get_workflow_data
-from goal import get_goal_data
-from checkin_timeoff import get_checkin_data, ACCOUNT_TOKEN
-from inside import get_inside_data
 
 load_dotenv()
 
@@ -18,55 +17,162 @@ mcp = FastMCP(
     name="base-vn-assistant",
 )
 
-def normalize_search_name(name):
-    """Chuẩn hóa tên để tìm kiếm (lowercase, NFC)"""
-    if not name: return ""
-    return unicodedata.normalize('NFC', name).strip().lower()
+# Cache kết quả get_base_data_by_name theo (user id, năm, tháng, nguồn), TTL riêng cho từng nguồn.
+# Checkin của tháng đã qua hầu như không đổi nên được giữ lâu hơn (MCP_CACHE_TTL_PAST_MONTH).
+SOURCE_TTL = {
+    'checkin': float(os.getenv('MCP_CACHE_TTL_CHECKIN', '300')),
+    'wework': float(os.getenv('MCP_CACHE_TTL_WEWORK', '600')),
+    'goal': float(os.getenv('MCP_CACHE_TTL_GOAL', '1800')),
+    'workflow': float(os.getenv('MCP_CACHE_TTL_WORKFLOW', '600')),
+    'inside': float(os.getenv('MCP_CACHE_TTL_INSIDE', '900')),
+}
+PAST_MONTH_TTL = float(os.getenv('MCP_CACHE_TTL_PAST_MONTH', '3600'))
+# Các hàm get_*_data trả về None khi tải lỗi (lỗi đã được nuốt): chỉ giữ kết quả rỗng trong thời gian ngắn
+EMPTY_RESULT_TTL = float(os.getenv('MCP_CACHE_TTL_EMPTY', '30'))
+MONTH_SOURCES = {'checkin'}
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('MCP_CACHE_MAX_ENTRIES', '256'))
+RESPONSE_CACHE_DISABLED = os.getenv('MCP_CACHE_DISABLE') == '1'
+
+def source_ttl(source: str, year: int, month: int) -> float:
+    """TTL of a cached source result for the requested month."""
+    ttl = SOURCE_TTL.get(source, 0)
+    today = date.today()
+    if source in MONTH_SOURCES and (year, month) < (today.year, today.month):
+        ttl = max(ttl, PAST_MONTH_TTL)
+    return ttl
+
+class ResponseCache:
+    """
+    In-memory LRU cache of per-source results with TTL and single-flight loading: concurrent
+    requests for the same key share one load, failed loads are not cached. A None result
+    (the source wrappers return None on failure) is kept for at most EMPTY_RESULT_TTL.
+    Must be used from a single event loop (the MCP server loop).
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max(1, max_entries)
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[tuple, tuple]' = OrderedDict()  # key -> (expires_at, value)
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    async def get_or_load(self, key: tuple, ttl: float, loader, refresh: bool = False):
+        """Cached value of `key`, or the result of `await loader()` (shared by concurrent callers)."""
+        if not refresh:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(loader())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._store(key, ttl, done))
+        # shield: a cancelled caller does not cancel the load shared with other callers
+        return await asyncio.shield(task)
+
+    def _store(self, key: tuple, ttl: float, task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if task.cancelled() or task.exception() is not None:
+            return
+        if task.result() is None:
+            ttl = min(ttl, EMPTY_RESULT_TTL)
+        if ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, task.result())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+response_cache = ResponseCache()
+
+def _load_base_async():
+    """Import base_async on demand: it pulls in pandas and every Base.vn module, which would
+    otherwise delay the first MCP response (preloaded in the background by __main__)."""
+    import base_async
+    return base_async
 
 def fetch_all_users() -> list:
-    """Helper to fetch all users from Account API."""
-    try:
-        url = "https://account.base.vn/extapi/v1/users"
-        payload = {'access_token': ACCOUNT_TOKEN}
-        headers = {'Content-Type': 'application/x-www-form-urlencoded'}
-        
-        response = requests.post(url, headers=headers, data=payload, timeout=30)
-        
-        if response.status_code == 200:
-            response_json = response.json()
-            if isinstance(response_json, list):
-                return response_json
-            elif isinstance(response_json, dict):
-                return response_json.get('users', [])
-    except Exception as e:
-        print(f"Error fetching users: {e}")
-    return []
+    """Helper to get all users from the shared UserDirectory (Account API, TTL-cached)."""
+    return get_directory().users
+
+async def fetch_all_users_async() -> list:
+    """Async variant of fetch_all_users (directory refresh runs off the event loop)."""
+    directory = await asyncio.to_thread(get_directory)
+    return directory.users
+
+def _user_info(user: Optional[Dict[str, Any]]) -> Optional[Dict[str, str]]:
+    if not user:
+        return None
+    return {
+        'name': user.get('name', ''),
+        'username': user.get('username', ''),
+        'id': str(user.get('id', ''))
+    }
 
 def find_user_info_by_name(target_name: str) -> Optional[Dict[str, str]]:
     """
-    Find user info (username, name) via Account API using name.
+    Find user info (username, name, id) by name via the UserDirectory name index.
     """
-    target_normalized = normalize_search_name(target_name)
-    user_list = fetch_all_users()
-    
-    # Find best match
-    for user in user_list:
-        u_name = user.get('name', '')
-        if normalize_search_name(u_name) == target_normalized:
-            return {
-                'name': u_name,
-                'username': user.get('username', ''),
-                'id': str(user.get('id', ''))
-            }
-            
-    # Relaxation: partial match if exact match fail? 
-    # For now stick to exact normalized match to be safe.
-    return None
+    return _user_info(get_directory().by_name(target_name))
+
+async def find_user_info_by_name_async(target_name: str) -> Optional[Dict[str, str]]:
+    """Async variant of find_user_info_by_name."""
+    directory = await asyncio.to_thread(get_directory)
+    return _user_info(directory.by_name(target_name))
+
+async def find_user_info_by_id_async(user_id: str) -> Optional[Dict[str, str]]:
+    """Resolve the user a pagination cursor was issued for."""
+    directory = await asyncio.to_thread(get_directory)
+    return _user_info(directory.by_id(user_id))
+
+async def fetch_sources(user_info: Dict[str, str], year: int, month: int,
+                        sources: Optional[List[str]] = None, refresh: bool = False) -> Dict[str, Any]:
+    """
+    Analyzed result of each requested source (all five by default), fetched concurrently
+    through the response cache. A failed source maps to None.
+    """
+    full_name = user_info['name']
+    username = user_info['username']
+    base_async = await asyncio.to_thread(_load_base_async)
+    loaders = {
+        "checkin": lambda: base_async.get_checkin_data(full_name, year, month),
+        "wework": lambda: base_async.get_wework_data(username),
+        "goal": lambda: base_async.get_goal_data(full_name),
+        "workflow": lambda: base_async.get_workflow_data(full_name),
+        "inside": lambda: base_async.get_inside_data(full_name),
+    }
+    module_keys = sources or list(loaders)
+    if RESPONSE_CACHE_DISABLED:
+        fetches = [loaders[key]() for key in module_keys]
+    else:
+        fetches = [
+            response_cache.get_or_load((user_info['id'], year, month, key), source_ttl(key, year, month),
+                                       loaders[key], refresh=refresh)
+            for key in module_keys
+        ]
+    results = await asyncio.gather(*fetches, return_exceptions=True)
+    # Lỗi của một nguồn được coi là không có dữ liệu, các nguồn khác vẫn trả về bình thường
+    return {
+        key: None if isinstance(result, Exception) else result
+        for key, result in zip(module_keys, results)
+    }
 
 @mcp.resource("base://employees")
-def get_employees() -> list:
+async def get_employees() -> list:
     """Returns a list of all employees and their information."""
-    return fetch_all_users()
+    return await fetch_all_users_async()
 
 
 
@@ -86,14 +192,19 @@ docstring = """
     The returned data is a dictionary containing:
         - user_info: Basic user details resolved from the Name (username, id, email).
         - section: Dữ liệu đã phân tích cho từng module (checkin, wework, goal, workflow, inside),
-                   gồm data (đầu vào content box) và raw_data (raw_df_records). Không trả về HTML.
-                   Chỉ trả section, bỏ sources_with_raw để giảm payload.
+                   gồm data (đầu vào content box), raw_data (trang đầu của raw_df_records, chỉ
+                   dữ liệu của nhân viên này) và raw_pages (total + next_cursor cho từng bảng raw).
+                   Không trả về HTML. Lấy các trang raw tiếp theo bằng tool get_base_raw_rows.
 
     Args:
         name: Full name of the employee (e.g., 'Ngô Thị Thủy', 'Phạm Thanh Tùng').
               The tool automatically resolves this to the system username.
         year: Year for data context (e.g., 2024, 2025). Defaults to current system expectation.
         month: Month for data context (1-12). Defaults to current system expectation.
+        refresh: Bypass the server's short-lived result cache and fetch fresh data.
+        detail: "summary" (only summary metrics, no raw rows), "standard" (default: analyzed data
+                plus the first page of raw rows with key columns) or "full" (all raw columns).
+        page_size: Raw rows per table in this response (defaults to MCP_RAW_PAGE_SIZE).
 
     Returns:
         A JSON-serializable dictionary with aggregated data from all sources.
@@ -107,6 +218,36 @@ docstring = """
         
         >>> # Get report for specific time
         >>> result = get_base_data_by_name("Ngô Thị Thủy", year=2024, month=11)
+
+        >>> # Only the headline numbers
+        >>> result = get_base_data_by_name("Ngô Thị Thủy", detail="summary")
+"""
+
+raw_rows_docstring = """
+    Page through the raw rows behind get_base_data_by_name, one table at a time.
+
+    Raw tables: checkin, timeoff (Base Checkin), wework, goal, workflow, inside. Each holds only
+    the requested employee's rows for the month.
+
+    Args:
+        cursor: next_cursor from get_base_data_by_name (section.<module>.raw_pages.<table>) or from
+                a previous call of this tool. When given, name/table/year/month/detail are taken
+                from the cursor.
+        name: Full name of the employee (to start from the first page without a cursor).
+        table: Raw table to read (to start without a cursor).
+        year: Year for data context.
+        month: Month for data context (1-12).
+        detail: "standard" (key columns) or "full" (all columns).
+        limit: Rows per page (defaults to MCP_RAW_PAGE_SIZE, capped at MCP_RAW_MAX_PAGE_SIZE).
+        columns: Explicit list of columns to return (overrides detail).
+
+    Returns:
+        {"user_info", "table", "rows", "total", "offset", "next_cursor"}; next_cursor is null on
+        the last page.
+
+    Examples:
+        >>> page = get_base_raw_rows(cursor=result["section"]["checkin"]["raw_pages"]["checkin"]["next_cursor"])
+        >>> page = get_base_raw_rows(name="Ngô Thị Thủy", table="wework", columns=["name", "deadline"])
 """
 
 @mcp.tool(
@@ -121,72 +262,32 @@ docstring = """
 async def get_base_data_logic(
     name: str,
     year: int = 2025,
-    month: int = 12
+    month: int = 12,
+    refresh: bool = False,
+    detail: str = "standard",
+    page_size: Optional[int] = None
 ) -> Dict[str, Any]:
-    
+    try:
+        detail = mcp_payload.check_detail(detail)
+    except ValueError as e:
+        return {"error": str(e)}
+
     # 1. Resolve User
-    user_info = find_user_info_by_name(name)
+    user_info = await find_user_info_by_name_async(name)
     if not user_info:
         return {
             "error": f"Could not find employee with name: {name}. Please check exact spelling."
         }
     
-    full_name = user_info['name']
-    username = user_info['username']
-    
-    # 2. Fetch Data from all sources
-    raw_results = {}
-    
-    # Checkin
-    try:
-        raw_results["checkin"] = get_checkin_data(full_name, year, month)
-    except Exception as e:
-        raw_results["checkin"] = None # Treat error as no data for formatting, or handle gracefully
+    # 2. Fetch Data from all sources (đồng thời, không chặn event loop; kết quả còn hạn lấy từ cache)
+    raw_results = await fetch_sources(user_info, year, month, refresh=refresh)
 
-    # WeWork
-    try:
-        raw_results["wework"] = get_wework_data(username)
-    except Exception as e:
-        raw_results["wework"] = None
-
-    # Goal
-    try:
-        raw_results["goal"] = get_goal_data(full_name)
-    except Exception as e:
-        raw_results["goal"] = None
-
-    # Workflow
-    try:
-        raw_results["workflow"] = get_workflow_data(full_name)
-    except Exception as e:
-        raw_results["workflow"] = None
-
-    # Inside
-    try:
-        raw_results["inside"] = get_inside_data(full_name)
-    except Exception as e:
-        raw_results["inside"] = None
-
-    # 3. Kết hợp dữ liệu (không trả về HTML)
-    module_keys = ["checkin", "wework", "goal", "workflow", "inside"]
-    section_data = {}
-
-    for key in module_keys:
-        raw_entry = raw_results.get(key)
-        raw_data_payload = None
-        analyzed_payload = raw_entry
-
-        if isinstance(raw_entry, dict) and "raw_df_records" in raw_entry:
-            raw_data_payload = raw_entry.get("raw_df_records")
-            analyzed_payload = {k: v for k, v in raw_entry.items() if k != "raw_df_records"}
-        else:
-            raw_data_payload = raw_entry
-
-        # Section payload: analyzed data + raw data (không HTML)
-        section_data[key] = {
-            "data": analyzed_payload,
-            "raw_data": raw_data_payload
-        }
+    # 3. Kết hợp dữ liệu (không trả về HTML); raw_data chỉ gồm trang đầu theo mức chi tiết
+    state = mcp_payload.cursor_state(user_info['id'], year, month, detail, mcp_payload.page_size(page_size))
+    section_data = {
+        key: mcp_payload.shape_section(key, raw_entry, state)
+        for key, raw_entry in raw_results.items()
+    }
 
     final_response = {
         "user_info": user_info,
@@ -207,9 +308,68 @@ async def get_base_data_logic(
 async def get_base_data_by_name(
     name: str,
     year: int = 2025,
-    month: int = 12
+    month: int = 12,
+    refresh: bool = False,
+    detail: str = "standard",
+    page_size: Optional[int] = None
+) -> Dict[str, Any]:
+    return await get_base_data_logic(name, year, month, refresh, detail, page_size)
+
+@mcp.tool(
+    name="get_base_raw_rows",
+    description=raw_rows_docstring,
+    annotations={
+        "readOnlyHint": True,
+        "destructiveHint": False,
+        "openWorldHint": True
+    }
+)
+async def get_base_raw_rows(
+    cursor: Optional[str] = None,
+    name: Optional[str] = None,
+    table: Optional[str] = None,
+    year: int = 2025,
+    month: int = 12,
+    detail: str = "standard",
+    limit: Optional[int] = None,
+    columns: Optional[List[str]] = None
 ) -> Dict[str, Any]:
-    return await get_base_data_logic(name, year, month)
+    try:
+        if cursor:
+            state = mcp_payload.decode_cursor(cursor)
+        elif name and table in mcp_payload.TABLE_SOURCE:
+            state = mcp_payload.cursor_state(None, year, month, mcp_payload.check_detail(detail),
+                                             mcp_payload.page_size())
+            state.update(table=table, offset=0)
+        else:
+            return {
+                "error": "Pass a cursor, or a name and one of the tables: " + ", ".join(mcp_payload.TABLE_SOURCE)
+            }
+        if limit is not None:
+            state['limit'] = mcp_payload.page_size(limit)
+        if columns:
+            state['columns'] = list(columns)
+    except ValueError as e:
+        return {"error": str(e)}
+
+    if cursor:
+        user_info = await find_user_info_by_id_async(state['user'])
+    else:
+        user_info = await find_user_info_by_name_async(name)
+    if not user_info:
+        return {"error": f"Could not find employee: {name or state['user']}."}
+    state['user'] = user_info['id']
+
+    # Trang được cắt từ kết quả đã cache của get_base_data_by_name (tải lại nếu đã hết hạn)
+    table = state['table']
+    source = mcp_payload.TABLE_SOURCE[table]
+    entry = (await fetch_sources(user_info, state['year'], state['month'], [source]))[source]
+    raw = entry.get('raw_df_records') if isinstance(entry, dict) else None
+    rows = mcp_payload.raw_tables(source, raw).get(table, [])
+    page = mcp_payload.raw_page(rows, table, state['offset'],
+                                {k: v for k, v in state.items() if k not in ('table', 'offset')})
+    return {"user_info": user_info, "table": table, **page}
 
 if __name__ == '__main__':
+    threading.Thread(target=_load_base_async, name='preload-base-async', daemon=True).start()
     mcp.run()
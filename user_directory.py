@@ -0,0 +1,211 @@
+"""
+user_directory - danh bạ user Base.vn dùng chung cho cả process.
+
+Thay cho việc mỗi module tự gọi Account API rồi duyệt tuần tự để tìm nhân viên,
+UserDirectory tải danh sách user (users) và thành viên nhóm văn phòng (group/get) một lần,
+tự làm mới khi quá TTL, và tra cứu O(1) theo id, username, email và tên
+(NFC + lowercase, có fallback bỏ dấu tiếng Việt).
+
+Cấu hình qua biến môi trường:
+    USER_DIRECTORY_TTL  thời gian (giây) trước khi tải lại danh bạ (mặc định 3600)
+"""
+import os
+import threading
+import time
+import unicodedata
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+import base_http
+
+load_dotenv()
+
+ACCOUNT_ACCESS_TOKEN = os.getenv('ACCOUNT_ACCESS_TOKEN')
+USER_DIRECTORY_TTL = int(os.getenv('USER_DIRECTORY_TTL', '3600'))
+RETRY_AFTER_FAILURE = 60
+OFFICE_GROUP_PATH = "nvvanphong"
+
+
+def normalize_name(name: str) -> str:
+    """Chuẩn hóa tên để so khớp (NFC, bỏ khoảng trắng thừa, lowercase)"""
+    if not name:
+        return ""
+    return ' '.join(unicodedata.normalize('NFC', str(name)).split()).lower()
+
+
+def strip_diacritics(name: str) -> str:
+    """Tên đã chuẩn hóa và bỏ dấu tiếng Việt (đ -> d)"""
+    decomposed = unicodedata.normalize('NFD', normalize_name(name))
+    stripped = ''.join(ch for ch in decomposed if unicodedata.category(ch) != 'Mn')
+    return stripped.replace('đ', 'd')
+
+
+class UserDirectory:
+    """Danh bạ user với các index theo id / username / email / tên"""
+
+    def __init__(self, users: Optional[List[Dict]] = None, members: Optional[List[Dict]] = None,
+                 ttl: int = USER_DIRECTORY_TTL):
+        self.ttl = ttl
+        self.loaded_at = 0.0
+        self._lock = threading.RLock()
+        self._users: List[Dict] = []
+        self._members: List[Dict] = []
+        self._by_id: Dict[str, Dict] = {}
+        self._by_username: Dict[str, Dict] = {}
+        self._by_email: Dict[str, Dict] = {}
+        self._by_name: Dict[str, Dict] = {}
+        # Tên không dấu -> mọi bản ghi có tên đó (nhiều người có thể chỉ khác nhau ở dấu)
+        self._by_plain_name: Dict[str, List[Dict]] = {}
+        if users is not None or members is not None:
+            self._build(users or [], members or [])
+            self.loaded_at = time.time()
+
+    # ------------------------------------------------------------------
+    # Tải dữ liệu
+    # ------------------------------------------------------------------
+    def _auth_data(self) -> Dict:
+        key = "access_token_v2" if "~" in (ACCOUNT_ACCESS_TOKEN or '') else "access_token"
+        return {key: ACCOUNT_ACCESS_TOKEN}
+
+    def _fetch(self):
+        """(users, members); members là None nếu không tải được nhóm văn phòng"""
+        response = base_http.post("https://account.base.vn/extapi/v1/users", data=self._auth_data(), timeout=30)
+        response.raise_for_status()
+        users_json = response.json()
+        if isinstance(users_json, list):
+            users = users_json
+        else:
+            users = users_json.get('users', [])
+
+        # Lỗi nhóm văn phòng không làm mất danh bạ user: các index vẫn dựng từ users
+        try:
+            response = base_http.post("https://account.base.vn/extapi/v1/group/get",
+                                      data={**self._auth_data(), "path": OFFICE_GROUP_PATH}, timeout=30)
+            response.raise_for_status()
+            members = response.json().get('group', {}).get('members', [])
+        except Exception as e:
+            print(f"⚠️ Lỗi khi tải nhóm {OFFICE_GROUP_PATH}: {e}")
+            members = None
+        return users, members
+
+    def is_stale(self) -> bool:
+        return time.time() - self.loaded_at > self.ttl
+
+    def refresh(self, force: bool = False) -> 'UserDirectory':
+        """Tải lại danh bạ nếu đã quá TTL (hoặc force)"""
+        if not force and not self.is_stale():
+            return self
+        with self._lock:
+            if not force and not self.is_stale():
+                return self
+            try:
+                users, members = self._fetch()
+                self._build(users, members or [])
+                self.loaded_at = time.time()
+                if members is None:
+                    # Thiếu thành viên nhóm: thử tải lại sớm thay vì chờ hết TTL
+                    self.loaded_at -= self.ttl - RETRY_AFTER_FAILURE
+            except Exception as e:
+                print(f"⚠️ Lỗi khi tải danh bạ user: {e}")
+                # Giữ dữ liệu cũ, thử lại sau RETRY_AFTER_FAILURE giây
+                self.loaded_at = time.time() - self.ttl + RETRY_AFTER_FAILURE
+        return self
+
+    def _build(self, users: List[Dict], members: List[Dict]):
+        by_id: Dict[str, Dict] = {}
+        for user in users:
+            user_id = str(user.get('id', ''))
+            if user_id:
+                by_id[user_id] = {**user, 'id': user_id}
+
+        # Thành viên nhóm văn phòng có thêm title/since, gộp vào bản ghi user tương ứng
+        member_records = []
+        for member in members:
+            member_id = str(member.get('id', ''))
+            if not member_id:
+                continue
+            record = {**by_id.get(member_id, {}), **member, 'id': member_id}
+            by_id[member_id] = record
+            member_records.append(record)
+
+        by_username, by_email, by_name, by_plain_name = {}, {}, {}, {}
+        # Duyệt ngược để bản ghi xuất hiện đầu tiên được giữ khi trùng khóa
+        for record in reversed(list(by_id.values())):
+            if record.get('username'):
+                by_username[str(record['username']).strip().lower()] = record
+            if record.get('email'):
+                by_email[str(record['email']).strip().lower()] = record
+            if record.get('name'):
+                by_name[normalize_name(record['name'])] = record
+                by_plain_name.setdefault(strip_diacritics(record['name']), []).append(record)
+
+        self._users = list(by_id.values())
+        self._members = member_records
+        self._by_id, self._by_username, self._by_email = by_id, by_username, by_email
+        self._by_name, self._by_plain_name = by_name, by_plain_name
+
+    # ------------------------------------------------------------------
+    # Tra cứu
+    # ------------------------------------------------------------------
+    def by_id(self, user_id) -> Optional[Dict]:
+        if user_id is None:
+            return None
+        return self._by_id.get(str(user_id))
+
+    def by_username(self, username: str) -> Optional[Dict]:
+        if not username:
+            return None
+        return self._by_username.get(str(username).strip().lower())
+
+    def by_email(self, email: str) -> Optional[Dict]:
+        if not email:
+            return None
+        return self._by_email.get(str(email).strip().lower())
+
+    def by_name(self, name: str) -> Optional[Dict]:
+        """Tìm theo tên: khớp chính xác (NFC, lowercase) rồi tới khớp không dấu
+
+        Khớp không dấu chỉ dùng khi đúng một người có tên đó; nhiều người chỉ khác nhau ở dấu
+        (vd. "Đức" / "Dục") thì trả về None thay vì đoán.
+        """
+        if not name:
+            return None
+        record = self._by_name.get(normalize_name(name))
+        if record is not None:
+            return record
+        candidates = self._by_plain_name.get(strip_diacritics(name), [])
+        return candidates[0] if len(candidates) == 1 else None
+
+    def find(self, query: str) -> Optional[Dict]:
+        """Tìm theo username, email hoặc tên"""
+        return self.by_username(query) or self.by_email(query) or self.by_name(query)
+
+    # ------------------------------------------------------------------
+    # Dạng dữ liệu cho code cũ
+    # ------------------------------------------------------------------
+    @property
+    def users(self) -> List[Dict]:
+        return self._users
+
+    @property
+    def members(self) -> List[Dict]:
+        """Thành viên nhóm văn phòng (nvvanphong)"""
+        return self._members
+
+    def id_to_name(self) -> Dict[str, str]:
+        return {uid: user['name'] for uid, user in self._by_id.items() if user.get('name')}
+
+
+_directory: Optional[UserDirectory] = None
+_directory_lock = threading.Lock()
+
+
+def get_directory() -> UserDirectory:
+    """Danh bạ dùng chung của process (tải lần đầu, tự làm mới khi quá TTL)"""
+    global _directory
+    if _directory is None:
+        with _directory_lock:
+            if _directory is None:
+                _directory = UserDirectory()
+    return _directory.refresh()
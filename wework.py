@@ -1,5 +1,7 @@
 
 import requests
+import base_http
+from user_directory import get_directory
 import pandas as pd
 from datetime import datetime, timedelta
 import json
@@ -83,20 +85,19 @@ class WeWorkAPIClient:
     def _make_request(self, url: str, data: Dict[str, Any]) -> requests.Response:
         """Make HTTP request with error handling"""
         try:
-            response = requests.post(url, data=data, timeout=REQUEST_TIMEOUT)
+            response = base_http.post(url, data=data, timeout=REQUEST_TIMEOUT)
             response.raise_for_status()
             return response
         except requests.exceptions.RequestException as e:
             raise Exception(f"API request failed: {e}")
 
     def get_filtered_members(self) -> pd.DataFrame:
-        """Get filtered members from account API"""
-        url = "https://account.base.vn/extapi/v1/group/get"
-        data = {**self._get_account_auth_data(), "path": "nvvanphong"}
-
-        response = self._make_request(url, data)
-        response_data = response.json()
+        """Get filtered members (nhóm nvvanphong) from the shared UserDirectory"""
+        return self.parse_members({'group': {'members': get_directory().members}})
 
+    @staticmethod
+    def parse_members(response_data: Dict[str, Any]) -> pd.DataFrame:
+        """Parse group/get response into members DataFrame"""
         members = response_data.get('group', {}).get('members', [])
 
         df = pd.DataFrame([
@@ -669,8 +670,35 @@ def get_wework_auth_data():
     key = "access_token_v2" if "~" in WEWORK_ACCESS_TOKEN else "access_token"
     return {key: WEWORK_ACCESS_TOKEN}
 
-def get_wework_data(username):
-    """Lấy dữ liệu WeWork - Tất cả task trong 1 tháng gần đây (Sử dụng API /user/tasks)"""
+def load_project_map() -> Dict[str, str]:
+    """Tải mapping project/department id -> tên (dữ liệu chung cho mọi nhân viên)"""
+    projects_url = "https://wework.base.vn/extapi/v3/project/list"
+    p_response = base_http.post(projects_url, data=get_wework_auth_data(), timeout=30)
+    
+    # Lấy thêm departments
+    depts_url = "https://wework.base.vn/extapi/v3/department/list"
+    d_response = base_http.post(depts_url, data=get_wework_auth_data(), timeout=30)
+    
+    return build_project_map(p_response.json(), d_response.json())
+
+def build_project_map(p_data: Dict, d_data: Dict) -> Dict[str, str]:
+    """Dựng mapping id -> tên từ response project/list và department/list"""
+    projects = p_data.get('projects', [])
+    project_map = {str(p['id']): p['name'] for p in projects}
+    
+    depts = d_data.get('departments', [])
+    for d in depts:
+        project_map[str(d['id'])] = d['name']
+    
+    return project_map
+
+def get_wework_data(username, members_df: Optional[pd.DataFrame] = None, project_map: Optional[Dict[str, str]] = None,
+                    all_tasks: Optional[List[Dict]] = None):
+    """Lấy dữ liệu WeWork - Tất cả task trong 1 tháng gần đây (Sử dụng API /user/tasks)
+
+    members_df / project_map: dữ liệu dùng chung đã tải sẵn (BaseSnapshot), nếu có.
+    all_tasks: kết quả /user/tasks của nhân viên đã tải sẵn (base_async), nếu có.
+    """
     try:
         print(f"\n🔄 Đang tải dữ liệu WeWork cho {username}...")
         api_client = WeWorkAPIClient(WEWORK_ACCESS_TOKEN, ACCOUNT_ACCESS_TOKEN)
@@ -682,8 +710,11 @@ def get_wework_data(username):
         print(f"📅 Khoảng thời gian: {start_date.strftime('%d/%m/%Y')} đến {end_date.strftime('%d/%m/%Y')}")
         
         # Lấy danh sách nhân viên để lấy user_id
-        print("📋 Đang lấy danh sách nhân viên...")
-        employees_df = api_client.get_filtered_members()
+        if members_df is not None:
+            employees_df = members_df
+        else:
+            print("📋 Đang lấy danh sách nhân viên...")
+            employees_df = api_client.get_filtered_members()
         
         # Kiểm tra username có trong danh sách không
         employee_info = employees_df[employees_df['username'] == username]
@@ -700,47 +731,36 @@ def get_wework_data(username):
             return None
 
         # Lấy tasks trực tiếp từ API /user/tasks
-        print(f"📋 Đang lấy tasks từ API /user/tasks...")
-        url = "https://wework.base.vn/extapi/v3/user/tasks"
-        payload = {
-            **get_wework_auth_data(),
-            'user': user_id
-        }
-        
-        try:
-            response = requests.post(url, data=payload, timeout=30)
-            response.raise_for_status()
-            data = response.json()
-            all_tasks = data.get('tasks', [])
-            print(f"✅ Đã lấy tổng cộng {len(all_tasks)} tasks từ API /user/tasks")
-        except Exception as e:
-            print(f"❌ Lỗi khi gọi API /user/tasks: {e}")
-            return None
+        if all_tasks is None:
+            print(f"📋 Đang lấy tasks từ API /user/tasks...")
+            url = "https://wework.base.vn/extapi/v3/user/tasks"
+            payload = {
+                **get_wework_auth_data(),
+                'user': user_id
+            }
+            
+            try:
+                response = base_http.post(url, data=payload, timeout=30)
+                response.raise_for_status()
+                data = response.json()
+                all_tasks = data.get('tasks', [])
+                print(f"✅ Đã lấy tổng cộng {len(all_tasks)} tasks từ API /user/tasks")
+            except Exception as e:
+                print(f"❌ Lỗi khi gọi API /user/tasks: {e}")
+                return None
         
         if not all_tasks:
             print(f"⚠️ Không có task nào")
             return None
             
         # Lấy mapping dự án
-        print("📋 Đang tải mapping dự án...")
-        try:
-            projects_url = "https://wework.base.vn/extapi/v3/project/list"
-            p_response = requests.post(projects_url, data=get_wework_auth_data(), timeout=30)
-            p_data = p_response.json()
-            projects = p_data.get('projects', [])
-            project_map = {str(p['id']): p['name'] for p in projects}
-            
-            # Lấy thêm departments
-            depts_url = "https://wework.base.vn/extapi/v3/department/list"
-            d_response = requests.post(depts_url, data=get_wework_auth_data(), timeout=30)
-            d_data = d_response.json()
-            depts = d_data.get('departments', [])
-            for d in depts:
-                project_map[str(d['id'])] = d['name']
-                
-        except Exception as e:
-            print(f"⚠️ Lỗi khi load project mapping: {e}")
-            project_map = {}
+        if project_map is None:
+            print("📋 Đang tải mapping dự án...")
+            try:
+                project_map = load_project_map()
+            except Exception as e:
+                print(f"⚠️ Lỗi khi load project mapping: {e}")
+                project_map = {}
 
         filtered_tasks = []
         
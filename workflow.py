@@ -1,4 +1,5 @@
-import requests
+import base_http
+from user_directory import get_directory
 import json
 import pytz
 from datetime import datetime
@@ -28,35 +29,21 @@ def get_workflow_auth_data():
     key = "access_token_v2" if "~" in WORKFLOW_ACCESS_TOKEN else "access_token"
     return {key: WORKFLOW_ACCESS_TOKEN}
 
-def load_user_mapping():
-    """Tải user mapping từ Account API và lưu vào biến global"""
+def load_user_mapping(user_list=None):
+    """Tải mapping user_id -> name (từ UserDirectory dùng chung) và lưu vào biến global
+
+    user_list: danh sách user đã tải sẵn (nếu có thì dùng thay cho UserDirectory).
+    """
     global user_id_to_name_map
-    try:
-        url = "https://account.base.vn/extapi/v1/users/get_list"
-        payload = get_account_auth_data()
-        headers = {'Content-Type': 'application/x-www-form-urlencoded'}
-        
-        response = requests.post(url, headers=headers, data=payload, timeout=30)
-        
-        if response.status_code == 200:
-            response_json = response.json()
-            
-            user_list = []
-            if isinstance(response_json, list):
-                user_list = response_json
-            elif isinstance(response_json, dict):
-                user_list = response_json.get('users', [])
-            
-            if user_list:
-                user_id_to_name_map = {
-                    str(user.get('id', '')): user.get('name', '') 
-                    for user in user_list 
-                    if user.get('id') and user.get('name')
-                }
-        else:
-            print(f"Không thể tải user mapping, status code: {response.status_code}")
-    except Exception as e:
-        print(f"Lỗi khi tải user mapping: {e}")
+    if user_list is None:
+        user_id_to_name_map = get_directory().id_to_name()
+        return
+    user_id_to_name_map = {
+        str(user.get('id', '')): user.get('name', '')
+        for user in user_list
+        if user.get('id') and user.get('name')
+    }
+
 
 def get_user_name(user_id):
     """Lấy tên user từ user_id"""
@@ -74,8 +61,45 @@ def timestamp_to_hcm(timestamp_str):
     except:
         return 'N/A'
 
-def get_workflow_data(employee_name, limit=10):
-    """Lấy dữ liệu Workflow - công việc gần nhất"""
+def get_all_workflow_jobs(max_pages=10):
+    """Lấy tất cả jobs từ API Workflow (dữ liệu toàn công ty, có pagination)"""
+    url = "https://workflow.base.vn/extapi/v1/jobs/get"
+    headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+    all_jobs = []
+    current_page_id = 0
+    
+    while current_page_id < max_pages:
+        payload = {
+            **get_workflow_auth_data(),
+            'page_id': current_page_id
+        }
+        
+        try:
+            response = base_http.post(url, headers=headers, data=payload, timeout=30)
+            response.raise_for_status()
+            
+            data = response.json()
+            
+            if data.get('code') == 1 and 'jobs' in data:
+                jobs_on_page = data.get('jobs', [])
+                if jobs_on_page:
+                    all_jobs.extend(jobs_on_page)
+                    current_page_id += 1
+                else:
+                    break
+            else:
+                break
+        except Exception as e:
+            print(f"⚠️ Lỗi khi lấy trang {current_page_id}: {e}")
+            break
+    
+    return all_jobs
+
+def get_workflow_data(employee_name, limit=10, all_jobs=None):
+    """Lấy dữ liệu Workflow - công việc gần nhất
+
+    all_jobs: danh sách jobs đã tải sẵn cho cả công ty (BaseSnapshot), nếu có.
+    """
     try:
         print(f"\n🔄 Đang tải dữ liệu Workflow cho {employee_name}...")
         
@@ -83,48 +107,17 @@ def get_workflow_data(employee_name, limit=10):
         if not user_id_to_name_map:
             load_user_mapping()
         
-        # Tìm user_id của nhân viên từ mapping
-        employee_user_id = None
-        for uid, name in user_id_to_name_map.items():
-            if name == employee_name:
-                employee_user_id = uid
-                break
+        # Tìm user_id của nhân viên từ danh bạ dùng chung
+        employee = get_directory().by_name(employee_name)
+        employee_user_id = employee['id'] if employee else None
         
         if not employee_user_id:
             print(f"⚠️ Không tìm thấy user_id cho nhân viên: {employee_name}")
             return None
         
         # Lấy dữ liệu từ API Workflow với pagination
-        url = "https://workflow.base.vn/extapi/v1/jobs/get"
-        headers = {'Content-Type': 'application/x-www-form-urlencoded'}
-        all_jobs = []
-        current_page_id = 0
-        max_pages = 10
-        
-        while current_page_id < max_pages:
-            payload = {
-                **get_workflow_auth_data(),
-                'page_id': current_page_id
-            }
-            
-            try:
-                response = requests.post(url, headers=headers, data=payload, timeout=30)
-                response.raise_for_status()
-                
-                data = response.json()
-                
-                if data.get('code') == 1 and 'jobs' in data:
-                    jobs_on_page = data.get('jobs', [])
-                    if jobs_on_page:
-                        all_jobs.extend(jobs_on_page)
-                        current_page_id += 1
-                    else:
-                        break
-                else:
-                    break
-            except Exception as e:
-                print(f"⚠️ Lỗi khi lấy trang {current_page_id}: {e}")
-                break
+        if all_jobs is None:
+            all_jobs = get_all_workflow_jobs()
         
         if not all_jobs:
             print("⚠️ Không có dữ liệu công việc từ Workflow")